@@ -0,0 +1,111 @@
+"""
+Batch endpoint support: several GET requests of the API answered in one round-trip.
+
+Sub-requests run in-process against the API views, on the same database
+connection and with the user of the batch request. Product gets are coalesced
+into a single `pk__in` query.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, ResolverMatch, resolve
+
+from api.serializers import ProductSerializer
+from api.utils import product_etag
+from product.models import Product
+
+NOT_FOUND = {"status": 404, "body": {"detail": "Not found."}}
+
+
+def resolve_path(path: str) -> Optional[ResolverMatch]:
+    """
+    Resolve a sub-request path to an API view, the batch view itself excluded
+    :param path:
+    :return: None when the path isn't a batchable API view
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    if match.namespace != "api" or match.url_name == "batch":
+        return None
+    return match
+
+
+def dispatch(request, path: str, query: str, match: ResolverMatch) -> Dict[str, Any]:
+    """
+    Run a GET sub-request through its view
+    :param request: batch request
+    :param path:
+    :param query: query string
+    :param match:
+    :return: status, body and ETag of the sub-response
+    """
+    sub_request = HttpRequest()
+    sub_request.method = "GET"
+    sub_request.path = sub_request.path_info = path
+    sub_request.META = {
+        **request.META,
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        # sub-responses are embedded as JSON, uncompressed
+        "HTTP_ACCEPT": "application/json",
+        "HTTP_ACCEPT_ENCODING": "identity",
+    }
+    sub_request.GET = QueryDict(query)
+    # reuse the user authenticated by the batch request instead of
+    # authenticating every sub-request again
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    response = match.func(sub_request, *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    result: Dict[str, Any] = {"status": response.status_code, "body": None}
+    if response.content:
+        result["body"] = json.loads(response.content)
+    if response.has_header("ETag"):
+        result["etag"] = response["ETag"]
+    return result
+
+
+def run_batch(request, paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Answer GET sub-requests in order
+    :param request: batch request
+    :param paths: API paths with optional query strings
+    :return: status, body and ETag of every sub-response
+    """
+    resolved = []
+    for full_path in paths:
+        path, _, query = full_path.partition("?")
+        resolved.append((path, query, resolve_path(path)))
+
+    product_ids = {
+        match.kwargs["pk"]
+        for _, _, match in resolved
+        if match is not None and match.url_name == "product-get"
+    }
+    products = Product.objects.visible().in_bulk(product_ids) if product_ids else {}
+
+    results = []
+    for path, query, match in resolved:
+        if match is None:
+            results.append(NOT_FOUND)
+        elif match.url_name == "product-get":
+            product = products.get(match.kwargs["pk"])
+            if product is None:
+                results.append(NOT_FOUND)
+                continue
+            results.append(
+                {
+                    "status": 200,
+                    "body": ProductSerializer(product).data,
+                    "etag": product_etag(product),
+                }
+            )
+        else:
+            results.append(dispatch(request, path, query, match))
+    return results
@@ -0,0 +1,60 @@
+"""
+Content-Encoding negotiation and responses of precompressed payloads, see
+`bmag.compression`.
+"""
+
+from typing import Dict, Iterable
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from bmag.compression import ENCODINGS, IDENTITY
+
+
+def negotiate(accept_encoding: str, available: Iterable[str] = ENCODINGS) -> str:
+    """
+    Pick the preferred encoding accepted by the client
+    :param accept_encoding: value of the Accept-Encoding header
+    :param available: encodings in server preference order
+    :return: encoding, `identity` when none is accepted
+    """
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    best, best_quality = IDENTITY, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def payload_response(
+    request, payload: Dict[str, bytes], content_type: str = "application/json"
+) -> HttpResponse:
+    """
+    Response of a precompressed payload in the encoding preferred by the client
+    :param request:
+    :param payload: result of `precompress`
+    :param content_type:
+    :return:
+    """
+    encoding = negotiate(
+        request.META.get("HTTP_ACCEPT_ENCODING", ""),
+        [encoding for encoding in ENCODINGS if encoding in payload],
+    )
+    response = HttpResponse(payload[encoding], content_type=content_type)
+    if encoding != IDENTITY:
+        response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(response.content))
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
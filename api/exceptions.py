@@ -0,0 +1,12 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """
+    Raised when a conditional write finds that the object has changed since it was read
+    """
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "Precondition failed."
+    default_code = "precondition_failed"
@@ -0,0 +1,92 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from api.utils import fetch_in_order
+from product.models import ProductCategory
+from product.registry import category_registry
+
+
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves a category id through the in-memory category registry instead of a query.
+    Ids missing from the registry are looked up in the table, categories
+    created by another process may not be in its registry yet
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", ProductCategory.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        category = category_registry.get(pk)
+        if category is None:
+            category = ProductCategory.objects.filter(
+                pk=pk, deleted_time__isnull=True
+            ).first()
+        if category is None:
+            self.fail("does_not_exist", pk_value=data)
+        return category
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    Resolves every submitted primary key with a single query of the child relation
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        return self.child_relation.to_internal_value_many(data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves many=True input with one pk__in query.
+    Keeps input order and reports all missing ids at once
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_internal_value_many(self, data):
+        """
+        Resolve list of primary keys
+        :param data: list of submitted primary keys
+        :return: list of objects in submitted order
+        """
+        queryset = self.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for item in data:
+            if self.pk_field is not None:
+                item = self.pk_field.to_internal_value(item)
+            if isinstance(item, bool):
+                self.fail("incorrect_type", data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                self.fail("incorrect_type", data_type=type(item).__name__)
+        objects, missing = fetch_in_order(queryset, pks)
+        if missing:
+            raise serializers.ValidationError(
+                [
+                    self.error_messages["does_not_exist"].format(pk_value=pk)
+                    for pk in missing
+                ],
+                code="does_not_exist",
+            )
+        return objects
@@ -0,0 +1,99 @@
+"""
+Guardrails bounding the memory a single request can use.
+
+List endpoints return at most LIST_MAX_ROWS rows and render them chunk by
+chunk from a database iterator, so only one chunk of model instances is alive
+at a time. In debug, `MemoryAccountingMiddleware` traces the memory every
+request allocates and logs, or rejects, requests over REQUEST_MEMORY_BUDGET.
+"""
+
+import logging
+import random
+import tracemalloc
+from typing import Tuple, Type
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import QuerySet
+from django.http import JsonResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def render_json_list(
+    queryset: QuerySet, serializer_class: Type[BaseSerializer], max_rows: int
+) -> Tuple[bytes, int, bool]:
+    """
+    Render up to max_rows rows of a queryset as a JSON array, fetching and
+    serializing LIST_CHUNK_SIZE rows at a time
+    :param queryset:
+    :param serializer_class:
+    :param max_rows:
+    :return: JSON array, number of rendered rows and whether rows were left out
+    """
+    renderer = JSONRenderer()
+    chunk_size = settings.LIST_CHUNK_SIZE
+    parts = []
+    chunk = []
+    count = 0
+    truncated = False
+    # one extra row tells whether the cap left rows out
+    for row in queryset[: max_rows + 1].iterator(chunk_size=chunk_size):
+        if count == max_rows:
+            truncated = True
+            break
+        chunk.append(row)
+        count += 1
+        if len(chunk) == chunk_size:
+            parts.append(renderer.render(serializer_class(chunk, many=True).data)[1:-1])
+            chunk = []
+    if chunk:
+        parts.append(renderer.render(serializer_class(chunk, many=True).data)[1:-1])
+    return b"[" + b",".join(parts) + b"]", count, truncated
+
+
+class MemoryAccountingMiddleware:
+    """
+    Trace the peak memory allocated while serving a sample of requests.
+    Used only in debug, tracing slows every allocation down, so it is started
+    for sampled requests only and stopped once they are served. A request
+    arriving while another one is traced is not sampled, the peak is
+    process-wide
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            random.random() >= settings.REQUEST_MEMORY_SAMPLE_RATE
+            or tracemalloc.is_tracing()
+        ):
+            return self.get_response(request)
+        tracemalloc.start()
+        try:
+            response = self.get_response(request)
+            _, used = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        response["X-Memory-Peak"] = str(used)
+        if used <= settings.REQUEST_MEMORY_BUDGET:
+            return response
+        logger.warning(
+            "%s %s allocated %d bytes, over the budget of %d bytes",
+            request.method,
+            request.path,
+            used,
+            settings.REQUEST_MEMORY_BUDGET,
+        )
+        if not settings.REQUEST_MEMORY_REJECT:
+            return response
+        rejected = JsonResponse(
+            {"error": "Request exceeded its memory budget"}, status=507
+        )
+        rejected["X-Memory-Peak"] = str(used)
+        return rejected
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bmag.schema import generate_schema
+
+
+class Command(BaseCommand):
+    help = "Write the OpenAPI schema of the API to OPENAPI_SCHEMA_PATH"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with an error if the written schema is missing or outdated, without writing it",
+        )
+
+    def handle(self, *args, **options):
+        path = settings.OPENAPI_SCHEMA_PATH
+        schema = generate_schema()
+        if options["check"]:
+            if not path.exists() or path.read_bytes() != schema:
+                raise CommandError(
+                    f"{path} is outdated, run `manage.py generate_openapi_schema`"
+                )
+            self.stdout.write("OpenAPI schema is up to date")
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(schema)
+        self.stdout.write(f"OpenAPI schema written to {path}")
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bmag.startup import aggregate, import_times
+
+
+class Command(BaseCommand):
+    help = "Report import time of a worker startup, aggregated by package"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--deployment-profile",
+            default="full",
+            choices=("full", "api"),
+            help="DEPLOYMENT_PROFILE of the profiled worker",
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=1,
+            help="Dotted name parts grouped together, 0 reports single modules",
+        )
+        parser.add_argument(
+            "--top", type=int, default=25, help="Number of rows to print"
+        )
+
+    def handle(self, *args, **options):
+        if options["depth"] < 0 or options["top"] < 1:
+            raise CommandError(
+                "--depth must not be negative and --top must be positive"
+            )
+        rows = import_times(options["deployment_profile"])
+        if options["depth"]:
+            packages = aggregate(rows, options["depth"])
+        else:
+            packages = {
+                row.module: {"self_us": row.self_us, "modules": 1} for row in rows
+            }
+        total = sum(row.self_us for row in rows)
+        self.stdout.write(
+            f"{options['deployment_profile']} profile: {len(rows)} modules "
+            f"imported in {total / 1000:.1f} ms"
+        )
+        self.stdout.write(f"{'package':<40} {'modules':>8} {'self ms':>9} {'share':>7}")
+        ranked = sorted(packages.items(), key=lambda item: -item[1]["self_us"])
+        for name, package in ranked[: options["top"]]:
+            self.stdout.write(
+                f"{name:<40} {package['modules']:>8} "
+                f"{package['self_us'] / 1000:>9.1f} {package['self_us'] / total:>7.1%}"
+            )
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from api.compression import negotiate
+from bmag.compression import IDENTITY, compress
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, whichever the client prefers.
+    Skips streaming, already encoded and small responses, so precompressed
+    cached payloads are passed through untouched
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding == IDENTITY:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        if response.has_header("ETag") and response["ETag"].startswith('"'):
+            # the representation changed, a strong validator no longer applies
+            response["ETag"] = "W/" + response["ETag"]
+        return response
@@ -1,34 +1,65 @@
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenBlacklistSerializer,
+    TokenObtainSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from api.exceptions import PreconditionFailed
+from api.fields import CategoryField, BulkPrimaryKeyRelatedField
+from api.tokens import RefreshToken
 from api.utils import validate_email_address
-from product.models import Product, WishList, ProductCategory
+from product.models import (
+    Product,
+    WishList,
+    ProductCategory,
+    CategoryStats,
+    WishListSnapshot,
+)
+from product.cache import invalidate_catalog
+from product.snapshots import refresh_snapshots_on_commit, shared_wishlist_ids
+from product.stats import product_added, product_changed
+from tasks.models import Task
 from users.models import User
 
 
 class SignInSerializer(TokenObtainPairSerializer):
-    @classmethod
-    def get_token(cls, user):
-        """
-        Get token from rest_framework_simplejwt
-        :param user:
-        :return:
-        """
-        token = super(SignInSerializer, cls).get_token(user)
-        return token
+    token_class = RefreshToken
 
     def validate(self, attrs):
         """
-        Token validation with lifetime field
+        Token validation with lifetime field.
+        Builds and signs each token once
         :param attrs:
         :return:
         """
-        data = super().validate(attrs)
+        # authenticates and sets self.user
+        data = TokenObtainSerializer.validate(self, attrs)
         refresh = self.get_token(self.user)
-        data["lifetime"] = int(refresh.access_token.lifetime.total_seconds())
+        access = refresh.access_token
+        data["refresh"] = str(refresh)
+        data["access"] = str(access)
+        data["lifetime"] = int(access.lifetime.total_seconds())
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
         return data
 
 
+class RefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class LogoutSerializer(TokenBlacklistSerializer):
+    token_class = RefreshToken
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     email = serializers.CharField(required=True)
     password = serializers.CharField(write_only=True, required=True)
@@ -73,9 +104,7 @@ class ProductSerializer(serializers.Serializer):
     name = serializers.CharField()
     price = serializers.DecimalField(max_digits=5, decimal_places=2)
     rank = serializers.IntegerField()
-    category = serializers.PrimaryKeyRelatedField(
-        queryset=ProductCategory.objects.all()
-    )
+    category = CategoryField()
     created_time = serializers.DateTimeField(required=False)
 
     class Meta:
@@ -91,16 +120,43 @@ class ProductSerializer(serializers.Serializer):
         """
         Create and return a new `Product` instance, given the validated data.
         """
-        return Product.objects.create(**validated_data)
+        with transaction.atomic():
+            product = Product.objects.create(**validated_data)
+            product_added(product.category_id, product.price)
+            invalidate_catalog([product.category_id])
+        return product
+
+
+class ProductIdentifiedSerializer(ProductSerializer):
+    id = serializers.IntegerField(read_only=True)
+
+
+class ProductIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.PRODUCT_IDS_MAX_ITEMS,
+    )
+
+    def validate_ids(self, ids):
+        """
+        Used to drop duplicated ids keeping the submitted order
+        :param ids:
+        :return: list of unique ids
+        """
+        return list(dict.fromkeys(ids))
+
+
+class ProductIdsResultSerializer(serializers.Serializer):
+    results = ProductIdentifiedSerializer(many=True)
+    missing = serializers.ListField(child=serializers.IntegerField())
 
 
 class ProductUpdateSerializer(serializers.Serializer):
     name = serializers.CharField(required=False)
     price = serializers.DecimalField(max_digits=5, decimal_places=2, required=False)
     rank = serializers.IntegerField(required=False)
-    category = serializers.PrimaryKeyRelatedField(
-        queryset=ProductCategory.objects.all()
-    )
+    category = CategoryField()
     created_time = serializers.DateTimeField(required=False)
 
     class Meta:
@@ -114,16 +170,129 @@ class ProductUpdateSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         """
-        Update and return an updated `ProductCategory` instance
+        Update and return an updated `Product` instance.
+        Writes only the changed columns with a single UPDATE and skips the write
+        when nothing changed. When `updated_time` is passed in the context the
+        UPDATE is conditional on it and raises `PreconditionFailed` on mismatch
         """
-        instance.category = validated_data.get("category", instance.category)
-        instance.name = validated_data.get("name", instance.name)
-        instance.price = validated_data.get("price", instance.price)
-        instance.rank = validated_data.get("rank", instance.rank)
-        instance.save()
+        changes = {}
+        for field in self.Meta.fields:
+            if field not in validated_data:
+                continue
+            value = validated_data[field]
+            if field == "category":
+                changed = value.pk != instance.category_id
+            else:
+                changed = value != getattr(instance, field)
+            if changed:
+                changes[field] = value
+        if not changes:
+            return instance
+
+        old_category_id, old_price = instance.category_id, instance.price
+        changes["updated_time"] = timezone.now()
+        queryset = Product.objects.filter(pk=instance.pk)
+        expected_updated_time = self.context.get("updated_time")
+        if expected_updated_time is not None:
+            queryset = queryset.filter(updated_time=expected_updated_time)
+        with transaction.atomic():
+            if not queryset.update(**changes):
+                raise PreconditionFailed({"error": "Product was modified"})
+            for field, value in changes.items():
+                setattr(instance, field, value)
+            product_changed(
+                old_category_id, old_price, instance.category_id, instance.price
+            )
+            refresh_snapshots_on_commit(shared_wishlist_ids(product_ids=[instance.pk]))
+            invalidate_catalog([old_category_id, instance.category_id])
         return instance
 
 
+class RecommendationSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    price = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+    category = serializers.IntegerField(source="category_id", read_only=True)
+    score = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ["id", "name", "price", "category", "score"]
+
+
+class ProductBulkUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField(required=False)
+    price = serializers.DecimalField(max_digits=5, decimal_places=2, required=False)
+    rank = serializers.IntegerField(required=False)
+    category = CategoryField(required=False)
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    products = ProductBulkUpdateItemSerializer(
+        many=True, allow_empty=False, max_length=settings.BULK_MAX_ITEMS
+    )
+
+    def validate_products(self, products):
+        """
+        Used to reject batches that change the same product twice
+        :param products:
+        :return: mapping of product id to changed fields
+        """
+        changes = {}
+        for item in products:
+            pk = item.pop("id")
+            if pk in changes:
+                raise serializers.ValidationError(
+                    {"error": f"Product {pk} is listed more than once"}
+                )
+            changes[pk] = item
+        return changes
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(
+        child=serializers.RegexField(r"^/", max_length=2048),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS,
+    )
+
+    def validate_ids(self, ids):
+        """
+        Used to drop duplicated ids keeping the submitted order
+        :param ids:
+        :return: list of unique ids
+        """
+        return list(dict.fromkeys(ids))
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    bins = serializers.IntegerField(min_value=1, max_value=1000, default=10)
+    currency = serializers.CharField(required=False)
+
+    def validate_currency(self, currency):
+        """
+        Used to parse comma separated currency codes
+        :param currency:
+        :return: list of currency codes
+        """
+        currencies = [code.strip().upper() for code in currency.split(",")]
+        unknown = set(currencies) - set(settings.CURRENCY_RATES)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown currency: {', '.join(sorted(unknown))}"
+            )
+        return currencies
+
+
 class CategorySerializer(serializers.Serializer):
     name = serializers.CharField()
 
@@ -141,9 +310,47 @@ class CategorySerializer(serializers.Serializer):
         return ProductCategory.objects.create(name=name)
 
 
+class CategoryRetrieveSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ProductCategory
+        fields = ["id", "name"]
+
+
+class TaskStatusSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    attempts = serializers.IntegerField(read_only=True)
+    created_time = serializers.DateTimeField(read_only=True)
+    updated_time = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Task
+        fields = ["id", "status", "attempts", "created_time", "updated_time"]
+
+
+class CategoryStatsSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="category.name", read_only=True)
+    avg_price = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = CategoryStats
+        fields = [
+            "category",
+            "name",
+            "product_count",
+            "min_price",
+            "max_price",
+            "avg_price",
+        ]
+        read_only_fields = fields
+
+
 class WishlistSerializer(serializers.Serializer):
-    products = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), many=True
+    products = BulkPrimaryKeyRelatedField(
+        queryset=Product.objects.visible().select_related("category"), many=True
     )
 
     class Meta:
@@ -159,11 +366,11 @@ class WishlistSerializer(serializers.Serializer):
         product_ids = []
         categories_ids = []
         for product in products:
-            if product.category in categories_ids:
+            if product.category_id in categories_ids:
                 raise serializers.ValidationError(
                     ({"error": "This category already in list"})
                 )
-            categories_ids.append(product.category)
+            categories_ids.append(product.category_id)
             product_ids.append(product.pk)
         return product_ids
 
@@ -179,6 +386,27 @@ class WishlistSerializer(serializers.Serializer):
         return wl
 
 
+class WishlistShareSerializer(serializers.Serializer):
+    token = serializers.CharField(read_only=True)
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WishListSnapshot
+        fields = ["token", "url"]
+
+    def get_url(self, snapshot):
+        """
+        Absolute url of the shared wishlist
+        :param snapshot:
+        :return:
+        """
+        return reverse(
+            "api:wishlist-shared",
+            kwargs={"token": snapshot.token},
+            request=self.context.get("request"),
+        )
+
+
 class WishlistRetrieveSerializer(serializers.Serializer):
     user = serializers.CharField()
     products = serializers.PrimaryKeyRelatedField(
@@ -1,12 +1,52 @@
+import gzip
+import json
+import time
+import tracemalloc
+from unittest import skipUnless
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import TokenBackendError
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from product.models import ProductCategory, Product
+from api.compression import negotiate
+from bmag.compression import decompress
+from bmag.schema import generate_schema, load_schema
+from api.serializers import WishlistSerializer
+from api.utils import product_etag
+from api.tokens import token_backend
+from users.revocation import revoked_tokens
+from api.throttling import LocalMemoryBucketStore, reset_throttling
+from product.models import (
+    ProductCategory,
+    Product,
+    WishList,
+    ProductPopularity,
+    CategoryPopularity,
+    WishListSnapshot,
+)
+from product.popularity import refresh_popularity
+from product.registry import category_registry
+from product.snapshots import SNAPSHOT_CACHE_KEY, regenerate_snapshots
+from product.tasks import update_popularity
+from tasks.models import Task
+from tasks.queue import run_pending
 from users.models import User
 
 
 class MainTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        reset_throttling()
+
     def auth(self):
         user, created = User.objects.get_or_create(
             email="b@example.com", password="example24"
@@ -53,6 +93,66 @@ class AccountTests(MainTest):
         self.assertTrue(response.status_code, 201)
 
 
+class TokenTests(MainTest):
+    def setUp(self):
+        self.user = User.objects.create_user(email="c@example.com", password="pass")
+        revoked_tokens.clear()
+
+    def test_login(self):
+        response = self.client.post(
+            reverse("api:auth-login"), {"email": "c@example.com", "password": "pass"}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["lifetime"], 3600)
+        access = jwt.decode(data["access"], settings.SECRET_KEY, ["HS256"])
+        refresh = jwt.decode(data["refresh"], settings.SECRET_KEY, ["HS256"])
+        self.assertEqual(access["user_id"], self.user.id)
+        self.assertEqual(access["token_type"], "access")
+        self.assertEqual(refresh["token_type"], "refresh")
+        self.assertIn("iat", access)
+
+        response = self.client.post(reverse("api:auth-refresh"), data)
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()["refresh"]
+        # the rotated refresh token is revoked
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse("api:auth-refresh"), data)
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(reverse("api:auth-logout"), {"refresh": rotated})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse("api:auth-refresh"), {"refresh": rotated})
+        self.assertEqual(response.status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + data["access"])
+        response = self.client.get(reverse("api:wishlist-id", {self.user.id}))
+        self.assertNotEqual(response.status_code, 401)
+
+    @override_settings(JWT_COMPACT_CLAIMS=True)
+    def test_compact_claims(self):
+        response = self.client.post(
+            reverse("api:auth-login"), {"email": "c@example.com", "password": "pass"}
+        )
+        access = jwt.decode(response.json()["access"], settings.SECRET_KEY, ["HS256"])
+        self.assertNotIn("iat", access)
+        self.assertEqual(len(access["jti"]), 22)
+
+    def test_backend(self):
+        payload = {"token_type": "access", "exp": int(time.time()) + 60, "jti": "a"}
+        token = token_backend.encode(payload)
+        self.assertEqual(token, jwt.encode(payload, settings.SECRET_KEY, "HS256"))
+        self.assertEqual(token_backend.decode(token), payload)
+        header, body, signature = token.split(".")
+        for invalid in (
+            f"{header}.{body}.{signature[:-2]}AA",
+            jwt.encode(payload, "other", "HS256"),
+            token_backend.encode(dict(payload, exp=int(time.time()) - 1)),
+            f"{header}.{body}",
+        ):
+            with self.assertRaises(TokenBackendError):
+                token_backend.decode(invalid)
+
+
 class ProductsTests(MainTest):
     def setUp(self):
         self.auth()
@@ -75,6 +175,25 @@ class ProductsTests(MainTest):
         )
         self.assertEqual(response.status_code, 201)
 
+    def test_product_create_category_from_other_process(self):
+        category_registry.all()
+        # not in the registry of this process yet
+        (category,) = ProductCategory.objects.bulk_create(
+            [ProductCategory(name="Water")]
+        )
+        response = self.client.post(
+            reverse("api:product-create"),
+            {"name": "Bonaqua", "price": 1.00, "rank": 1, "category": category.id},
+        )
+        self.assertEqual(response.status_code, 201)
+        category.deleted_time = timezone.now()
+        category.save()
+        response = self.client.post(
+            reverse("api:product-create"),
+            {"name": "Bonaqua", "price": 1.00, "rank": 1, "category": category.id},
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_products_list(self):
         self.test_product_create()
         url = reverse("api:products-list")
@@ -92,11 +211,67 @@ class ProductsTests(MainTest):
         response = self.client.get(f"{url}?sorting=created_tim")
         self.assertEqual(response.status_code, 400)
 
+    def test_products_analytics(self):
+        url = reverse("api:products-analytics")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(f"{url}?bins=2&currency=usd,eur")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(set(response.json()["currencies"]), {"USD", "EUR"})
+        response = self.client.get(f"{url}?currency=XXX")
+        self.assertEqual(response.status_code, 400)
+
     def test_product_get(self):
         url = reverse("api:product-get", {self.product.id})
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_products_price_range(self):
+        url = reverse("api:products-list")
+        response = self.client.get(f"{url}?price_min=1.15&price_max=1.15")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+        response = self.client.get(f"{url}?price_gt=1.15")
+        self.assertEqual(response.status_code, 404)
+        # user only, the range is empty without a product query
+        with self.assertNumQueries(1):
+            response = self.client.get(f"{url}?price_gt=2&price_lt=1")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f"{url}?price_min=abc")
+        self.assertEqual(response.status_code, 400)
+
+    def test_products_by_ids(self):
+        other = Product.objects.create(
+            name="Fanta", price=1.20, rank=2, category=self.category
+        )
+        url = reverse("api:products-list")
+        # user and a single product query
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"{url}?ids={other.id},0,{self.product.id},{other.id}"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [product["id"] for product in response.json()["results"]],
+            [other.id, self.product.id],
+        )
+        self.assertEqual(response.json()["missing"], [0])
+
+        response = self.client.post(
+            reverse("api:products-ids"), {"ids": [self.product.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["name"], "Sprite")
+
+        response = self.client.get(f"{url}?ids=1,a")
+        self.assertEqual(response.status_code, 400)
+        ids = ",".join(["1"] * (settings.PRODUCT_IDS_MAX_ITEMS + 1))
+        response = self.client.get(f"{url}?ids={ids}")
+        self.assertEqual(response.status_code, 400)
+
     def test_product_update(self):
         url = reverse("api:product-update", {self.product.id})
         # partial update
@@ -116,12 +291,180 @@ class ProductsTests(MainTest):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_product_partial_update_changed_columns(self):
+        url = reverse("api:product-update", {self.product.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {"name": "Sprite diet"})
+        self.assertEqual(response.status_code, 200)
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"name"', updates[0])
+        self.assertIn('"updated_time"', updates[0])
+        self.assertNotIn('"price"', updates[0])
+        self.assertNotIn('"rank"', updates[0])
+        # nothing changed, nothing written
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {"name": "Sprite diet"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if q["sql"].startswith("UPDATE")])
+
+    def test_product_update_if_match(self):
+        etag = self.client.get(reverse("api:product-get", {self.product.id}))["ETag"]
+        url = reverse("api:product-update", {self.product.id})
+        response = self.client.patch(url, {"rank": 5}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        # stale etag
+        response = self.client.patch(url, {"rank": 6}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rank, 5)
+
     def test_product_delete(self):
         url = reverse("api:product-delete", {self.product.id})
         response = self.client.post(
             url, {"email": "b@example.com", "password": "example24"}
         )
 
+    def test_product_write_in_deleted_category(self):
+        self.category.deleted_time = timezone.now()
+        self.category.save(update_fields=["deleted_time"])
+        url = reverse("api:product-update", {self.product.id})
+        self.assertEqual(self.client.patch(url, {"rank": 5}).status_code, 404)
+        url = reverse("api:product-delete", {self.product.id})
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rank, 3)
+
+
+class BulkTests(MainTest):
+    def setUp(self):
+        self.auth()
+        self.category = ProductCategory.objects.create(name="Sparkling water")
+        self.category2 = ProductCategory.objects.create(name="Water")
+        self.product = Product.objects.create(
+            name="Sprite", price=1.15, rank=3, category=self.category
+        )
+        self.product2 = Product.objects.create(
+            name="Cola", price=1.0, rank=2, category=self.category
+        )
+
+    def test_product_bulk_update(self):
+        url = reverse("api:product-bulk-update")
+        response = self.client.post(
+            url,
+            {
+                "products": [
+                    {"id": self.product.id, "price": "2.00"},
+                    {"id": self.product2.id, "rank": 2},
+                    {"id": 99, "rank": 1},
+                    {"id": self.product2.id, "category": self.category2.id},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                url,
+                {
+                    "products": [
+                        {"id": self.product.id, "price": "2.00"},
+                        {"id": self.product2.id, "rank": 2},
+                        {"id": 99, "rank": 1},
+                    ]
+                },
+                format="json",
+            )
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": self.product.id, "status": "updated"},
+                {"id": self.product2.id, "status": "unchanged"},
+                {"id": 99, "status": "not_found"},
+            ],
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), "2.00")
+        stats = self.client.get(reverse("api:products-facets")).json()
+        self.assertEqual(stats[0]["max_price"], "2.00")
+
+    def test_product_bulk_delete(self):
+        url = reverse("api:product-bulk-delete")
+        response = self.client.post(url, {"ids": [self.product.id, 99]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": self.product.id, "status": "deleted"},
+                {"id": 99, "status": "not_found"},
+            ],
+        )
+        self.assertEqual(list(Product.objects.all()), [self.product2])
+
+    def test_bulk_write_in_deleted_category(self):
+        self.category.deleted_time = timezone.now()
+        self.category.save(update_fields=["deleted_time"])
+        response = self.client.post(
+            reverse("api:product-bulk-update"),
+            {"products": [{"id": self.product.id, "rank": 5}]},
+            format="json",
+        )
+        self.assertEqual(
+            response.json()["results"], [{"id": self.product.id, "status": "not_found"}]
+        )
+        response = self.client.post(
+            reverse("api:product-bulk-delete"),
+            {"ids": [self.product.id]},
+            format="json",
+        )
+        self.assertEqual(
+            response.json()["results"], [{"id": self.product.id, "status": "not_found"}]
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rank, 3)
+
+    def test_category_bulk_delete(self):
+        url = reverse("api:category-bulk-delete")
+        response = self.client.post(
+            url, {"ids": [self.category.id, self.category2.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r["status"] for r in response.json()["results"]], ["deleted", "deleted"]
+        )
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(self.client.get(reverse("api:category-list")).json(), [])
+
+    @override_settings(CATEGORY_SYNC_DELETE_LIMIT=1)
+    def test_category_bulk_delete_background(self):
+        hidden = ProductCategory.objects.create(
+            name="Juice", deleted_time=timezone.now()
+        )
+        url = reverse("api:category-bulk-delete")
+        response = self.client.post(
+            url,
+            {"ids": [self.category.id, self.category2.id, hidden.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [r["status"] for r in results], ["scheduled", "deleted", "not_found"]
+        )
+        # the large category is soft-deleted and hidden at once
+        self.assertEqual(self.client.get(reverse("api:category-list")).json(), [])
+        self.assertEqual(Product.objects.visible().count(), 0)
+        status_url = reverse("api:category-remove-status", {results[0]["task"]})
+        self.assertEqual(self.client.get(status_url).json()["status"], "pending")
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(self.client.get(status_url).json()["status"], "done")
+        self.assertFalse(ProductCategory.objects.filter(pk=self.category.id).exists())
+        self.assertFalse(Product.objects.exists())
+
 
 class CategoryTests(MainTest):
     def setUp(self):
@@ -139,6 +482,55 @@ class CategoryTests(MainTest):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, 204)
 
+    @override_settings(CATEGORY_SYNC_DELETE_LIMIT=1, CATEGORY_DELETE_CHUNK_SIZE=2)
+    def test_category_delete_background(self):
+        for rank in range(5):
+            Product.objects.create(
+                name="Sprite", price=1.15, rank=rank, category=self.category
+            )
+        url = reverse("api:category-remove", {self.category.id})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 202)
+        task_id = response.json()["id"]
+        # soft-deleted category and its products are hidden at once
+        self.assertEqual(self.client.get(reverse("api:category-list")).json(), [])
+        self.assertEqual(self.client.get(reverse("api:products-list")).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        status_url = reverse("api:category-remove-status", {task_id})
+        self.assertEqual(self.client.get(status_url).json()["status"], "pending")
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(self.client.get(status_url).json()["status"], "done")
+        self.assertFalse(ProductCategory.objects.filter(pk=self.category.id).exists())
+        self.assertFalse(Product.objects.exists())
+
+    def test_category_list(self):
+        url = reverse("api:category-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), [{"id": self.category.id, "name": "Sparkling water"}]
+        )
+        # writes invalidate the registry
+        self.client.post(reverse("api:category-create"), {"name": "Water"})
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_category_get(self):
+        url = reverse("api:category-get", {self.category.id})
+        self.client.credentials()
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(
+            response.json(), {"id": self.category.id, "name": "Sparkling water"}
+        )
+        self.category.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
 
 class WishlistTests(MainTest):
     def setUp(self):
@@ -171,6 +563,161 @@ class WishlistTests(MainTest):
         )
         self.assertEqual(response.status_code, 400)
 
+    def test_wishlist_create_missing_products(self):
+        url = reverse("api:wishlist-create")
+        response = self.client.post(
+            url, {"products": [self.product.id, 98, 99]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {
+                "products": [
+                    'Invalid pk "98" - object does not exist.',
+                    'Invalid pk "99" - object does not exist.',
+                ]
+            },
+        )
+
+    def test_wishlist_create_single_product_query(self):
+        serializer = WishlistSerializer(
+            data={"products": [self.product3.id, self.product.id]}
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            serializer.validated_data["products"], [self.product3, self.product]
+        )
+
+    def test_wishlist_popularity_and_recommendations(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_wishlist_create()
+        self.assertEqual(run_pending(), 1)
+        popularity = ProductPopularity.objects.get(product=self.product)
+        self.assertEqual(popularity.wishlist_count, 1)
+        self.assertEqual(popularity.trending_count, 1)
+        url = reverse("api:products-list")
+        response = self.client.get(f"{url}?sorting=-popularity")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [p["name"] for p in response.json()], ["Sprite", "Bonaqua", "Cola"]
+        )
+
+        url = reverse("api:product-recommendations", {self.product.id})
+        self.assertEqual(
+            self.client.get(url).json(),
+            [
+                {
+                    "id": self.product3.id,
+                    "name": "Bonaqua",
+                    "price": "0.90",
+                    "category": self.category2.id,
+                    "score": 1,
+                }
+            ],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse("api:wishlist-delete", {self.wishlist}))
+        self.assertEqual(run_pending(), 1)
+        popularity.refresh_from_db()
+        self.assertEqual(popularity.wishlist_count, 0)
+        self.assertEqual(
+            CategoryPopularity.objects.get(category=self.category2).wishlist_count, 0
+        )
+        self.assertEqual(self.client.get(url).json(), [])
+
+        # removal keeps the addition in the trending window
+        refresh_popularity()
+        popularity.refresh_from_db()
+        self.assertEqual(popularity.wishlist_count, 0)
+        self.assertEqual(popularity.trending_count, 1)
+
+    def test_wishlist_popularity_refresh_before_task(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_wishlist_create()
+        # the wishlist is counted by the refresh, its event by the task only
+        refresh_popularity()
+        self.assertFalse(ProductPopularity.objects.exists())
+        task = Task.objects.get(name="product.wishlist_changed")
+        self.assertEqual(run_pending(), 1)
+        popularity = ProductPopularity.objects.get(product=self.product)
+        self.assertEqual(popularity.wishlist_count, 1)
+        self.assertEqual(popularity.trending_count, 1)
+        refresh_popularity()
+        popularity.refresh_from_db()
+        self.assertEqual(popularity.wishlist_count, 1)
+        self.assertEqual(popularity.trending_count, 1)
+        # a repeated run counts nothing twice
+        update_popularity(**task.payload)
+        self.assertEqual(
+            CategoryPopularity.objects.get(category=self.category2).wishlist_count, 1
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse("api:wishlist-delete", {self.wishlist}))
+        refresh_popularity()
+        popularity.refresh_from_db()
+        self.assertEqual(popularity.wishlist_count, 1)
+        self.assertEqual(run_pending(), 1)
+        popularity.refresh_from_db()
+        self.assertEqual(popularity.wishlist_count, 0)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_wishlist_share(self):
+        self.test_wishlist_create()
+        url = reverse("api:wishlist-share")
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        token = response.json()["token"]
+        shared_url = reverse("api:wishlist-shared", {token})
+        self.assertTrue(response.json()["url"].endswith(shared_url))
+
+        self.client.credentials()
+        # the token and update time only
+        with self.assertNumQueries(1):
+            response = self.client.get(shared_url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual([p["name"] for p in data["products"]], ["Sprite", "Bonaqua"])
+        self.assertEqual(data["products"][0]["category"]["name"], "Sparkling water")
+
+        # product changes regenerate the snapshot
+        self.auth()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse("api:product-update", {self.product.id}), {"name": "Fanta"}
+            )
+        self.assertEqual(run_pending(), 1)
+        response = self.client.get(shared_url)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(
+            [p["name"] for p in response.json()["products"]], ["Fanta", "Bonaqua"]
+        )
+
+        # cold cache falls back to the snapshot table
+        cache.clear()
+        self.assertEqual(self.client.get(shared_url).status_code, 200)
+
+        # regenerated and revoked by another process, with a cache of its own
+        key = SNAPSHOT_CACHE_KEY.format(token)
+        stale = cache.get(key)
+        self.product.name = "Cola"
+        self.product.save()
+        regenerate_snapshots([self.wishlist])
+        cache.set(key, stale)
+        response = self.client.get(shared_url)
+        self.assertEqual(response.json()["products"][0]["name"], "Cola")
+        cache.set(key, stale)
+        WishListSnapshot.objects.filter(token=token).delete()
+        self.assertEqual(self.client.get(shared_url).status_code, 404)
+        self.auth()
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(shared_url).status_code, 404)
+
     def test_wishlist_delete(self):
         self.test_wishlist_create()
         url = reverse("api:wishlist-delete", {self.wishlist})
@@ -183,3 +730,408 @@ class WishlistTests(MainTest):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"user": "b@example.com", "products": [1, 3]})
+
+
+class FacetsTests(MainTest):
+    def setUp(self):
+        self.auth()
+        self.category = ProductCategory.objects.create(name="Sparkling water")
+        self.category2 = ProductCategory.objects.create(name="Water")
+
+    def create_product(self, price, category):
+        url = reverse("api:product-create")
+        response = self.client.post(
+            url, {"name": "Sprite", "price": price, "rank": 1, "category": category}
+        )
+        self.assertEqual(response.status_code, 201)
+        return Product.objects.latest("id")
+
+    def test_facets(self):
+        self.create_product("1.00", self.category.id)
+        cheap = self.create_product("0.50", self.category.id)
+        self.create_product("2.00", self.category2.id)
+        url = reverse("api:products-facets")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "category": self.category.id,
+                    "name": "Sparkling water",
+                    "product_count": 2,
+                    "min_price": "0.50",
+                    "max_price": "1.00",
+                    "avg_price": "0.75",
+                },
+                {
+                    "category": self.category2.id,
+                    "name": "Water",
+                    "product_count": 1,
+                    "min_price": "2.00",
+                    "max_price": "2.00",
+                    "avg_price": "2.00",
+                },
+            ],
+        )
+        # moving the cheapest product recomputes the old category
+        url = reverse("api:product-update", {cheap.id})
+        response = self.client.patch(
+            url, {"price": "3.00", "category": self.category2.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        url = reverse("api:product-delete", {Product.objects.first().id})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        response = self.client.get(reverse("api:products-facets"))
+        self.assertEqual(
+            [
+                (f["category"], f["product_count"], f["min_price"])
+                for f in response.json()
+            ],
+            [(self.category2.id, 2, "2.00")],
+        )
+
+
+class CompressionTests(MainTest):
+    def setUp(self):
+        cache.clear()
+        self.auth()
+        self.category = ProductCategory.objects.create(name="Sparkling water")
+        Product.objects.bulk_create(
+            Product(name=f"Sprite {i}", price="1.00", rank=i, category=self.category)
+            for i in range(50)
+        )
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate("gzip, deflate, br"), "br")
+        self.assertEqual(negotiate("br;q=0.5, gzip"), "gzip")
+        self.assertEqual(negotiate("gzip;q=0, br;q=0"), "identity")
+        self.assertEqual(negotiate("*"), "br")
+        self.assertEqual(negotiate(""), "identity")
+        self.assertEqual(negotiate("br", ["gzip"]), "identity")
+
+    def test_product_list_cached_compressed(self):
+        url = reverse("api:products-list")
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(response.json()), 50)
+
+        self.client.credentials()
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(len(json.loads(decompress(response.content, "br"))), 50)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 50)
+
+        # writes invalidate cached pages
+        self.auth()
+        product = Product.objects.first()
+        self.client.delete(reverse("api:product-delete", {product.id}))
+        self.assertEqual(len(self.client.get(url).json()), 49)
+
+    def test_product_list_cached_per_category(self):
+        other = ProductCategory.objects.create(name="Still water")
+        product = Product.objects.create(
+            name="Bonaqua", price="1.00", rank=1, category=other
+        )
+        url = reverse("api:products-list")
+        self.client.credentials()
+        self.assertEqual(len(self.client.get(f"{url}?category={other.id}").json()), 1)
+        response = self.client.get(
+            f"{url}?category__in={self.category.id},{other.id}&sorting=-rank"
+        )
+        self.assertEqual(len(response.json()), 51)
+        self.assertEqual(len(self.client.get(url).json()), 51)
+        response = self.client.get(f"{url}?category__in=a")
+        self.assertEqual(response.status_code, 400)
+
+        # writes to one category keep the cached pages of the others
+        self.auth()
+        self.client.delete(reverse("api:product-delete", {Product.objects.first().id}))
+        self.client.credentials()
+        with self.assertNumQueries(0):
+            response = self.client.get(f"{url}?category={other.id}")
+        self.assertEqual(response.json()[0]["name"], "Bonaqua")
+        response = self.client.get(
+            f"{url}?category__in={self.category.id},{other.id}&sorting=-rank"
+        )
+        self.assertEqual(len(response.json()), 50)
+        self.assertEqual(len(self.client.get(url).json()), 50)
+
+        self.auth()
+        self.client.patch(
+            reverse("api:product-update", {product.id}),
+            {"category": self.category.id},
+        )
+        self.assertEqual(self.client.get(f"{url}?category={other.id}").status_code, 404)
+
+    def test_middleware(self):
+        ProductCategory.objects.bulk_create(
+            ProductCategory(name=f"Water {i}") for i in range(30)
+        )
+        url = reverse("api:category-list")
+        with override_settings(COMPRESSION_MIN_SIZE=0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 31)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(response.json()), 31)
+
+
+@override_settings(ROOT_URLCONF="bmag.urls_api", MIDDLEWARE=settings.API_MIDDLEWARE)
+class ApiProfileTests(MainTest):
+    def test_api_profile(self):
+        self.assertEqual(self.client.get("/admin/").status_code, 404)
+        self.assertEqual(self.client.get("/").status_code, 404)
+
+        self.auth()
+        category = ProductCategory.objects.create(name="Water")
+        response = self.client.post(
+            reverse("api:product-create"),
+            {"name": "Bonaqua", "price": "0.90", "rank": 1, "category": category.id},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header("X-Frame-Options"))
+        self.assertNotIn("csrftoken", response.cookies)
+        self.client.credentials()
+        response = self.client.get(reverse("api:products-list"))
+        self.assertEqual(response.json()[0]["name"], "Bonaqua")
+
+
+@skipUnless(settings.DEPLOYMENT_PROFILE == "full", "the api profile skips drf_yasg")
+class SchemaTests(MainTest):
+    def test_schema_up_to_date(self):
+        self.assertEqual(
+            settings.OPENAPI_SCHEMA_PATH.read_bytes(),
+            generate_schema(),
+            "OpenAPI schema is outdated, run `manage.py generate_openapi_schema`",
+        )
+
+    def test_schema_file(self):
+        url = reverse("schema-json")
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=86400")
+        paths = json.loads(gzip.decompress(response.content))["paths"]
+        self.assertIn("/product/get/{id}/", paths)
+        self.assertEqual(list(paths["/products/ids/"]["post"]["responses"]), ["200"])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(reverse("schema-swagger-ui"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '"url": "/openapi.json"')
+
+
+class SchemaFallbackTests(MainTest):
+    def test_missing_schema_file(self):
+        load_schema.cache_clear()
+        self.addCleanup(load_schema.cache_clear)
+        missing = settings.OPENAPI_SCHEMA_PATH.with_name("missing.json")
+        with override_settings(OPENAPI_SCHEMA_PATH=missing):
+            schema = load_schema()
+        self.assertIn(b'"/product/get/{id}/"', schema["identity"])
+
+
+class ThrottlingTests(MainTest):
+    def rates(self, **rates):
+        return override_settings(
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": {
+                    **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+                    **rates,
+                },
+            }
+        )
+
+    def test_login_throttled(self):
+        url = reverse("api:auth-login")
+        with self.rates(login="2/min"):
+            for _ in range(2):
+                response = self.client.post(url, {"email": "b@example.com"})
+                self.assertEqual(response.status_code, 400)
+            response = self.client.post(url, {"email": "b@example.com"})
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response["Retry-After"], "30")
+            # other scopes have their own buckets
+            self.assertEqual(
+                self.client.get(reverse("api:category-list")).status_code, 200
+            )
+            # anonymous clients are told apart by IP
+            response = self.client.post(
+                url, {"email": "b@example.com"}, REMOTE_ADDR="10.0.0.1"
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_forwarded_for_ignored(self):
+        url = reverse("api:auth-login")
+        with self.rates(login="1/min"):
+            response = self.client.post(
+                url, {"email": "b@example.com"}, HTTP_X_FORWARDED_FOR="10.0.0.1"
+            )
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(
+                url, {"email": "b@example.com"}, HTTP_X_FORWARDED_FOR="10.0.0.2"
+            )
+            self.assertEqual(response.status_code, 429)
+
+    @override_settings(THROTTLE_MAX_KEYS=3)
+    def test_local_store_evicts_oldest(self):
+        store = LocalMemoryBucketStore()
+        for key in ("a", "b", "c"):
+            store.consume(key, 1, 1 / 60, 0)
+        self.assertGreater(store.consume("a", 1, 1 / 60, 1), 0)
+        # a new key evicts the least recently used bucket only
+        store.consume("d", 1, 1 / 60, 2)
+        self.assertEqual(list(store.buckets), ["c", "a", "d"])
+        self.assertGreater(store.consume("a", 1, 1 / 60, 3), 0)
+
+    def test_user_buckets(self):
+        url = reverse("api:category-list")
+        with self.rates(user="1/min", anon="1/min"):
+            self.auth()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 429)
+            self.client.credentials()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 429)
+
+    def test_cache_store(self):
+        url = reverse("api:category-list")
+        with self.rates(anon="1/min"), override_settings(
+            THROTTLE_STORE="api.throttling.CacheBucketStore"
+        ):
+            cache.clear()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 429)
+
+    def test_metrics(self):
+        with self.rates(anon="1/min"):
+            self.client.get(reverse("api:category-list"))
+            self.client.get(reverse("api:category-list"))
+            self.auth()
+            self.user.is_staff = True
+            self.user.save()
+            response = self.client.get(reverse("api:throttle-metrics"))
+        self.assertEqual(
+            response.json(),
+            {
+                "anon": {"allowed": 1, "throttled": 1},
+                "user": {"allowed": 1, "throttled": 0},
+            },
+        )
+
+
+class BatchTests(MainTest):
+    def setUp(self):
+        self.auth()
+        self.category = ProductCategory.objects.create(name="Water")
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Bonaqua {i}", price="0.90", rank=i, category=self.category)
+            for i in range(5)
+        )
+        self.wishlist = WishList.objects.create(user=self.user)
+        self.wishlist.products.add(self.products[0])
+
+    def test_batch(self):
+        paths = [reverse("api:product-get", {product.id}) for product in self.products]
+        paths += [
+            reverse("api:product-get", {0}),
+            reverse("api:wishlist-id", {self.user.id}),
+            reverse("api:products-list") + "?price_lt=1",
+            reverse("api:category-get", {self.category.id}),
+            "/api/missing/",
+            reverse("api:batch"),
+        ]
+        url = reverse("api:batch")
+        # user, the 6 product gets in one query, 3 for the wishlist,
+        # the product list and the category registry
+        with self.assertNumQueries(7), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"requests": paths}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len([q for q in queries if '"product_product"."id" IN' in q["sql"]]),
+            1,
+        )
+
+        responses = response.json()["responses"]
+        self.assertEqual(len(responses), len(paths))
+        for product, item in zip(self.products, responses):
+            self.assertEqual(item["status"], 200)
+            self.assertEqual(item["body"]["name"], product.name)
+            self.assertEqual(item["etag"], product_etag(product))
+        self.assertEqual(responses[5]["status"], 404)
+        self.assertEqual(responses[6]["body"]["products"], [self.products[0].id])
+        self.assertEqual(len(responses[7]["body"]), 5)
+        self.assertEqual(responses[8]["body"]["name"], "Water")
+        self.assertEqual([item["status"] for item in responses[9:]], [404, 404])
+
+    def test_batch_validation(self):
+        url = reverse("api:batch")
+        response = self.client.post(url, {"requests": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            url,
+            {"requests": ["/api/category/"] * (settings.BATCH_MAX_REQUESTS + 1)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {"requests": ["api/category/"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class GuardrailTests(MainTest):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(name="Water")
+        Product.objects.bulk_create(
+            Product(name=f"Bonaqua {i}", price="0.90", rank=i, category=category)
+            for i in range(5)
+        )
+
+    @override_settings(LIST_MAX_ROWS=3, LIST_CHUNK_SIZE=2)
+    def test_list_max_rows(self):
+        url = reverse("api:products-list")
+        response = self.client.get(url)
+        self.assertEqual([product["rank"] for product in response.json()], [0, 1, 2])
+        self.assertEqual(response["X-Results-Truncated"], "3")
+        # cached with the truncation
+        response = self.client.get(url)
+        self.assertEqual(response["X-Results-Truncated"], "3")
+        response = self.client.get(f"{url}?price_lt=1&sorting=rank")
+        self.assertEqual([product["rank"] for product in response.json()], [0, 1, 2])
+        with override_settings(LIST_MAX_ROWS=5):
+            response = self.client.get(f"{url}?price_gt=0")
+        self.assertEqual(len(response.json()), 5)
+        self.assertFalse(response.has_header("X-Results-Truncated"))
+
+    @override_settings(
+        DEBUG=True, REQUEST_MEMORY_BUDGET=1, REQUEST_MEMORY_SAMPLE_RATE=1.0
+    )
+    def test_memory_accounting(self):
+        url = reverse("api:products-list")
+        with self.assertLogs("api.guardrails", "WARNING"):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Memory-Peak"]), 0)
+        # traced for sampled requests only
+        self.assertFalse(tracemalloc.is_tracing())
+        with override_settings(REQUEST_MEMORY_SAMPLE_RATE=0):
+            response = self.client.get(url)
+        self.assertFalse(response.has_header("X-Memory-Peak"))
+        with override_settings(REQUEST_MEMORY_REJECT=True), self.assertLogs(
+            "api.guardrails", "WARNING"
+        ), self.assertLogs("django.request", "ERROR"):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 507)
@@ -0,0 +1,220 @@
+"""
+Token bucket rate limiting on top of DRF throttles.
+
+Every scope of DEFAULT_THROTTLE_RATES is a bucket of `n` tokens refilled over
+the period, so clients may burst up to `n` requests and then continue at the
+average rate. Authenticated requests are counted per user, anonymous ones per
+client IP. Views pick a scope with `throttle_scope`, the `user` or `anon`
+scope is used otherwise.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+
+def parse_rate(rate: str) -> Tuple[float, float]:
+    """
+    Parse a DRF rate like `10/min`
+    :param rate:
+    :return: bucket capacity and refill rate in tokens per second
+    """
+    count, period = rate.split("/")
+    capacity = float(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class LocalMemoryBucketStore:
+    """
+    Buckets kept in the memory of the worker process, least recently used first.
+    Counts are per process, so the effective budget grows with the worker count
+    """
+
+    def __init__(self):
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """
+        Take a token from a bucket
+        :param key:
+        :param capacity:
+        :param rate: tokens per second
+        :param now:
+        :return: 0 when the token was taken, otherwise seconds until one is available
+        """
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= settings.THROTTLE_MAX_KEYS:
+                    self.prune(now)
+                self.buckets[key] = [capacity - 1, now]
+                return 0.0
+            self.buckets.move_to_end(key)
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / rate
+
+    def prune(self, now: float) -> None:
+        """
+        Drop buckets idle for an hour, and the least recently used ones to make
+        room for a new bucket. Flooding new keys can't reset every bucket at once
+        :param now:
+        :return:
+        """
+        buckets = self.buckets
+        while buckets:
+            _, last = next(iter(buckets.values()))
+            if len(buckets) < settings.THROTTLE_MAX_KEYS and now - last <= 3600:
+                break
+            buckets.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets kept in the THROTTLE_CACHE cache, shared by every worker using it.
+    Updates are not atomic, concurrent requests of one client may both pass
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE]
+
+    def consume(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """
+        Take a token from a bucket
+        :param key:
+        :param capacity:
+        :param rate: tokens per second
+        :param now:
+        :return: 0 when the token was taken, otherwise seconds until one is available
+        """
+        tokens, last = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        if not wait:
+            tokens -= 1
+        # an untouched bucket is full again after capacity / rate seconds
+        self.cache.set(key, (tokens, now), int(capacity / rate) + 1)
+        return wait
+
+    def clear(self) -> None:
+        # the cache is shared with other data, buckets expire on their own
+        pass
+
+
+class ThrottleMetrics:
+    """
+    Allowed and throttled requests per scope in this worker process
+    """
+
+    def __init__(self):
+        self.allowed: Counter = Counter()
+        self.throttled: Counter = Counter()
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            scope: {"allowed": self.allowed[scope], "throttled": self.throttled[scope]}
+            for scope in sorted(set(self.allowed) | set(self.throttled))
+        }
+
+    def clear(self) -> None:
+        self.allowed.clear()
+        self.throttled.clear()
+
+
+_store = None
+metrics = ThrottleMetrics()
+
+
+def get_store():
+    """
+    Bucket store configured by THROTTLE_STORE, created once per process
+    :return:
+    """
+    global _store
+    if _store is None:
+        _store = import_string(settings.THROTTLE_STORE)()
+    return _store
+
+
+def reset_throttling() -> None:
+    """
+    Forget every bucket and metric, used by tests and after changing the store
+    :return:
+    """
+    global _store
+    if _store is not None:
+        _store.clear()
+    _store = None
+    metrics.clear()
+
+
+@receiver(setting_changed)
+def throttle_settings_changed(setting, **kwargs):
+    if setting in ("REST_FRAMEWORK", "THROTTLE_STORE", "THROTTLE_CACHE"):
+        TokenBucketThrottle.rates.clear()
+        reset_throttling()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle of the view's `throttle_scope`, or of the `user`/`anon` scope
+    """
+
+    rates: Dict[str, Optional[Tuple[float, float]]] = {}
+
+    def __init__(self):
+        self.wait_time = 0.0
+
+    def get_rate(self, scope: str) -> Optional[Tuple[float, float]]:
+        rate = self.rates.get(scope, False)
+        if rate is False:
+            value = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+            rate = self.rates[scope] = parse_rate(value) if value else None
+        return rate
+
+    def allow_request(self, request, view) -> bool:
+        user = request.user
+        authenticated = user is not None and user.is_authenticated
+        scope = getattr(view, "throttle_scope", None) or (
+            "user" if authenticated else "anon"
+        )
+        rate = self.get_rate(scope)
+        if rate is None:
+            return True
+        if authenticated:
+            key = f"throttle:{scope}:user:{user.pk}"
+        else:
+            key = f"throttle:{scope}:ip:{self.get_ident(request)}"
+        self.wait_time = get_store().consume(key, rate[0], rate[1], time.time())
+        if self.wait_time:
+            metrics.throttled[scope] += 1
+            logger.info("Throttled %s", key)
+            return False
+        metrics.allowed[scope] += 1
+        return True
+
+    def wait(self) -> float:
+        return self.wait_time
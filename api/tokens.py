@@ -0,0 +1,175 @@
+"""
+JWT signing without PyJWT's per-call overhead.
+
+PyJWT checks and encodes the key and serializes the constant header on every
+call. For HMAC algorithms `HMACTokenBackend` keys the HMAC once per process and
+copies that state for every signature, issuing the same tokens PyJWT would.
+Tokens it doesn't recognize, and backends with audience or issuer checks, are
+left to PyJWT.
+
+With JWT_COMPACT_CLAIMS tokens drop the `iat` claim and carry a shorter `jti`.
+Refresh tokens are revoked through `users.revocation`.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from typing import Any, Dict
+
+from django.conf import settings
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.revocation import revoked_tokens
+
+DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class HMACTokenBackend(TokenBackend):
+    """
+    TokenBackend signing and verifying HMAC tokens with a precomputed keyed hash
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mac = None
+        if self.algorithm in DIGESTS:
+            key = self.signing_key
+            if isinstance(key, str):
+                key = key.encode()
+            self.mac = hmac.new(key, digestmod=DIGESTS[self.algorithm])
+            self.header = b64encode(
+                json.dumps(
+                    {"alg": self.algorithm, "typ": "JWT"}, separators=(",", ":")
+                ).encode()
+            )
+        self.fast = (
+            self.mac is not None and self.audience is None and self.issuer is None
+        )
+        self.leeway_seconds = self.get_leeway().total_seconds()
+
+    def sign(self, message: bytes) -> bytes:
+        mac = self.mac.copy()
+        mac.update(message)
+        return mac.digest()
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        if not self.fast:
+            return super().encode(payload)
+        message = (
+            self.header
+            + b"."
+            + b64encode(
+                json.dumps(
+                    payload, separators=(",", ":"), cls=self.json_encoder
+                ).encode()
+            )
+        )
+        return (message + b"." + b64encode(self.sign(message))).decode()
+
+    def decode(self, token, verify: bool = True) -> Dict[str, Any]:
+        if not self.fast or not verify:
+            return super().decode(token, verify)
+        if isinstance(token, str):
+            token = token.encode()
+        message, _, signature = token.rpartition(b".")
+        header, _, payload = message.partition(b".")
+        if header != self.header or b"." in payload:
+            # another header serialization or algorithm, or a malformed token:
+            # let PyJWT judge it
+            return super().decode(token, verify)
+        try:
+            valid = hmac.compare_digest(self.sign(message), b64decode(signature))
+            claims = json.loads(b64decode(payload)) if valid else None
+        except (binascii.Error, ValueError) as ex:
+            raise TokenBackendError("Token is invalid or expired") from ex
+        if not isinstance(claims, dict) or not self.valid_claims(claims):
+            raise TokenBackendError("Token is invalid or expired")
+        return claims
+
+    def valid_claims(self, claims: Dict[str, Any]) -> bool:
+        """
+        Time based claim checks of PyJWT
+        :param claims:
+        :return:
+        """
+        now = time.time()
+        try:
+            if "iat" in claims and int(claims["iat"]) > now + self.leeway_seconds:
+                return False
+            if "nbf" in claims and int(claims["nbf"]) > now + self.leeway_seconds:
+                return False
+            if "exp" in claims and int(claims["exp"]) <= now - self.leeway_seconds:
+                return False
+        except (TypeError, ValueError):
+            return False
+        return True
+
+
+token_backend = HMACTokenBackend(
+    api_settings.ALGORITHM,
+    api_settings.SIGNING_KEY,
+    api_settings.VERIFYING_KEY,
+    api_settings.AUDIENCE,
+    api_settings.ISSUER,
+    api_settings.JWK_URL,
+    api_settings.LEEWAY,
+    api_settings.JSON_ENCODER,
+)
+
+
+class CompactClaimsMixin:
+    """
+    Uses the process-wide HMACTokenBackend and honours JWT_COMPACT_CLAIMS
+    """
+
+    _token_backend = token_backend
+
+    def set_iat(self, *args, **kwargs) -> None:
+        if not settings.JWT_COMPACT_CLAIMS:
+            super().set_iat(*args, **kwargs)
+
+    def set_jti(self) -> None:
+        if settings.JWT_COMPACT_CLAIMS:
+            # 128 random bits in 22 characters instead of 32 hex digits
+            self.payload[api_settings.JTI_CLAIM] = secrets.token_urlsafe(16)
+        else:
+            super().set_jti()
+
+
+class AccessToken(CompactClaimsMixin, tokens.AccessToken):
+    pass
+
+
+class RefreshToken(CompactClaimsMixin, tokens.RefreshToken):
+    access_token_class = AccessToken
+
+    def verify(self, *args, **kwargs) -> None:
+        super().verify(*args, **kwargs)
+        if revoked_tokens.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self) -> None:
+        """
+        Revoke this token until it expires, called by the refresh serializer
+        after rotation
+        :return:
+        """
+        revoked_tokens.revoke(
+            self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self["exp"])
+        )
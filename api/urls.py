@@ -1,20 +1,35 @@
 from django.urls import path, re_path
 from api.views import (
     SignInView,
+    RefreshView,
+    LogoutView,
     RegisterView,
     ResetPasswordUpdateAPIView,
     ProductListView,
+    ProductIdsView,
+    ProductFacetsView,
+    ProductAnalyticsView,
+    CategoryListView,
+    CategoryRetrieveView,
     CategoryCreateView,
     CategoryDestroyView,
+    CategoryDeleteStatusView,
     ProductRetrieveView,
+    ProductRecommendationsView,
     ProductUpdateView,
     ProductDeleteView,
     ProductCreateView,
+    ProductBulkUpdateView,
+    ProductBulkDeleteView,
+    CategoryBulkDeleteView,
     WishListCreateView,
     WishListDeleteView,
     WishListUserRetrieveAPIView,
+    WishListShareView,
+    WishListSharedView,
+    ThrottleMetricsView,
+    BatchView,
 )
-from rest_framework_simplejwt.views import TokenRefreshView
 
 app_name = "api"
 
@@ -22,29 +37,70 @@ urlpatterns = [
     # auth
     path("auth/signup/", RegisterView.as_view(), name="auth-signup"),
     path("auth/login/", SignInView.as_view(), name="auth-login"),
-    path("auth/refresh/", TokenRefreshView.as_view(), name="auth-refresh"),
+    path("auth/refresh/", RefreshView.as_view(), name="auth-refresh"),
+    path("auth/logout/", LogoutView.as_view(), name="auth-logout"),
     path(
         "auth/reset_password/",
         ResetPasswordUpdateAPIView.as_view(),
         name="auth-reset-password",
     ),
+    path("throttle/metrics/", ThrottleMetricsView.as_view(), name="throttle-metrics"),
+    path("batch/", BatchView.as_view(), name="batch"),
     # product
     path("products/", ProductListView.as_view(), name="products-list"),
+    path("products/ids/", ProductIdsView.as_view(), name="products-ids"),
+    path("products/facets/", ProductFacetsView.as_view(), name="products-facets"),
+    path(
+        "products/analytics/",
+        ProductAnalyticsView.as_view(),
+        name="products-analytics",
+    ),
     path("product/create/", ProductCreateView.as_view(), name="product-create"),
     path("product/get/<int:pk>/", ProductRetrieveView.as_view(), name="product-get"),
+    path(
+        "product/recommendations/<int:pk>/",
+        ProductRecommendationsView.as_view(),
+        name="product-recommendations",
+    ),
     path(
         "product/update/<int:pk>/", ProductUpdateView.as_view(), name="product-update"
     ),
     path(
         "product/delete/<int:pk>/", ProductDeleteView.as_view(), name="product-delete"
     ),
+    path(
+        "product/bulk/update/",
+        ProductBulkUpdateView.as_view(),
+        name="product-bulk-update",
+    ),
+    path(
+        "product/bulk/delete/",
+        ProductBulkDeleteView.as_view(),
+        name="product-bulk-delete",
+    ),
     # category
+    path("category/", CategoryListView.as_view(), name="category-list"),
+    path(
+        "category/get/<int:pk>/",
+        CategoryRetrieveView.as_view(),
+        name="category-get",
+    ),
     path("category/create/", CategoryCreateView.as_view(), name="category-create"),
     path(
         "category/remove/<int:pk>/",
         CategoryDestroyView.as_view(),
         name="category-remove",
     ),
+    path(
+        "category/remove/status/<int:pk>/",
+        CategoryDeleteStatusView.as_view(),
+        name="category-remove-status",
+    ),
+    path(
+        "category/bulk/delete/",
+        CategoryBulkDeleteView.as_view(),
+        name="category-bulk-delete",
+    ),
     # wishlist
     path("wishlist/create/", WishListCreateView.as_view(), name="wishlist-create"),
     path(
@@ -52,6 +108,12 @@ urlpatterns = [
         WishListDeleteView.as_view(),
         name="wishlist-delete",
     ),
+    path("wishlist/share/", WishListShareView.as_view(), name="wishlist-share"),
+    path(
+        "wishlist/shared/<str:token>/",
+        WishListSharedView.as_view(),
+        name="wishlist-shared",
+    ),
     path(
         "wishlist/<int:user_id>/",
         WishListUserRetrieveAPIView.as_view(),
@@ -13,3 +13,32 @@ def validate_email_address(email_address):
         print(f"The email address {email_address} is not valid")
         return False
     return True
+
+
+def fetch_in_order(queryset, pks):
+    """
+    Used to fetch several objects with a single pk__in query
+    :param queryset: queryset to fetch objects from
+    :param pks: primary keys, already converted to the pk field type
+    :return: tuple of objects in pks order and list of pks that were not found
+    """
+    found = queryset.in_bulk(set(pks))
+    objects = []
+    missing = []
+    for pk in pks:
+        if pk in found:
+            objects.append(found[pk])
+        else:
+            missing.append(pk)
+    return objects, missing
+
+
+def product_etag(product):
+    """
+    Used to build a strong ETag of a product from its updated_time
+    :param product:
+    :return: quoted etag value
+    """
+    updated_time = product.updated_time
+    version = int(updated_time.timestamp()) * 1_000_000 + updated_time.microsecond
+    return f'"{product.pk}-{version}"'
@@ -1,6 +1,12 @@
 from typing import Any
 from django_filters import rest_framework as filters
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.http import parse_etags
 from rest_framework import status
 from rest_framework.generics import (
     RetrieveAPIView,
@@ -8,22 +14,72 @@ from rest_framework.generics import (
     CreateAPIView,
     DestroyAPIView,
     UpdateAPIView,
+    GenericAPIView,
 )
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import (
+    TokenBlacklistView,
+    TokenObtainPairView,
+    TokenRefreshView,
+)
 from product.filters import PriceFilterSet
-from product.models import Product, WishList, ProductCategory
+from product.bulk import (
+    bulk_update_products,
+    bulk_delete_products,
+    bulk_delete_categories,
+)
+from product.models import Product, WishList, ProductCategory, CategoryStats
+from product.popularity import record_wishlist_change
+from product.recommendations import recommend
+from product.registry import category_registry
+from product.cache import (
+    catalog_cache_key,
+    invalidate_catalog,
+    invalidate_wishlists,
+    wishlist_cache_key,
+)
+from product.snapshots import (
+    get_payload,
+    refresh_snapshots_on_commit,
+    share_wishlist,
+    shared_wishlist_ids,
+    unshare_wishlist,
+)
+from product.stats import product_removed
 from api.serializers import (
     ProductSerializer,
+    ProductIdentifiedSerializer,
+    ProductIdsSerializer,
     SignInSerializer,
+    RefreshSerializer,
+    LogoutSerializer,
     ResetPasswordSerializer,
     WishlistSerializer,
     RegisterSerializer,
     CategorySerializer,
     WishlistRetrieveSerializer,
     ProductUpdateSerializer,
+    CategoryStatsSerializer,
+    CategoryRetrieveSerializer,
+    TaskStatusSerializer,
+    ProductBulkUpdateSerializer,
+    BulkDeleteSerializer,
+    AnalyticsQuerySerializer,
+    RecommendationSerializer,
+    WishlistShareSerializer,
+    BatchSerializer,
 )
+from api.batch import run_batch
+from api.compression import payload_response
+from bmag.compression import precompress
+from api.guardrails import render_json_list
+from api.throttling import metrics as throttle_metrics
+from api.utils import fetch_in_order, product_etag
+from tasks.models import Task
+from tasks.queue import enqueue, enqueue_on_commit
 from users.models import User
 
 
@@ -34,6 +90,7 @@ class RegisterView(CreateAPIView):
 
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
+    throttle_scope = "register"
     serializer_class = RegisterSerializer
 
 
@@ -43,9 +100,27 @@ class SignInView(TokenObtainPairView):
     """
 
     permission_classes = (AllowAny,)
+    throttle_scope = "login"
     serializer_class = SignInSerializer
 
 
+class RefreshView(TokenRefreshView):
+    """
+    Returns a new access token for a valid refresh token
+    """
+
+    serializer_class = RefreshSerializer
+
+
+class LogoutView(TokenBlacklistView):
+    """
+    Revokes a refresh token, it can't be used to get access tokens anymore
+    :returns 200 status code
+    """
+
+    serializer_class = LogoutSerializer
+
+
 class ResetPasswordUpdateAPIView(UpdateAPIView):
     """
     Authorization required
@@ -53,6 +128,7 @@ class ResetPasswordUpdateAPIView(UpdateAPIView):
     """
 
     permission_classes = (IsAuthenticated,)
+    throttle_scope = "password_reset"
     queryset = User.objects.all()
     serializer_class = ResetPasswordSerializer
 
@@ -83,26 +159,112 @@ class ResetPasswordUpdateAPIView(UpdateAPIView):
             return Response(data={"error": "Data not valid"})
 
 
+def retrieve_products(data) -> Response:
+    """
+    Used to fetch products by id with one pk__in query
+    :param data: submitted ids
+    :return: found products in submitted order and ids that were not found
+    """
+    serializer = ProductIdsSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    products, missing = fetch_in_order(
+        Product.objects.visible(), serializer.validated_data["ids"]
+    )
+    return Response(
+        {
+            "results": ProductIdentifiedSerializer(products, many=True).data,
+            "missing": missing,
+        }
+    )
+
+
 class ProductListView(ListAPIView):
     """
     Returns a list of all products.
+    Accepts `category` and `category__in` query strings of a category id and
+    comma separated category ids.
+    JSON pages are cached precompressed per query string until the catalog
+    changes, pages limited to categories until products of these categories change.
+    At most LIST_MAX_ROWS products are returned, X-Results-Truncated is set when
+    more matched.
+    Accepts `ids` query string of comma separated product ids to fetch several
+    products in request order with a single query
+    :returns found products and missing ids when fetching by ids
     """
 
     permission_classes = (AllowAny,)
-    queryset = Product.objects.all()
+    throttle_scope = "catalog"
+    queryset = Product.objects.visible()
     serializer_class = ProductSerializer
     filterset_class = PriceFilterSet
     filter_backends = (filters.DjangoFilterBackend,)
 
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        filtered_queryset = self.filter_queryset(queryset)
+        if "ids" in request.query_params:
+            return retrieve_products({"ids": request.query_params["ids"].split(",")})
+        queryset = self.filter_queryset(self.get_queryset())
+        if not queryset.ordered:
+            # the rows kept by the LIST_MAX_ROWS cap, and cached, must not
+            # depend on the plan
+            queryset = queryset.order_by("pk")
+        if request.accepted_renderer.format != "json":
+            rows = list(queryset[: settings.LIST_MAX_ROWS + 1])
+            if not rows:
+                return Response(status=404)
+            response = Response(
+                self.get_serializer(rows[: settings.LIST_MAX_ROWS], many=True).data
+            )
+            truncated = len(rows) > settings.LIST_MAX_ROWS
+        else:
+            key = catalog_cache_key(
+                request.query_params,
+                self.filterset_class(request.query_params).category_ids(),
+            )
+            cached = cache.get(key)
+            if cached is None:
+                data, count, truncated = render_json_list(
+                    queryset, self.get_serializer_class(), settings.LIST_MAX_ROWS
+                )
+                if not count:
+                    return Response(status=404)
+                cached = (precompress(data), truncated)
+                cache.set(key, cached, settings.CATALOG_CACHE_TIMEOUT)
+            payload, truncated = cached
+            response = payload_response(request, payload)
+        if truncated:
+            response["X-Results-Truncated"] = str(settings.LIST_MAX_ROWS)
+        return response
+
+
+class ProductIdsView(GenericAPIView):
+    """
+    Returns several products by id in request order, fetched with a single query.
+    Same as `products/?ids=`, for id lists too long for a query string
+    :returns 200 status code with found products and missing ids
+    """
 
-        ordered_queryset = filtered_queryset.order_by("-price")
+    permission_classes = (AllowAny,)
+    throttle_scope = "catalog"
+    serializer_class = ProductIdsSerializer
+    queryset = Product.objects.visible()
 
-        if not ordered_queryset:
-            return Response(status=404)
-        return self.list(request, *args, **kwargs)
+    def post(self, request, *args, **kwargs):
+        return retrieve_products(request.data)
+
+
+class ProductFacetsView(ListAPIView):
+    """
+    Returns product count and price range of every non-empty category.
+    Served from denormalized category statistics, never scans products.
+    """
+
+    permission_classes = (AllowAny,)
+    serializer_class = CategoryStatsSerializer
+    queryset = (
+        CategoryStats.objects.select_related("category")
+        .filter(product_count__gt=0, category__deleted_time__isnull=True)
+        .order_by("category_id")
+    )
 
 
 class ProductRetrieveView(RetrieveAPIView):
@@ -115,8 +277,36 @@ class ProductRetrieveView(RetrieveAPIView):
     queryset = Product.objects.all()
 
     def get(self, request, *args, **kwargs):
-        wl = get_object_or_404(Product, pk=kwargs["pk"])
+        wl = get_object_or_404(Product.objects.visible(), pk=kwargs["pk"])
         serializer = ProductSerializer(wl)
+        return Response(serializer.data, headers={"ETag": product_etag(wl)})
+
+
+class ProductRecommendationsView(ListAPIView):
+    """
+    Returns products most often wish-listed together with the given one.
+    Accepts `limit` query string, RECOMMENDATIONS_LIMIT by default
+    """
+
+    permission_classes = (AllowAny,)
+    serializer_class = RecommendationSerializer
+    queryset = Product.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(
+                request.query_params.get("limit", settings.RECOMMENDATIONS_LIMIT)
+            )
+        except ValueError:
+            return Response(
+                {"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.RECOMMENDATIONS_MAX_LIMIT))
+        products = []
+        for product, score in recommend(kwargs["pk"], limit):
+            product.score = score
+            products.append(product)
+        serializer = RecommendationSerializer(products, many=True)
         return Response(serializer.data)
 
 
@@ -146,13 +336,35 @@ class ProductUpdateView(UpdateAPIView):
     Authorization required
     Put method makes a complete update
     Patch method makes a partial update
-    Category is a required field for partial update
+    If-Match with the product ETag makes the update conditional
     :returns updated product
     """
 
     permission_classes = (IsAuthenticated,)
     serializer_class = ProductUpdateSerializer
-    queryset = Product.objects.all()
+    queryset = Product.objects.visible()
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        instance = self.get_object()
+        context = self.get_serializer_context()
+        if_match = request.headers.get("If-Match")
+        if if_match:
+            etags = parse_etags(if_match)
+            if "*" not in etags and product_etag(instance) not in etags:
+                return Response(
+                    {"error": "Product was modified"},
+                    status=status.HTTP_412_PRECONDITION_FAILED,
+                )
+            context["updated_time"] = instance.updated_time
+        serializer = self.serializer_class(
+            instance, data=request.data, partial=partial, context=context
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(
+            serializer.data, headers={"ETag": product_etag(serializer.instance)}
+        )
 
     def patch(self, request, *args: Any, **kwargs: Any) -> Response:
         return self.partial_update(request, *args, **kwargs)
@@ -167,8 +379,143 @@ class ProductDeleteView(DestroyAPIView):
 
     permission_classes = (IsAuthenticated,)
     serializer_class = ProductSerializer
+    queryset = Product.objects.visible()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            wishlist_ids = shared_wishlist_ids(product_ids=[instance.pk])
+            instance.delete()
+            product_removed(instance.category_id, instance.price)
+            refresh_snapshots_on_commit(wishlist_ids)
+            invalidate_catalog([instance.category_id])
+            invalidate_wishlists()
+
+
+class ProductBulkUpdateView(GenericAPIView):
+    """
+    Authorization required
+    Applies field changes to a list of products in chunked transactions
+    :returns per-id results
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = ProductBulkUpdateSerializer
     queryset = Product.objects.all()
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_update_products(serializer.validated_data["products"])
+        return Response({"results": results})
+
+
+class ProductBulkDeleteView(GenericAPIView):
+    """
+    Authorization required
+    Deletes a list of products in chunked transactions
+    :returns per-id results
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BulkDeleteSerializer
+    queryset = Product.objects.all()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_delete_products(serializer.validated_data["ids"])
+        return Response({"results": results})
+
+
+class ProductAnalyticsView(GenericAPIView):
+    """
+    Admin only
+    Returns price histogram, per-category price percentiles and currency
+    conversions of the whole catalog, computed with NumPy
+    """
+
+    permission_classes = (IsAdminUser,)
+    serializer_class = AnalyticsQuerySerializer
+    queryset = Product.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        # NumPy is only imported by workers that serve analytics
+        from product.analytics import catalog_report
+
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        report = catalog_report(
+            bins=serializer.validated_data["bins"],
+            currencies=serializer.validated_data.get("currency"),
+        )
+        return Response(report)
+
+
+class BatchView(GenericAPIView):
+    """
+    Runs several GET requests of the API in one round-trip,
+    as the user of the batch request. Product gets are fetched in a single query
+    :returns 200 status code with status, body and ETag of every request in order
+    """
+
+    permission_classes = (AllowAny,)
+    throttle_scope = "batch"
+    serializer_class = BatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            {"responses": run_batch(request, serializer.validated_data["requests"])}
+        )
+
+
+class ThrottleMetricsView(APIView):
+    """
+    Authorization required, admin only
+    Returns allowed and throttled request counts per throttle scope
+    of the worker process serving the request
+    :returns 200 status code
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(throttle_metrics.snapshot())
+
+
+class CategoryListView(ListAPIView):
+    """
+    Returns a list of all categories.
+    Served from the in-memory category registry
+    """
+
+    permission_classes = (AllowAny,)
+    serializer_class = CategoryRetrieveSerializer
+    queryset = ProductCategory.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        serializer = CategoryRetrieveSerializer(category_registry.all(), many=True)
+        return Response(serializer.data)
+
+
+class CategoryRetrieveView(RetrieveAPIView):
+    """
+    Returns a single category by its id.
+    Served from the in-memory category registry
+    """
+
+    permission_classes = (AllowAny,)
+    serializer_class = CategoryRetrieveSerializer
+    queryset = ProductCategory.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        category = category_registry.get(kwargs["pk"])
+        if category is None:
+            raise Http404
+        serializer = CategoryRetrieveSerializer(category)
+        return Response(serializer.data)
+
 
 class CategoryCreateView(CreateAPIView):
     """
@@ -185,13 +532,70 @@ class CategoryCreateView(CreateAPIView):
 class CategoryDestroyView(DestroyAPIView):
     """
     Authorization required
-    Deletes a single product
-    :returns 204 status code and empty response body
+    Deletes a single category with its products
+    Categories with more than CATEGORY_SYNC_DELETE_LIMIT products are
+    soft-deleted and removed by a background task
+    :returns 204 status code and empty response body,
+    or 202 status code and the task to poll on category/remove/status/<task_id>/
     """
 
     permission_classes = (IsAuthenticated,)
     serializer_class = CategorySerializer
-    queryset = ProductCategory.objects.all()
+    queryset = ProductCategory.objects.filter(deleted_time__isnull=True)
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        products_count = Product.objects.filter(category=instance).count()
+        wishlist_ids = shared_wishlist_ids(category_ids=[instance.pk])
+        if products_count <= settings.CATEGORY_SYNC_DELETE_LIMIT:
+            with transaction.atomic():
+                self.perform_destroy(instance)
+                refresh_snapshots_on_commit(wishlist_ids)
+                invalidate_catalog([instance.pk])
+                invalidate_wishlists()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        with transaction.atomic():
+            instance.deleted_time = timezone.now()
+            instance.save(update_fields=["deleted_time"])
+            task = enqueue("product.delete_category", category_id=instance.pk)
+            refresh_snapshots_on_commit(wishlist_ids)
+            invalidate_catalog([instance.pk])
+        return Response(
+            TaskStatusSerializer(task).data, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class CategoryDeleteStatusView(RetrieveAPIView):
+    """
+    Authorization required
+    Returns the state of a background category deletion
+    :returns 200 status code and task status
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = TaskStatusSerializer
+    queryset = Task.objects.filter(name="product.delete_category")
+
+
+class CategoryBulkDeleteView(GenericAPIView):
+    """
+    Authorization required
+    Deletes a list of categories with their products in chunked transactions
+    Categories with more than CATEGORY_SYNC_DELETE_LIMIT products are
+    soft-deleted and removed by a background task
+    :returns per-id results, scheduled ones with the task to poll on
+    category/remove/status/<task_id>/
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BulkDeleteSerializer
+    queryset = ProductCategory.objects.filter(deleted_time__isnull=True)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_delete_categories(serializer.validated_data["ids"])
+        return Response({"results": results})
 
 
 class WishListCreateView(CreateAPIView):
@@ -215,7 +619,16 @@ class WishListCreateView(CreateAPIView):
         request = serializer.context["request"]
         serializer.is_valid(raise_exception=True)
         user = User.objects.get(id=request.user.id)
-        obj = serializer.save(user=user)
+        with transaction.atomic():
+            obj = serializer.save(user=user)
+            event_ids = record_wishlist_change(serializer.data["products"], 1)
+            enqueue_on_commit(
+                "product.wishlist_changed",
+                product_ids=serializer.data["products"],
+                delta=1,
+                event_ids=event_ids,
+            )
+        cache.delete(wishlist_cache_key(user.id))
         return Response(
             {
                 "id": obj.id,
@@ -237,6 +650,20 @@ class WishListDeleteView(DestroyAPIView):
     serializer_class = WishlistSerializer
     queryset = WishList.objects.all()
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            product_ids = list(instance.products.values_list("pk", flat=True))
+            unshare_wishlist(instance)
+            instance.delete()
+            event_ids = record_wishlist_change(product_ids, -1)
+            enqueue_on_commit(
+                "product.wishlist_changed",
+                product_ids=product_ids,
+                delta=-1,
+                event_ids=event_ids,
+            )
+        cache.delete(wishlist_cache_key(instance.user_id))
+
 
 class WishListUserRetrieveAPIView(RetrieveAPIView):
     """
@@ -249,6 +676,55 @@ class WishListUserRetrieveAPIView(RetrieveAPIView):
     queryset = WishList.objects.all()
 
     def get(self, request, *args, **kwargs):
-        wl = get_object_or_404(WishList, user=kwargs["user_id"])
-        serializer = WishlistRetrieveSerializer(wl)
-        return Response(serializer.data)
+        key = wishlist_cache_key(kwargs["user_id"])
+        payload = cache.get(key)
+        if payload is None:
+            wl = get_object_or_404(WishList, user=kwargs["user_id"])
+            serializer = WishlistRetrieveSerializer(wl)
+            payload = precompress(JSONRenderer().render(serializer.data))
+            cache.set(key, payload, settings.CATALOG_CACHE_TIMEOUT)
+        return payload_response(request, payload)
+
+
+class WishListShareView(GenericAPIView):
+    """
+    Authorization required
+    Post creates an opaque share link of the user's wishlist
+    Delete revokes it
+    :returns 201 status code with token and url, or 204 status code
+    """
+
+    permission_classes = (IsAuthenticated,)
+    serializer_class = WishlistShareSerializer
+    queryset = WishList.objects.all()
+
+    def post(self, request, *args, **kwargs):
+        wishlist = get_object_or_404(WishList, user=request.user.id)
+        snapshot = share_wishlist(wishlist)
+        serializer = WishlistShareSerializer(snapshot, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        wishlist = get_object_or_404(WishList, user=request.user.id)
+        unshare_wishlist(wishlist)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class WishListSharedView(RetrieveAPIView):
+    """
+    Returns a shared wishlist by its share token.
+    Served from a precompressed snapshot, without authentication and with a
+    single query checking the share token once the snapshot is cached
+    :returns 200 status code
+    """
+
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    serializer_class = WishlistShareSerializer
+    queryset = WishList.objects.none()
+
+    def get(self, request, *args, **kwargs):
+        payload = get_payload(kwargs["token"])
+        if payload is None:
+            raise Http404
+        return payload_response(request, payload)
@@ -0,0 +1,100 @@
+"""
+Benchmarks of the API hot paths, run from the project root as
+`python -m benchmarks.<name>`.
+
+Every benchmark creates and drops a throwaway test database of the configured
+backend. Set USE_SQLITE=1 to run them without a Postgres server.
+"""
+
+import os
+import random
+import statistics
+import time
+from decimal import Decimal
+from typing import Callable, Dict
+
+import django
+
+
+def setup() -> Callable[[], None]:
+    """
+    Configure Django and create the test database
+    :return: teardown function dropping the test database
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bmag.settings")
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+
+    def teardown() -> None:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    return teardown
+
+
+def seed_catalog(categories: int, products: int, seed: int = 0) -> None:
+    """
+    Fill the catalog with random products spread unevenly over categories
+    :param categories:
+    :param products:
+    :param seed:
+    :return:
+    """
+    from product.models import Product, ProductCategory
+    from product.stats import rebuild_category_stats
+
+    rng = random.Random(seed)
+    ProductCategory.objects.bulk_create(
+        ProductCategory(name=f"Category {i}") for i in range(categories)
+    )
+    category_ids = list(ProductCategory.objects.values_list("pk", flat=True))
+    # a few large categories and a long tail of small ones
+    weights = [1 / (i + 1) for i in range(len(category_ids))]
+    batch = []
+    for i in range(products):
+        batch.append(
+            Product(
+                name=f"Product {i}",
+                price=Decimal(rng.randint(1, 99999)) / 100,
+                rank=rng.randint(1, 1000),
+                category_id=rng.choices(category_ids, weights)[0],
+            )
+        )
+        if len(batch) == 5000:
+            Product.objects.bulk_create(batch)
+            batch = []
+    Product.objects.bulk_create(batch)
+    rebuild_category_stats()
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """
+    Run a function several times
+    :param func:
+    :param repeat:
+    :return: best and median run time in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"best": min(timings), "median": statistics.median(timings)}
+
+
+def report(name: str, timing: Dict[str, float], unit: str = "ms") -> None:
+    """
+    Print a single benchmark result
+    :param name:
+    :param timing:
+    :param unit: unit of the timing values
+    :return:
+    """
+    print(
+        f"{name:<45} best {timing['best']:9.2f} {unit}  median {timing['median']:9.2f} {unit}"
+    )
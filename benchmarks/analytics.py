@@ -0,0 +1,78 @@
+"""
+Vectorized catalog analytics against a per-object loop over the queryset.
+
+    USE_SQLITE=1 python -m benchmarks.analytics --products 100000
+"""
+
+import argparse
+from collections import defaultdict
+from decimal import Decimal
+
+from benchmarks import measure, report, seed_catalog, setup
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def per_object_report(bins: int) -> dict:
+    """
+    The same report built the way it used to be: model instances and Decimals
+    """
+    from django.conf import settings
+
+    from product.models import Product
+
+    prices = []
+    by_category = defaultdict(list)
+    for product in Product.objects.visible():
+        prices.append(product.price)
+        by_category[product.category_id].append(product.price)
+    low, high = min(prices), max(prices)
+    width = (high - low) / bins
+    counts = [0] * bins
+    for price in prices:
+        index = min(int((price - low) / width), bins - 1) if width else 0
+        counts[index] += 1
+    categories = []
+    for category_id, values in sorted(by_category.items()):
+        values.sort()
+        row = {"category": category_id, "count": len(values)}
+        for p in PERCENTILES:
+            row[f"p{p}"] = values[min(len(values) - 1, len(values) * p // 100)]
+        categories.append(row)
+    currencies = {}
+    for code, rate in settings.CURRENCY_RATES.items():
+        rate = Decimal(str(rate))
+        converted = [price * rate for price in prices]
+        currencies[code] = {
+            "min": min(converted),
+            "max": max(converted),
+            "mean": sum(converted) / len(converted),
+        }
+    return {"counts": counts, "categories": categories, "currencies": currencies}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from product.analytics import catalog_report, load_catalog
+
+        seed_catalog(args.categories, args.products)
+        print(f"{args.products} products in {args.categories} categories")
+        report("load columns into arrays", measure(load_catalog, args.repeat))
+        report("vectorized report", measure(catalog_report, args.repeat))
+        report(
+            "per-object loop report",
+            measure(lambda: per_object_report(10), args.repeat),
+        )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Bandwidth and CPU cost of compressing the product list per request against
+serving it from the precompressed cache.
+
+    USE_SQLITE=1 python -m benchmarks.compression --products 10000
+"""
+
+import argparse
+
+from benchmarks import measure, report, seed_catalog, setup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.core.cache import cache
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+
+        from bmag.compression import ENCODINGS, compress
+
+        seed_catalog(args.categories, args.products)
+        # compress the whole catalog, not a LIST_MAX_ROWS page of it
+        override_settings(LIST_MAX_ROWS=args.products).enable()
+        client = APIClient()
+        data = client.get("/api/products/").content
+        print(f"{args.products} products, {len(data)} bytes uncompressed")
+
+        for encoding in ENCODINGS:
+            levels = range(1, 12) if encoding == "br" else range(1, 10)
+            for level in levels:
+                size = len(compress(data, encoding, level))
+                timing = measure(lambda: compress(data, encoding, level), args.repeat)
+                report(
+                    f"{encoding} level {level:<2} {size:>9} bytes "
+                    f"{size / len(data):6.1%}",
+                    timing,
+                )
+
+        def cold():
+            cache.clear()
+            client.get("/api/products/", HTTP_ACCEPT_ENCODING="gzip, br")
+
+        report("request, cache miss (render + precompress)", measure(cold, 3))
+        for accept in ("identity", "gzip", "gzip, br"):
+            report(
+                f"request, cached, Accept-Encoding: {accept}",
+                measure(
+                    lambda: client.get("/api/products/", HTTP_ACCEPT_ENCODING=accept),
+                    args.repeat,
+                ),
+            )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
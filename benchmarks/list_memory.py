@@ -0,0 +1,63 @@
+"""
+Peak memory and time of rendering a product list: the whole queryset through
+one serializer, as the list view did before, against `render_json_list`
+fetching and serializing LIST_CHUNK_SIZE rows at a time.
+
+    USE_SQLITE=1 python -m benchmarks.list_memory --products 50000
+"""
+
+import argparse
+import tracemalloc
+
+from benchmarks import measure, report, seed_catalog, setup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from rest_framework.renderers import JSONRenderer
+
+        from api.guardrails import render_json_list
+        from api.serializers import ProductSerializer
+        from product.models import Product
+
+        seed_catalog(args.categories, args.products)
+
+        def whole():
+            products = Product.objects.visible()
+            return JSONRenderer().render(ProductSerializer(products, many=True).data)
+
+        def capped(max_rows):
+            return lambda: render_json_list(
+                Product.objects.visible(), ProductSerializer, max_rows
+            )[0]
+
+        for name, func in (
+            ("whole queryset", whole),
+            ("chunked, all rows", capped(args.products)),
+            (
+                f"chunked, LIST_MAX_ROWS {settings.LIST_MAX_ROWS}",
+                capped(settings.LIST_MAX_ROWS),
+            ),
+        ):
+            tracemalloc.start()
+            size = len(func())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{name:<45} {size / 2**20:7.1f} MiB JSON, peak {peak / 2**20:7.1f} MiB"
+            )
+            report(name, measure(func, args.repeat))
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Login throughput: full login requests, and issuing and refreshing a token pair
+with simplejwt's PyJWT backend against `api.tokens`.
+
+Password hashing dominates a real login, so logins are also run with the fast
+MD5 hasher to show the cost of the rest of the request.
+
+    USE_SQLITE=1 python -m benchmarks.login --logins 20 --tokens 5000
+"""
+
+import argparse
+
+from benchmarks import measure, report, setup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt import tokens as simplejwt_tokens
+
+        from api import tokens
+        from users.models import User
+
+        client = APIClient()
+        credentials = {"email": "bench@example.com", "password": "bench-password"}
+
+        def logins():
+            for _ in range(args.logins):
+                client.post("/api/auth/login/", credentials)
+
+        # measure the endpoint, not the rate limits
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_CLASSES": []}
+        ):
+            user = User.objects.create_user(**credentials)
+            timing = measure(logins, args.repeat)
+            report(
+                "login, configured hasher, per request",
+                {key: value / args.logins for key, value in timing.items()},
+            )
+            with override_settings(
+                PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+            ):
+                user.set_password(credentials["password"])
+                user.save()
+                timing = measure(logins, args.repeat)
+            report(
+                "login, MD5 hasher, per request",
+                {key: value / args.logins for key, value in timing.items()},
+            )
+
+        def per_token(func):
+            def run():
+                for _ in range(args.tokens):
+                    func()
+
+            timing = measure(run, args.repeat)
+            return {key: value * 1000 / args.tokens for key, value in timing.items()}
+
+        def previous_pair():
+            # the former SignInSerializer: a pair from TokenObtainPairSerializer,
+            # then another refresh and access token for the lifetime
+            refresh = simplejwt_tokens.RefreshToken.for_user(user)
+            str(refresh), str(refresh.access_token)
+            simplejwt_tokens.RefreshToken.for_user(user).access_token.lifetime
+
+        def pair():
+            refresh = tokens.RefreshToken.for_user(user)
+            access = refresh.access_token
+            str(refresh), str(access), access.lifetime
+
+        report("token pair, previous login", per_token(previous_pair), "µs")
+        report("token pair, api.tokens", per_token(pair), "µs")
+        with override_settings(JWT_COMPACT_CLAIMS=True):
+            report("token pair, api.tokens compact claims", per_token(pair), "µs")
+
+        for name, module in (("simplejwt", simplejwt_tokens), ("api.tokens", tokens)):
+            token = str(module.RefreshToken.for_user(user))
+            report(
+                f"refresh, {name}",
+                per_token(lambda: str(module.RefreshToken(token).access_token)),
+                "µs",
+            )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Category-scoped product queries before and after partitioning the product
+table by category, and how many partitions the planner keeps. PostgreSQL only,
+the table can't be partitioned back, so every run seeds a fresh database.
+
+    python -m benchmarks.partitioning --strategy list --products 1000000
+    python -m benchmarks.partitioning --strategy hash --partitions 16
+"""
+
+import argparse
+import re
+
+from benchmarks import measure, report, seed_catalog, setup
+
+SCAN = re.compile(r"Scan(?: using \w+)? on (product_product\w*)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--strategy", choices=("list", "hash"), default="list")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from django.db import connection
+
+        from product.models import Product, ProductCategory
+        from product.partitioning import partition_products
+
+        if connection.vendor != "postgresql":
+            print("Partitioning needs PostgreSQL, unset USE_SQLITE")
+            return
+
+        seed_catalog(args.categories, args.products)
+        category_ids = list(
+            ProductCategory.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        cases = {
+            "large category": {"category_id": category_ids[0]},
+            "small category": {"category_id": category_ids[-1]},
+            "three categories": {"category_id__in": category_ids[-3:]},
+        }
+
+        def page(lookups):
+            return lambda: list(
+                Product.objects.visible()
+                .filter(**lookups)
+                .order_by("rank")[: settings.LIST_MAX_ROWS]
+            )
+
+        def scanned(lookups):
+            plan = Product.objects.visible().filter(**lookups).explain()
+            return sorted(set(SCAN.findall(plan)) - {"product_productcategory"})
+
+        def run(label):
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            for name, lookups in cases.items():
+                tables = scanned(lookups)
+                print(f"{name}, {label}: scans {len(tables)} of {', '.join(tables)}")
+                report(f"{name}, {label}", measure(page(lookups), args.repeat))
+
+        run("unpartitioned")
+        timing = measure(lambda: partition_products(args.strategy, args.partitions), 1)
+        report(f"partition {args.products} products by {args.strategy}", timing)
+        run(f"{args.strategy} partitions")
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Latency of the hot queries of `api.views`, product by id, wishlist by user and
+a filtered product list page, planned per query against executed from
+statements prepared once on the connection by `bmag.db`. PostgreSQL only.
+
+    python -m benchmarks.prepared_statements --queries 2000
+"""
+
+import argparse
+import os
+import random
+
+from benchmarks import measure, report, seed_catalog, setup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_PREPARED_STATEMENTS"] = "1"
+    teardown = setup()
+    try:
+        from django.db import connection
+
+        from product.filters import PriceFilterSet
+        from product.models import Product, ProductCategory, WishList
+        from users.models import User
+
+        if connection.vendor != "postgresql":
+            print("Prepared statements need PostgreSQL, unset USE_SQLITE")
+            return
+
+        seed_catalog(args.categories, args.products)
+        rng = random.Random(0)
+        users = User.objects.bulk_create(
+            User(email=f"user{i}@example.com") for i in range(args.users)
+        )
+        wishlists = WishList.objects.bulk_create(WishList(user=user) for user in users)
+        product_ids = list(Product.objects.values_list("pk", flat=True))
+        WishList.products.through.objects.bulk_create(
+            WishList.products.through(wishlist=wishlist, product_id=product_id)
+            for wishlist in wishlists
+            for product_id in rng.sample(product_ids, 10)
+        )
+        category_ids = list(ProductCategory.objects.values_list("pk", flat=True))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        picked = [rng.choice(product_ids) for _ in range(args.queries)]
+        user_ids = [rng.choice(users).pk for _ in range(args.queries)]
+        filters = [
+            {
+                "category": str(rng.choice(category_ids)),
+                "price_min": str(rng.randint(1, 500)),
+                "sorting": "rank",
+            }
+            for _ in range(args.queries)
+        ]
+
+        def product_by_id():
+            for pk in picked:
+                Product.objects.visible().get(pk=pk)
+
+        def wishlist_by_user():
+            for user_id in user_ids:
+                list(WishList.objects.get(user=user_id).products.all())
+
+        def list_page():
+            for params in filters:
+                filterset = PriceFilterSet(params, queryset=Product.objects.visible())
+                list(filterset.qs[: args.page])
+
+        def per_query(func):
+            timing = measure(func, args.repeat)
+            return {key: value * 1000 / args.queries for key, value in timing.items()}
+
+        connection.ensure_connection()
+        for label, threshold in (("planned per query", None), ("prepared", 1)):
+            connection.connection.prepare_threshold = threshold
+            for name, func in (
+                ("product by id", product_by_id),
+                ("wishlist by user", wishlist_by_user),
+                (f"list page of {args.page}, category and price", list_page),
+            ):
+                report(f"{name}, {label}", per_query(func), "µs")
+        print(f"{len(connection.connection.prepared)} statements prepared")
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
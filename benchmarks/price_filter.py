@@ -0,0 +1,84 @@
+"""
+Product list price filters on a large catalog, with and without the
+(price, rank) index, and impossible ranges against the query they used to run.
+
+    USE_SQLITE=1 python -m benchmarks.price_filter --products 200000
+"""
+
+import argparse
+
+from benchmarks import measure, report, seed_catalog, setup
+
+CASES = {
+    "narrow range": {"price_min": "100", "price_max": "105"},
+    "narrow range, sorted by rank": {
+        "price_min": "100",
+        "price_max": "105",
+        "sorting": "rank",
+    },
+    "wide range, sorted by rank": {
+        "price_gt": "10",
+        "price_lt": "900",
+        "sorting": "rank",
+    },
+    "impossible range": {"price_gt": "5000"},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from django.db import connection
+
+        from product.filters import PriceFilterSet
+        from product.models import Product
+
+        seed_catalog(args.categories, args.products)
+        with connection.cursor() as cursor:
+            # planner statistics of the seeded catalog
+            cursor.execute("ANALYZE")
+
+        def page(params):
+            def run():
+                filterset = PriceFilterSet(params, queryset=Product.objects.visible())
+                return list(filterset.qs[: settings.LIST_MAX_ROWS])
+
+            return run
+
+        def previous(params):
+            # NumberFilter lookups as they were, without range checks
+            lookups = {
+                f"price__{name[len('price_'):]}": value
+                for name, value in params.items()
+                if name in ("price_gt", "price_lt")
+            }
+            return lambda: list(
+                Product.objects.visible().filter(**lookups)[: settings.LIST_MAX_ROWS]
+            )
+
+        index = Product._meta.indexes[0]
+        with connection.schema_editor() as editor:
+            editor.remove_index(Product, index)
+        for name, params in CASES.items():
+            report(f"{name}, no index", measure(page(params), args.repeat))
+        report(
+            "impossible range, previous filter",
+            measure(previous(CASES["impossible range"]), args.repeat),
+        )
+        with connection.schema_editor() as editor:
+            editor.add_index(Product, index)
+        for name, params in CASES.items():
+            report(f"{name}, (price, rank) index", measure(page(params), args.repeat))
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Fetching a list of products: one `products/?ids=` request against one
+`product/get/<id>/` request per product, through the full request cycle.
+
+    USE_SQLITE=1 python -m benchmarks.product_ids --products 20000 --ids 10 50 100
+"""
+
+import argparse
+import random
+
+from benchmarks import measure, report, seed_catalog, setup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--ids", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+
+        from product.models import Product
+
+        seed_catalog(args.categories, args.products)
+        pks = list(Product.objects.values_list("pk", flat=True))
+        client = APIClient(HTTP_ACCEPT="application/json")
+        rng = random.Random(0)
+
+        # measure the endpoints, not the rate limits
+        with override_settings(
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_CLASSES": [],
+            }
+        ):
+            for count in args.ids:
+                ids = rng.sample(pks, count)
+
+                def single():
+                    for pk in ids:
+                        client.get(f"/api/product/get/{pk}/")
+
+                def by_ids():
+                    client.get(f"/api/products/?ids={','.join(map(str, ids))}")
+
+                report(
+                    f"{count} products, one request each", measure(single, args.repeat)
+                )
+                report(
+                    f"{count} products, ids query string", measure(by_ids, args.repeat)
+                )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-request overhead and worker startup time of the "full" and "api"
+deployment profiles, see DEPLOYMENT_PROFILE in `bmag.settings`.
+
+    USE_SQLITE=1 python -m benchmarks.profiles
+"""
+
+import argparse
+
+from benchmarks import measure, report, setup
+from benchmarks.startup import startup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for profile in ("full", "api"):
+        startup(profile, args.repeat)
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from django.test import Client, override_settings
+
+        from product.models import Product, ProductCategory
+
+        category = ProductCategory.objects.create(name="Water")
+        product = Product.objects.create(
+            name="Bonaqua", price="0.90", rank=1, category=category
+        )
+        profiles = {
+            "full": {},
+            "api": {
+                "ROOT_URLCONF": "bmag.urls_api",
+                "MIDDLEWARE": settings.API_MIDDLEWARE,
+            },
+        }
+        paths = {
+            "product get": f"/api/product/get/{product.pk}/",
+            "not found": "/api/missing/",
+        }
+        for profile, overrides in profiles.items():
+            with override_settings(**overrides):
+                # the handler builds its middleware chain on the first request
+                client = Client()
+                for name, path in paths.items():
+                    client.get(path)
+
+                    def run():
+                        for _ in range(args.requests):
+                            client.get(path)
+
+                    report(
+                        f"{profile} {name}, {args.requests} requests",
+                        measure(run, args.repeat),
+                    )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cost of checking refresh tokens against the revocation list: the in-memory
+bloom filter against a query per check, with many revoked tokens stored.
+
+    USE_SQLITE=1 python -m benchmarks.revocation --revoked 100000 --checks 10000
+"""
+
+import argparse
+import uuid
+from datetime import timedelta
+
+from benchmarks import measure, report, setup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revoked", type=int, default=100000)
+    parser.add_argument("--checks", type=int, default=10000)
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.conf import settings
+        from django.test import override_settings
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        from api.tokens import RefreshToken
+        from users.models import RevokedToken, User
+        from users.revocation import revoked_tokens
+
+        expires_at = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            (
+                RevokedToken(jti=uuid.uuid4().hex, expires_at=expires_at)
+                for _ in range(args.revoked)
+            ),
+            batch_size=5000,
+        )
+        valid = [uuid.uuid4().hex for _ in range(args.checks)]
+
+        def per_check(func):
+            def run():
+                for jti in valid:
+                    func(jti)
+
+            timing = measure(run, args.repeat)
+            return {key: value * 1000 / args.checks for key, value in timing.items()}
+
+        timing = measure(lambda: (revoked_tokens.clear(), revoked_tokens._load()), 1)
+        report(f"filter load, {args.revoked} revoked tokens", timing)
+        bloom = revoked_tokens._load()
+        print(f"filter size {len(bloom.bits) / 1024:.0f} KiB, {bloom.hashes} hashes")
+        report("check, bloom filter", per_check(revoked_tokens.is_revoked), "µs")
+        report(
+            "check, query",
+            per_check(lambda jti: RevokedToken.objects.filter(jti=jti).exists()),
+            "µs",
+        )
+
+        user = User.objects.create_user(email="bench@example.com", password="bench")
+        client = APIClient()
+        tokens = [str(RefreshToken.for_user(user)) for _ in range(args.refreshes)]
+
+        def refreshes():
+            for token in tokens:
+                client.post("/api/auth/refresh/", {"refresh": token})
+
+        # measure the endpoint, not the rate limits
+        with override_settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_CLASSES": []}
+        ):
+            timing = measure(refreshes, 1)
+        report(
+            "refresh with rotation, per request",
+            {key: value / args.refreshes for key, value in timing.items()},
+        )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
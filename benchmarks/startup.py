@@ -0,0 +1,61 @@
+"""
+Worker startup time of the deployment profiles against a target budget.
+Exits with status 1 when the best run of a profile is over its budget.
+
+    USE_SQLITE=1 python -m benchmarks.startup --repeat 20
+
+Use `manage.py profile_startup` to find out where the time goes.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+from typing import Dict
+
+from benchmarks import report
+
+# best startup in milliseconds, measured at about 400 ms (api) and 500 ms (full)
+BUDGETS = {"full": 600, "api": 450}
+
+
+def startup(profile: str, repeat: int) -> Dict[str, float]:
+    """
+    Report worker startup time of a profile, each run in a fresh interpreter
+    """
+    from bmag.startup import startup_time
+
+    runs = [startup_time(profile) for _ in range(repeat)]
+    timing = {
+        "best": min(run["ms"] for run in runs),
+        "median": statistics.median(run["ms"] for run in runs),
+    }
+    report(f"{profile} worker startup, {runs[0]['modules']} modules", timing)
+    return timing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    for profile, budget in BUDGETS.items():
+        parser.add_argument(
+            f"--budget-{profile}",
+            type=float,
+            default=budget,
+            help=f"Budget of the {profile} profile in milliseconds",
+        )
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bmag.settings")
+    over = False
+    for profile in BUDGETS:
+        budget = getattr(args, f"budget_{profile}")
+        timing = startup(profile, args.repeat)
+        if timing["best"] > budget:
+            print(f"{profile} startup is over its budget of {budget:.0f} ms")
+            over = True
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Per-request overhead of the token bucket throttle for each bucket store.
+Exits with status 1 when a store is over the budget of 100 µs per request.
+
+    USE_SQLITE=1 python -m benchmarks.throttling --requests 20000 --clients 5000
+"""
+
+import argparse
+import sys
+
+from benchmarks import measure, report, setup
+
+BUDGET_US = 100
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import override_settings
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        from api.throttling import TokenBucketThrottle
+        from api.views import CategoryListView
+
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(args.requests):
+            request = Request(
+                factory.get(
+                    "/api/category/",
+                    REMOTE_ADDR=f"10.0.{i % args.clients // 256}.{i % 256}",
+                )
+            )
+            request.user = AnonymousUser()
+            requests.append(request)
+        view = CategoryListView()
+
+        def run():
+            for request in requests:
+                TokenBucketThrottle().allow_request(request, view)
+
+        over = False
+        for store in ("LocalMemoryBucketStore", "CacheBucketStore"):
+            for rate, outcome in (("1000000/min", "allowed"), ("1/day", "throttled")):
+                with override_settings(
+                    THROTTLE_STORE=f"api.throttling.{store}",
+                    REST_FRAMEWORK={"DEFAULT_THROTTLE_RATES": {"anon": rate}},
+                ):
+                    timing = measure(run, args.repeat)
+                per_request = {
+                    key: value * 1000 / args.requests for key, value in timing.items()
+                }
+                report(f"{store}, {outcome}, per request", per_request, "µs")
+                over = over or per_request["median"] > BUDGET_US
+        if over:
+            print(f"throttling is over its budget of {BUDGET_US} µs per request")
+        sys.exit(1 if over else 0)
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Precompressed payloads, shared by the apps caching compressed data.
+
+Brotli is used when the optional `brotli` package is installed, gzip otherwise.
+"""
+
+import gzip
+from typing import Dict, Optional
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+
+# preferred first
+ENCODINGS = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compress data with the given encoding
+    :param data:
+    :param encoding: `br` or `gzip`
+    :param level: compression level, COMPRESSION_LEVELS by default
+    :return: compressed data
+    """
+    if level is None:
+        level = settings.COMPRESSION_LEVELS[encoding]
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=level)
+    # mtime=0 keeps the output of equal payloads byte-identical
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    """
+    Decompress data of the given encoding
+    :param data:
+    :param encoding:
+    :return:
+    """
+    if encoding == BROTLI:
+        return brotli.decompress(data)
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    return data
+
+
+def precompress(data: bytes) -> Dict[str, bytes]:
+    """
+    Compress a payload once in every available encoding, for caching.
+    Payloads smaller than COMPRESSION_MIN_SIZE are only kept uncompressed
+    :param data: uncompressed payload
+    :return: mapping of encoding to payload
+    """
+    payload = {IDENTITY: data}
+    if len(data) >= settings.COMPRESSION_MIN_SIZE:
+        for encoding in ENCODINGS:
+            payload[encoding] = compress(
+                data, encoding, settings.COMPRESSION_CACHED_LEVELS[encoding]
+            )
+    return payload
@@ -0,0 +1,4 @@
+"""
+PostgreSQL backend with server-side prepared statements, see `bmag.db.base`.
+Enabled with DATABASE_PREPARED_STATEMENTS, see `bmag.settings`.
+"""
@@ -0,0 +1,248 @@
+"""
+PostgreSQL backend preparing the SELECT statements a connection runs over and
+over, so the server parses and plans each of them once per connection instead
+of once per query.
+
+The ORM builds the same SQL text for the same query shape, e.g. a product by
+id, a wishlist by user or a filtered product list page, and only the
+parameters change. Once a statement ran `prepare_threshold` times on a
+connection it is sent as `PREPARE`, later executions send only
+`EXECUTE name (parameters)`. At most `prepared_statements_max` statements are
+kept per connection, the least recently used one is deallocated beyond it.
+
+Prepared statements live in the server session: the backend needs persistent
+connections, CONN_MAX_AGE, and can't be used behind a pooler in transaction
+mode, which hands every transaction a different session.
+
+`QuerySet.iterator()` runs its statement through a named, server-side cursor,
+which PostgreSQL can't run from a prepared statement. Iterations over at most
+`prepare_chunked_rows` rows, by their LIMIT, such as the capped product list
+page, use a plain cursor instead and are prepared, their rows are buffered on
+the client. Longer and unbounded iterations keep the server-side cursor.
+"""
+
+import itertools
+import re
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import psycopg2
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+PREPARE_THRESHOLD = 2
+PREPARED_STATEMENTS_MAX = 200
+PREPARE_CHUNKED_ROWS = 2000
+
+# statements seen fewer than prepare_threshold times, and statements the
+# server refused to prepare, are forgotten beyond this
+SEEN_STATEMENTS_MAX = 5000
+
+PLACEHOLDER = re.compile(r"%([%s])")
+LIMIT = re.compile(r"LIMIT (\d+)(?: OFFSET \d+)?$")
+
+
+def to_prepared(query: str) -> Tuple[str, int]:
+    """
+    Turn a statement with %s placeholders into the body of a PREPARE
+    :param query: statement as passed to `cursor.execute` with parameters
+    :return: statement with $1, $2... parameters and the number of parameters
+    """
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(1) == "%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return PLACEHOLDER.sub(replace, query), count
+
+
+class PreparingCursor(extensions.cursor):
+    """
+    Cursor executing SELECT statements through the prepared statements of its
+    connection. Server-side cursors and named parameters are left alone
+    """
+
+    def execute(self, query, vars=None):
+        connection = self.connection
+        if (
+            connection.prepare_threshold is None
+            or self.name is not None
+            or not isinstance(query, str)
+            or not query.startswith("SELECT")
+            or isinstance(vars, dict)
+        ):
+            return super().execute(query, vars)
+        prepared = connection.prepared.get(query)
+        if prepared is None:
+            prepared = connection.prepare(self, query, vars)
+            if prepared is None:
+                return super().execute(query, vars)
+        else:
+            connection.prepared.move_to_end(query)
+        name, count = prepared
+        if not count:
+            return super().execute(f"EXECUTE {name}")
+        return super().execute(f"EXECUTE {name} ({', '.join(['%s'] * count)})", vars)
+
+
+class PreparingConnection(extensions.connection):
+    """
+    psycopg2 connection keeping the statements prepared in its session
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = PreparingCursor
+        self.prepare_threshold: Optional[int] = PREPARE_THRESHOLD
+        self.prepared_statements_max = PREPARED_STATEMENTS_MAX
+        self.prepare_chunked_rows = PREPARE_CHUNKED_ROWS
+        # statement text to prepared statement name and number of parameters
+        self.prepared: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self.executions: Dict[str, int] = {}
+        self.unpreparable: Set[str] = set()
+        self._names = itertools.count(1)
+
+    def prepare(self, cursor, query: str, vars) -> Optional[Tuple[str, int]]:
+        """
+        Prepare a statement once it ran prepare_threshold times
+        :param cursor:
+        :param query: statement with %s placeholders
+        :param vars: parameters, None when the statement has no placeholders
+        :return: prepared statement name and number of parameters, or None
+            when the statement isn't prepared
+        """
+        if query in self.unpreparable:
+            return None
+        executions = self.executions.pop(query, 0) + 1
+        if executions < self.prepare_threshold:
+            if len(self.executions) >= SEEN_STATEMENTS_MAX:
+                self.executions.clear()
+            self.executions[query] = executions
+            return None
+        if self.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+            return None
+        if vars is None:
+            # no parameters, psycopg2 sends the statement as is
+            body, count = query, 0
+        else:
+            body, count = to_prepared(query)
+        if count != len(vars or ()):
+            self._unpreparable(query)
+            return None
+        name = f"bmag_{next(self._names)}"
+        # a failed PREPARE would abort the transaction it runs in
+        savepoint = not self.autocommit
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT bmag_prepare")
+            cursor.execute(f"PREPARE {name} AS {body}")
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT bmag_prepare")
+        except psycopg2.Error:
+            # e.g. a parameter whose type the server can't infer
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT bmag_prepare")
+                cursor.execute("RELEASE SAVEPOINT bmag_prepare")
+            self._unpreparable(query)
+            return None
+        self.prepared[query] = (name, count)
+        while len(self.prepared) > self.prepared_statements_max:
+            _, (evicted, _) = self.prepared.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {evicted}")
+        return name, count
+
+    def _unpreparable(self, query: str) -> None:
+        if len(self.unpreparable) >= SEEN_STATEMENTS_MAX:
+            self.unpreparable.clear()
+        self.unpreparable.add(query)
+
+
+class ChunkedCursor:
+    """
+    Cursor of `QuerySet.iterator()`, a plain cursor for statements returning at
+    most `prepare_chunked_rows` rows by their LIMIT, the server-side cursor
+    Django uses otherwise. The cursor is created on execute, once the
+    statement is known
+    """
+
+    def __init__(self, wrapper: "DatabaseWrapper", name: str) -> None:
+        self.wrapper = wrapper
+        self.name = name
+        self.cursor = None
+
+    def execute(self, query, vars=None):
+        name = self.name
+        limit = LIMIT.search(query) if isinstance(query, str) else None
+        if (
+            limit
+            and int(limit.group(1)) <= self.wrapper.connection.prepare_chunked_rows
+        ):
+            name = None
+        self.cursor = base.DatabaseWrapper.create_cursor(self.wrapper, name)
+        return self.cursor.execute(query, vars)
+
+    def close(self) -> None:
+        if self.cursor is not None:
+            self.cursor.close()
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+
+class DatabaseOperations(base.DatabaseOperations):
+    def last_executed_query(self, cursor, sql, params):
+        query = super().last_executed_query(cursor, sql, params)
+        if query is not None and query.startswith("EXECUTE bmag_"):
+            # log the statement, not the execution of its prepared name
+            return cursor.mogrify(sql, params).decode()
+        return query
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend whose connections prepare repeated SELECT statements.
+    Accepts `prepare_threshold`, `prepared_statements_max` and
+    `prepare_chunked_rows` in OPTIONS, a `prepare_threshold` of None disables
+    preparing, a `prepare_chunked_rows` of 0 keeps every `QuerySet.iterator()`
+    on a server-side cursor
+    """
+
+    ops_class = DatabaseOperations
+
+    def create_cursor(self, name=None):
+        if (
+            name
+            and self.connection.prepare_threshold is not None
+            and self.connection.prepare_chunked_rows
+        ):
+            return ChunkedCursor(self, name)
+        return super().create_cursor(name)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("prepare_threshold", None)
+        params.pop("prepared_statements_max", None)
+        params.pop("prepare_chunked_rows", None)
+        params["connection_factory"] = PreparingConnection
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        options = self.settings_dict["OPTIONS"]
+        connection.prepare_threshold = options.get(
+            "prepare_threshold", PREPARE_THRESHOLD
+        )
+        connection.prepared_statements_max = options.get(
+            "prepared_statements_max", PREPARED_STATEMENTS_MAX
+        )
+        connection.prepare_chunked_rows = options.get(
+            "prepare_chunked_rows", PREPARE_CHUNKED_ROWS
+        )
+        return connection
@@ -0,0 +1,127 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.reverse import reverse
+
+from bmag.db.base import to_prepared
+from product.models import Product, ProductCategory
+
+
+class ToPreparedTests(TestCase):
+    def test_to_prepared(self):
+        sql, params = connection.ops.compiler("SQLCompiler")(
+            Product.objects.filter(pk=1, name__contains="a").query, connection, None
+        ).as_sql()
+        body, count = to_prepared(sql)
+        self.assertEqual(count, len(params))
+        self.assertNotIn("%s", body)
+        self.assertEqual(
+            to_prepared("SELECT 1 WHERE a = %s AND b LIKE %s ESCAPE '%%'"),
+            ("SELECT 1 WHERE a = $1 AND b LIKE $2 ESCAPE '%'", 2),
+        )
+
+
+@skipUnless(
+    connection.settings_dict["ENGINE"] == "bmag.db", "needs the bmag.db backend"
+)
+class PreparingBackendTests(TestCase):
+    def setUp(self):
+        connection.ensure_connection()
+        self.raw = connection.connection
+        options = (
+            self.raw.prepare_threshold,
+            self.raw.prepared_statements_max,
+            self.raw.prepare_chunked_rows,
+        )
+
+        def restore():
+            (
+                self.raw.prepare_threshold,
+                self.raw.prepared_statements_max,
+                self.raw.prepare_chunked_rows,
+            ) = options
+
+        self.addCleanup(restore)
+        self.raw.prepare_threshold = 2
+
+    def server_statements(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM pg_prepared_statements")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_prepare_after_threshold(self):
+        query = "SELECT %s::int + 1 AS threshold"
+        with connection.cursor() as cursor:
+            cursor.execute(query, [1])
+            self.assertNotIn(query, self.raw.prepared)
+            cursor.execute(query, [2])
+            self.assertEqual(cursor.fetchone(), (3,))
+            name, count = self.raw.prepared[query]
+            self.assertEqual(count, 1)
+            cursor.execute(query, [3])
+            self.assertEqual(cursor.fetchone(), (4,))
+            self.assertEqual(cursor.query.decode(), f"EXECUTE {name} (3)")
+        self.assertIn(name, self.server_statements())
+
+    def test_unpreparable_in_transaction(self):
+        # the server can't infer the types of the parameters
+        query = "SELECT %s + %s AS untyped"
+        self.raw.prepare_threshold = 1
+        with connection.cursor() as cursor:
+            cursor.execute(query, [1, 2])
+            self.assertEqual(cursor.fetchone(), (3,))
+            self.assertIn(query, self.raw.unpreparable)
+            # the failed PREPARE didn't abort the transaction
+            cursor.execute(query, [2, 2])
+            self.assertEqual(cursor.fetchone(), (4,))
+        self.assertEqual(Product.objects.count(), 0)
+
+    def test_eviction(self):
+        self.raw.prepare_threshold = 1
+        self.raw.prepared_statements_max = 1
+        first = "SELECT %s::int AS evicted"
+        second = "SELECT %s::int AS kept"
+        with connection.cursor() as cursor:
+            cursor.execute(first, [1])
+            name, _ = self.raw.prepared[first]
+            cursor.execute(second, [1])
+        self.assertNotIn(first, self.raw.prepared)
+        self.assertIn(second, self.raw.prepared)
+        self.assertNotIn(name, self.server_statements())
+
+    def test_iterator(self):
+        self.raw.prepare_threshold = 1
+        self.raw.prepare_chunked_rows = 100
+        category = ProductCategory.objects.create(name="Water")
+        Product.objects.bulk_create(
+            Product(name=f"Bonaqua {i}", price=1, rank=i, category=category)
+            for i in range(5)
+        )
+        bounded = Product.objects.filter(category=category).order_by("pk")
+        self.assertEqual(len(list(bounded[:100].iterator(chunk_size=2))), 5)
+        self.assertTrue([query for query in self.raw.prepared if "LIMIT 100" in query])
+        # unbounded and longer iterations keep their server-side cursor
+        for queryset in (bounded[:101], bounded.filter(rank__gte=0)):
+            self.assertEqual(len(list(queryset.iterator(chunk_size=2))), 5)
+            self.assertFalse(
+                [
+                    query
+                    for query in [*self.raw.prepared, *self.raw.executions]
+                    if "LIMIT 101" in query or 'rank" >=' in query
+                ]
+            )
+
+    def test_list_page_prepared(self):
+        category = ProductCategory.objects.create(name="Water")
+        Product.objects.create(name="Sprite", price=1.15, rank=3, category=category)
+        url = reverse("api:products-list")
+        for _ in range(2):
+            cache.clear()
+            response = self.client.get(url, {"category": category.id})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 1)
+        limit = f"LIMIT {settings.LIST_MAX_ROWS + 1}"
+        self.assertTrue([query for query in self.raw.prepared if limit in query])
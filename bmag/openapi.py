@@ -0,0 +1,36 @@
+"""
+drf_yasg objects of the API documentation.
+
+Importing drf_yasg is costly, so this module is only imported on first use of
+the Swagger UI or when the schema is generated, see `bmag.schema`. Schema
+overrides of the views are applied here for the same reason.
+"""
+
+from django.conf import settings
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+from api.serializers import ProductIdsResultSerializer
+from api.views import ProductIdsView
+
+openapi_info = openapi.Info(
+    title="Buy me a gift API",
+    default_version="v1",
+    description="Vinhood wants to create a new service for customers to add their favorite products to a wishlist, and the name of the service is BUY-ME-A-GIFT.",
+)
+# POST answers 200 with found products and missing ids, not the 201 of a creation
+swagger_auto_schema(responses={200: ProductIdsResultSerializer})(ProductIdsView.post)
+
+# The Swagger UI loads the prebuilt schema from SWAGGER_SETTINGS["SPEC_URL"],
+# so the UI view itself enumerates no patterns and introspects nothing.
+schema_view = get_schema_view(
+    openapi_info,
+    patterns=[],
+    public=True,
+    permission_classes=[permissions.AllowAny],
+)
+swagger_ui_view = schema_view.with_ui(
+    "swagger", cache_timeout=settings.OPENAPI_SCHEMA_MAX_AGE
+)
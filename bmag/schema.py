@@ -0,0 +1,86 @@
+"""
+Prebuilt OpenAPI schema of the API.
+
+The schema is generated once by `manage.py generate_openapi_schema` into
+OPENAPI_SCHEMA_PATH and served as a static file, so drf_yasg never introspects
+the views on a request.
+"""
+
+import functools
+import hashlib
+from typing import Dict
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.urls import include, path
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from api.compression import payload_response
+from bmag.compression import precompress
+
+
+def generate_schema() -> bytes:
+    """
+    Introspect the API views and render the schema as JSON
+    :return:
+    """
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    from bmag.openapi import openapi_info
+
+    generator = OpenAPISchemaGenerator(
+        openapi_info, patterns=[path("api/", include("api.urls"))]
+    )
+    schema = generator.get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[], pretty=True).encode(schema)
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema() -> Dict[str, bytes]:
+    """
+    Read the prebuilt schema once per process, generating it when the file is
+    missing
+    :return: precompressed schema
+    """
+    try:
+        data = settings.OPENAPI_SCHEMA_PATH.read_bytes()
+    except FileNotFoundError:
+        data = generate_schema()
+    return precompress(data)
+
+
+def schema_etag() -> str:
+    """
+    Validator of the prebuilt schema, weak as it covers every content encoding
+    :return:
+    """
+    return 'W/"{}"'.format(hashlib.md5(load_schema()["identity"]).hexdigest())
+
+
+def schema_file_view(request: HttpRequest) -> HttpResponse:
+    """
+    Returns the prebuilt OpenAPI schema with long-lived caching headers
+    :param request:
+    :return:
+    """
+    etag = schema_etag()
+    if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = payload_response(request, load_schema())
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
+
+
+def swagger_ui_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+    """
+    Returns the Swagger UI, drf_yasg is imported on the first request
+    :param request:
+    :return:
+    """
+    from bmag.openapi import swagger_ui_view as view
+
+    return view(request, *args, **kwargs)
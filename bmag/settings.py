@@ -15,6 +15,8 @@ from datetime import timedelta
 from pathlib import Path
 from typing import List
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,10 +43,14 @@ INSTALLED_APPS = [
                      "django.contrib.staticfiles",
                      "product",
                      "users",
+                     "tasks",
+                     "api",
                  ] + LIBRARIES
 
 MIDDLEWARE = [
+    "api.guardrails.MemoryAccountingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -55,6 +61,36 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "bmag.urls"
 
+# Deployment profile, see DEPLOYMENT_PROFILE in the environment
+# "full" serves the admin, the Swagger UI and the API
+# "api" serves only the stateless JWT API, without sessions, CSRF, messages
+# and the admin, with a minimal middleware chain
+DEPLOYMENT_PROFILE = os.environ.get("DEPLOYMENT_PROFILE", "full")
+if DEPLOYMENT_PROFILE not in ("full", "api"):
+    raise ImproperlyConfigured(f"Unknown DEPLOYMENT_PROFILE {DEPLOYMENT_PROFILE!r}")
+
+API_INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "product",
+    "users",
+    "tasks",
+    "api",
+    "rest_framework",
+]
+
+API_MIDDLEWARE = [
+    "api.guardrails.MemoryAccountingMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompressionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+if DEPLOYMENT_PROFILE == "api":
+    INSTALLED_APPS = API_INSTALLED_APPS
+    MIDDLEWARE = API_MIDDLEWARE
+    ROOT_URLCONF = "bmag.urls_api"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -76,7 +112,7 @@ WSGI_APPLICATION = "bmag.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-if "test" in sys.argv:
+if "test" in sys.argv or os.environ.get("USE_SQLITE"):
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
@@ -94,6 +130,29 @@ else:
             "PORT": 5432,
         }
     }
+    # Server-side prepared statements of repeated SELECT statements, see
+    # `bmag.db.base`. Statements stay prepared as long as the connection, so
+    # connections are kept between requests; doesn't work behind a pooler in
+    # transaction mode
+    if os.environ.get("DATABASE_PREPARED_STATEMENTS"):
+        DATABASES["default"].update(
+            ENGINE="bmag.db",
+            CONN_MAX_AGE=600,
+            OPTIONS={"prepare_threshold": 2, "prepared_statements_max": 200},
+        )
+
+# Cache shared by every process, e.g. CACHE_URL=redis://redis:6379/0
+# Without it every process has a cache of its own, invalidations of cached
+# pages, wishlists and the category registry reach other processes only once
+# their entries expire, see CATALOG_CACHE_TIMEOUT and CATEGORY_REGISTRY_TTL.
+# Tests keep a local cache, they clear it
+if os.environ.get("CACHE_URL") and "test" not in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["CACHE_URL"],
+        }
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -140,13 +199,36 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttling.TokenBucketThrottle",
+    ],
+    # proxies in front of the app, the client IP is taken from X-Forwarded-For
+    # past them; 0 uses REMOTE_ADDR, the header is set by the client
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+    # token buckets: burst of n requests, refilled at n per period
+    # per user when authenticated, per client IP otherwise
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "600/min",
+        "user": "1200/min",
+        "catalog": "120/min",
+        "batch": "120/min",
+        "login": "10/min",
+        "register": "5/min",
+        "password_reset": "5/min",
+    },
 }
 
+if DEPLOYMENT_PROFILE == "api":
+    # the browsable API needs sessions and CSRF
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [
+        "rest_framework.renderers.JSONRenderer",
+    ]
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-    "ROTATE_REFRESH_TOKENS": False,
-    "BLACKLIST_AFTER_ROTATION": False,
+    "ROTATE_REFRESH_TOKENS": True,
+    "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
@@ -160,14 +242,112 @@ SIMPLE_JWT = {
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
     "USER_AUTHENTICATION_RULE": "rest_framework_simplejwt.authentication.default_user_authentication_rule",
-    "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "AUTH_TOKEN_CLASSES": ("api.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
     "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
     "JTI_CLAIM": "jti",
 }
 
+# Tokens without the `iat` claim and with a shorter `jti`, see `api.tokens`
+JWT_COMPACT_CLAIMS = False
+
+# Revoked refresh tokens, see `users.revocation` and `manage.py prune_revoked_tokens`
+REVOKED_TOKENS_FILTER_CAPACITY = 100000
+REVOKED_TOKENS_FILTER_ERROR_RATE = 0.001
+REVOKED_TOKENS_SYNC_INTERVAL = 1
+REVOKED_TOKENS_PRUNE_INTERVAL = 3600
+
+# Memory guardrails, see `api.guardrails`
+# list endpoints return at most LIST_MAX_ROWS rows, fetched LIST_CHUNK_SIZE at a time
+LIST_MAX_ROWS = 1000
+LIST_CHUNK_SIZE = 500
+# in debug, the memory allocated by a sample of requests is traced, tracing
+# slows the sampled requests down several times
+REQUEST_MEMORY_SAMPLE_RATE = 0.01
+REQUEST_MEMORY_BUDGET = 64 * 1024 * 1024
+REQUEST_MEMORY_REJECT = False
+
+# Partitioning of the product table by category, PostgreSQL only, see
+# `manage.py partition_products` and `product.partitioning`
+# "list" keeps a partition per category, created along with the category,
+# "hash" spreads categories over PRODUCT_HASH_PARTITIONS partitions
+PRODUCT_PARTITIONING = os.environ.get("PRODUCT_PARTITIONING") or None
+if PRODUCT_PARTITIONING not in (None, "list", "hash"):
+    raise ImproperlyConfigured(
+        f"Unknown PRODUCT_PARTITIONING {PRODUCT_PARTITIONING!r}"
+    )
+PRODUCT_HASH_PARTITIONS = int(os.environ.get("PRODUCT_HASH_PARTITIONS", 16))
+
+# Bulk endpoints
+BULK_CHUNK_SIZE = 500
+BULK_MAX_ITEMS = 5000
+
+# Categories with more products are soft-deleted and removed by a background task
+CATEGORY_SYNC_DELETE_LIMIT = 1000
+CATEGORY_DELETE_CHUNK_SIZE = 500
+
+# Background tasks, see `manage.py run_workers`
+TASK_WORKER_PROCESSES = int(os.environ.get("TASK_WORKER_PROCESSES", 1))
+TASK_WORKER_THREADS = int(os.environ.get("TASK_WORKER_THREADS", 2))
+TASK_POLL_INTERVAL = 1.0
+TASK_RETRIES = 3
+TASK_RETRY_BACKOFF = 5
+TASK_RETRY_BACKOFF_MAX = 600
+TASK_STALE_AFTER = 3600
+TASK_REQUEUE_INTERVAL = 60
+
+# Wishlist popularity, see `manage.py refresh_popularity`
+POPULARITY_TRENDING_WINDOW = 7 * 24 * 3600
+POPULARITY_REFRESH_INTERVAL = 3600
+
+# Wishlist co-occurrence recommendations, see `manage.py rebuild_recommendations`
+RECOMMENDATIONS_LIMIT = 10
+RECOMMENDATIONS_MAX_LIMIT = 50
+RECOMMENDATIONS_WORKERS = 4
+
+# Batch endpoint, see `api.batch`
+BATCH_MAX_REQUESTS = 50
+
+# Products fetched by id list in one request, `products/?ids=1,2,3`
+PRODUCT_IDS_MAX_ITEMS = 100
+
+# Rate limiting, see `api.throttling`
+# "api.throttling.CacheBucketStore" shares the buckets of every worker through
+# the THROTTLE_CACHE cache, given a shared cache backend
+THROTTLE_STORE = "api.throttling.LocalMemoryBucketStore"
+THROTTLE_CACHE = "default"
+THROTTLE_MAX_KEYS = 100000
+
+# Response compression, see `bmag.compression`
+# responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+# per-request compression favours speed
+COMPRESSION_LEVELS = {"gzip": 6, "br": 4}
+# cached payloads are compressed once per cache miss; brotli 10 and 11 save
+# another 20% but cost 10-30x more CPU, see `python -m benchmarks.compression`
+COMPRESSION_CACHED_LEVELS = {"gzip": 9, "br": 9}
+CATALOG_CACHE_TIMEOUT = 60
+# categories are reloaded at least this often, see `product.registry`
+CATEGORY_REGISTRY_TTL = 10
+# shared wishlist payloads, checked against the snapshot table on every request
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60
+
+# Catalog analytics, see `manage.py catalog_analytics`
+ANALYTICS_CHUNK_SIZE = 2000
+BASE_CURRENCY = "EUR"
+CURRENCY_RATES = {
+    "EUR": 1.0,
+    "USD": 1.08,
+    "GBP": 0.86,
+}
+
+# Prebuilt OpenAPI schema, see `manage.py generate_openapi_schema`
+OPENAPI_SCHEMA_PATH = BASE_DIR / "static" / "openapi.json"
+OPENAPI_SCHEMA_MAX_AGE = 60 * 60 * 24
+
 SWAGGER_SETTINGS = {
-    "DEFAULT_INFO": "bmag.urls.openapi_info",
+    "DEFAULT_INFO": "bmag.openapi.openapi_info",
+    "SPEC_URL": "schema-json",
     "VALIDATOR_URL": "http://localhost:8189",
     "USE_SESSION_AUTH": False,
 }
@@ -0,0 +1,96 @@
+"""
+Worker startup measurement.
+
+Every measurement runs a fresh interpreter doing what a WSGI worker does
+before serving its first request: import the WSGI module of its deployment
+profile, which sets up Django, and load the URLconf.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+# WSGI module serving each deployment profile
+WSGI_MODULES = {"full": "bmag.wsgi", "api": "bmag.wsgi_api"}
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start, start_cpu = time.perf_counter(), time.process_time()
+from importlib import import_module
+import_module(sys.argv[1])
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    "ms": (time.perf_counter() - start) * 1000,
+    "cpu_ms": (time.process_time() - start_cpu) * 1000,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def run_startup(profile: str, *options: str) -> subprocess.CompletedProcess:
+    """
+    Start a worker of the given deployment profile in a fresh interpreter
+    :param profile: DEPLOYMENT_PROFILE
+    :param options: interpreter options
+    :return:
+    """
+    env = dict(os.environ, DEPLOYMENT_PROFILE=profile)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "bmag.settings")
+    return subprocess.run(
+        [sys.executable, *options, "-c", STARTUP_SCRIPT, WSGI_MODULES[profile]],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def startup_time(profile: str) -> Dict[str, float]:
+    """
+    Worker startup time of a deployment profile
+    :param profile:
+    :return: wall and CPU startup time in milliseconds and number of imported modules
+    """
+    return json.loads(run_startup(profile).stdout)
+
+
+def import_times(profile: str) -> List[ImportTime]:
+    """
+    Per-module import time of a worker startup, parsed from `-X importtime`
+    :param profile:
+    :return:
+    """
+    rows = []
+    for line in run_startup(profile, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        rows.append(ImportTime(module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def aggregate(rows: List[ImportTime], depth: int = 1) -> Dict[str, Dict[str, int]]:
+    """
+    Sum self import time by package
+    :param rows: result of `import_times`
+    :param depth: number of leading dotted name parts naming a package
+    :return: mapping of package to total self time in microseconds and module count
+    """
+    packages: Dict[str, Dict[str, int]] = defaultdict(
+        lambda: {"self_us": 0, "modules": 0}
+    )
+    for row in rows:
+        package = ".".join(row.module.split(".")[:depth])
+        packages[package]["self_us"] += row.self_us
+        packages[package]["modules"] += 1
+    return dict(packages)
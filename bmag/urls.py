@@ -16,30 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from bmag.schema import schema_file_view, swagger_ui_view
 
-openapi_info = openapi.Info(
-    title="Buy me a gift API",
-    default_version="v1",
-    description="Vinhood wants to create a new service for customers to add their favorite products to a wishlist, and the name of the service is BUY-ME-A-GIFT.",
-)
-schema_view = get_schema_view(
-    openapi_info,
-    patterns=[
-        path("api/", include("api.urls")),
-    ],
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
 urlpatterns = [
-    # Route schema_view.with_ui to serve the Swagger template.
-    path(
-        "",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
+    # Route swagger_ui_view to serve the Swagger template.
+    path("", swagger_ui_view, name="schema-swagger-ui"),
+    path("openapi.json", schema_file_view, name="schema-json"),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls", namespace="api")),
 ]
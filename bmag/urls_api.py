@@ -0,0 +1,12 @@
+"""bmag URL Configuration of the "api" deployment profile
+
+Serves only the API, the admin and the Swagger UI are left to the "full" profile.
+"""
+from django.urls import path, include
+
+from bmag.schema import schema_file_view
+
+urlpatterns = [
+    path("openapi.json", schema_file_view, name="schema-json"),
+    path("api/", include("api.urls", namespace="api")),
+]
@@ -0,0 +1,30 @@
+"""
+WSGI config of the "api" deployment profile, see DEPLOYMENT_PROFILE in
+`bmag.settings`.
+
+The profile serves the prebuilt OpenAPI schema and never generates it, so its
+workers block the optional coreapi/coreschema imports of rest_framework and
+django_filters, which pull in pkg_resources, click and jinja2, see
+`manage.py profile_startup`. A missing schema file is a startup error.
+"""
+
+import os
+import sys
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bmag.settings")
+os.environ.setdefault("DEPLOYMENT_PROFILE", "api")
+
+for module in ("coreapi", "coreschema"):
+    sys.modules.setdefault(module, None)
+
+application = get_wsgi_application()
+
+if not settings.OPENAPI_SCHEMA_PATH.exists():
+    raise ImproperlyConfigured(
+        f"{settings.OPENAPI_SCHEMA_PATH} is missing, "
+        "run `manage.py generate_openapi_schema`"
+    )
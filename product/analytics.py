@@ -0,0 +1,133 @@
+"""
+Vectorized catalog analytics.
+
+Product columns are loaded into NumPy arrays, with prices converted to integer
+cents by the database, so no model instance or Decimal is built per product.
+"""
+
+from itertools import chain, islice
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast, Round
+
+from product.models import Product
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def load_catalog(chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Load price, rank and category columns of visible products
+    :param chunk_size: rows fetched per database round-trip, ANALYTICS_CHUNK_SIZE by default
+    :return: dict of equally long int64 arrays `price` (cents), `rank` and `category`
+    """
+    chunk_size = chunk_size or settings.ANALYTICS_CHUNK_SIZE
+    rows = (
+        Product.objects.visible()
+        .annotate(cents=Cast(Round(F("price") * 100), IntegerField()))
+        .order_by()
+        .values_list("cents", "rank", "category_id")
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks = []
+    while True:
+        chunk = np.fromiter(
+            chain.from_iterable(islice(rows, chunk_size)), dtype=np.int64
+        )
+        if not chunk.size:
+            break
+        chunks.append(chunk.reshape(-1, 3))
+    data = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+    return {"price": data[:, 0], "rank": data[:, 1], "category": data[:, 2]}
+
+
+def price_histogram(prices: np.ndarray, bins: int) -> dict:
+    """
+    Histogram of prices
+    :param prices: prices in cents
+    :param bins: number of equal-width bins
+    :return: dict with `edges` (in currency units) and `counts`
+    """
+    if not prices.size:
+        return {"edges": [], "counts": []}
+    counts, edges = np.histogram(prices, bins=bins)
+    return {
+        "edges": np.round(edges / 100, 2).tolist(),
+        "counts": counts.tolist(),
+    }
+
+
+def category_percentiles(
+    prices: np.ndarray,
+    categories: np.ndarray,
+    percentiles: Sequence[int] = PERCENTILES,
+) -> list:
+    """
+    Price percentiles of every category.
+    Prices are sorted once by category and price, then each category is a slice
+    :param prices: prices in cents
+    :param categories: category id of every price
+    :param percentiles:
+    :return: list of dicts with `category`, `count` and `p<percentile>` prices
+    """
+    if not prices.size:
+        return []
+    order = np.lexsort((prices, categories))
+    prices, categories = prices[order], categories[order]
+    ids, starts, counts = np.unique(categories, return_index=True, return_counts=True)
+    result = []
+    for category_id, start, count in zip(ids, starts, counts):
+        values = np.percentile(prices[start : start + count], percentiles) / 100
+        row = {"category": int(category_id), "count": int(count)}
+        row.update(
+            (f"p{p}", round(float(value), 2)) for p, value in zip(percentiles, values)
+        )
+        result.append(row)
+    return result
+
+
+def convert_prices(prices: np.ndarray, rates: Dict[str, float]) -> dict:
+    """
+    Convert prices to other currencies and summarize them
+    :param prices: prices in cents of BASE_CURRENCY
+    :param rates: mapping of currency code to units per one BASE_CURRENCY unit
+    :return: dict of currency code to `min`, `max`, `mean` and `total`
+    """
+    if not prices.size:
+        return {}
+    codes = list(rates)
+    # one row per currency, one column per product
+    converted = np.outer(np.array([rates[code] for code in codes]), prices) / 100
+    return {
+        code: {
+            "min": round(float(row.min()), 2),
+            "max": round(float(row.max()), 2),
+            "mean": round(float(row.mean()), 2),
+            "total": round(float(row.sum()), 2),
+        }
+        for code, row in zip(codes, converted)
+    }
+
+
+def catalog_report(bins: int = 10, currencies: Optional[Sequence[str]] = None) -> dict:
+    """
+    Price analytics of the whole catalog
+    :param bins: number of histogram bins
+    :param currencies: currency codes from CURRENCY_RATES, all of them by default
+    :return: JSON serializable report
+    """
+    catalog = load_catalog()
+    prices = catalog["price"]
+    rates = settings.CURRENCY_RATES
+    if currencies is not None:
+        rates = {code: rates[code] for code in currencies}
+    return {
+        "count": int(prices.size),
+        "currency": settings.BASE_CURRENCY,
+        "histogram": price_histogram(prices, bins),
+        "categories": category_percentiles(prices, catalog["category"]),
+        "currencies": convert_prices(prices, rates),
+    }
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ProductConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "product"
+
+    def ready(self):
+        from product.models import ProductCategory
+        from product.partitioning import create_category_partition
+        from product.registry import invalidate_category_registry
+
+        post_save.connect(invalidate_category_registry, sender=ProductCategory)
+        post_delete.connect(invalidate_category_registry, sender=ProductCategory)
+        post_save.connect(create_category_partition, sender=ProductCategory)
@@ -0,0 +1,178 @@
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from product.cache import invalidate_catalog, invalidate_wishlists
+from product.models import Product, ProductCategory
+from product.registry import category_registry
+from product.snapshots import refresh_snapshots_on_commit, shared_wishlist_ids
+from tasks.queue import enqueue, enqueue_on_commit
+
+UPDATE_FIELDS = ("name", "price", "rank", "category")
+
+
+def chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    """
+    Split items into consecutive chunks
+    :param items:
+    :param size:
+    :return: iterator over chunks
+    """
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def bulk_update_products(changes: Dict[int, dict]) -> List[dict]:
+    """
+    Apply field changes to many products, one transaction per chunk.
+    Products are grouped by changed field set so every bulk_update writes only
+    the columns that changed. Category statistics are rebuilt once, in the background
+    :param changes: mapping of product id to changed fields
+    :return: per-id results
+    """
+    results = []
+    affected_categories = set()
+    for chunk in chunks(list(changes), settings.BULK_CHUNK_SIZE):
+        now = timezone.now()
+        touched_categories = set()
+        with transaction.atomic():
+            # products of soft-deleted categories belong to the delete task
+            products = (
+                Product.objects.visible().select_for_update(of=("self",)).in_bulk(chunk)
+            )
+            groups: Dict[tuple, List[Product]] = {}
+            for pk in chunk:
+                product = products.get(pk)
+                if product is None:
+                    results.append({"id": pk, "status": "not_found"})
+                    continue
+                old_category_id = product.category_id
+                changed = []
+                for field in UPDATE_FIELDS:
+                    if field not in changes[pk]:
+                        continue
+                    value = changes[pk][field]
+                    if field == "category":
+                        if value.pk == product.category_id:
+                            continue
+                        affected_categories.update((product.category_id, value.pk))
+                    elif value == getattr(product, field):
+                        continue
+                    elif field == "price":
+                        affected_categories.add(product.category_id)
+                    setattr(product, field, value)
+                    changed.append(field)
+                if not changed:
+                    results.append({"id": pk, "status": "unchanged"})
+                    continue
+                product.updated_time = now
+                touched_categories.update((old_category_id, product.category_id))
+                groups.setdefault(tuple(changed), []).append(product)
+                results.append({"id": pk, "status": "updated"})
+            for fields, group in groups.items():
+                Product.objects.bulk_update(group, [*fields, "updated_time"])
+            if groups:
+                invalidate_catalog(touched_categories)
+            refresh_snapshots_on_commit(
+                shared_wishlist_ids(
+                    product_ids=[p.pk for group in groups.values() for p in group]
+                )
+            )
+    if affected_categories:
+        enqueue_on_commit(
+            "product.rebuild_category_stats",
+            category_ids=sorted(affected_categories),
+        )
+    return results
+
+
+def bulk_delete_products(ids: Iterable[int]) -> List[dict]:
+    """
+    Delete many products, one transaction per chunk.
+    Category statistics are rebuilt once, in the background
+    :param ids:
+    :return: per-id results
+    """
+    results = []
+    affected_categories = set()
+    for chunk in chunks(list(ids), settings.BULK_CHUNK_SIZE):
+        with transaction.atomic():
+            existing = dict(
+                Product.objects.visible()
+                .filter(pk__in=chunk)
+                .values_list("pk", "category_id")
+            )
+            wishlist_ids = shared_wishlist_ids(product_ids=existing)
+            Product.objects.filter(pk__in=existing).delete()
+            refresh_snapshots_on_commit(wishlist_ids)
+        affected_categories.update(existing.values())
+        results.extend(
+            {"id": pk, "status": "deleted" if pk in existing else "not_found"}
+            for pk in chunk
+        )
+    if affected_categories:
+        enqueue_on_commit(
+            "product.rebuild_category_stats",
+            category_ids=sorted(affected_categories),
+        )
+        invalidate_catalog(affected_categories)
+        invalidate_wishlists()
+    return results
+
+
+def bulk_delete_categories(ids: Iterable[int]) -> List[dict]:
+    """
+    Delete many categories with their products, one transaction per chunk.
+    Categories with more than CATEGORY_SYNC_DELETE_LIMIT products are
+    soft-deleted and removed by a background task, as a single category
+    deletion does. Soft-deleted categories are reported as not found.
+    The category registry is invalidated once at the end
+    :param ids:
+    :return: per-id results
+    """
+    results = []
+    deleted = set()
+    with category_registry.deferred_invalidation():
+        for chunk in chunks(list(ids), settings.BULK_CHUNK_SIZE):
+            with transaction.atomic():
+                existing = ProductCategory.objects.filter(
+                    pk__in=chunk, deleted_time__isnull=True
+                ).in_bulk()
+                counts = dict(
+                    Product.objects.filter(category_id__in=existing)
+                    .values("category_id")
+                    .annotate(count=Count("pk"))
+                    .values_list("category_id", "count")
+                )
+                wishlist_ids = shared_wishlist_ids(category_ids=existing)
+                now = timezone.now()
+                chunk_results = {}
+                for pk, category in existing.items():
+                    if counts.get(pk, 0) <= settings.CATEGORY_SYNC_DELETE_LIMIT:
+                        continue
+                    category.deleted_time = now
+                    category.save(update_fields=["deleted_time"])
+                    task = enqueue("product.delete_category", category_id=pk)
+                    chunk_results[pk] = {
+                        "id": pk,
+                        "status": "scheduled",
+                        "task": task.id,
+                    }
+                ProductCategory.objects.filter(
+                    pk__in=set(existing) - set(chunk_results)
+                ).delete()
+                refresh_snapshots_on_commit(wishlist_ids)
+            deleted.update(existing)
+            results.extend(
+                chunk_results.get(
+                    pk,
+                    {"id": pk, "status": "deleted" if pk in existing else "not_found"},
+                )
+                for pk in chunk
+            )
+    invalidate_catalog(deleted)
+    invalidate_wishlists()
+    return results
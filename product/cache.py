@@ -0,0 +1,134 @@
+"""
+Cache versions and keys of cached product list pages and wishlists.
+
+Bumping a version orphans every entry keyed with the old one. Other processes
+see the bump at once when the cache is shared between processes, see
+CACHE_URL. Without it every process has a cache of its own, and its entries
+go stale until they expire after CATALOG_CACHE_TIMEOUT seconds, so every
+versioned entry must be cached with a timeout.
+"""
+
+import hashlib
+from typing import Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = "product:catalog:version"
+CATALOG_UNSCOPED_VERSION_KEY = "product:catalog:unscoped:version"
+WISHLIST_VERSION_KEY = "product:wishlist:version"
+
+
+def get_version(key: str) -> int:
+    """
+    Current value of a cache version counter
+    :param key:
+    :return:
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_versions(keys: List[str]) -> List[int]:
+    """
+    Current values of several cache version counters, fetched at once
+    :param keys:
+    :return: versions in the order of keys
+    """
+    versions = cache.get_many(keys)
+    return [versions.get(key) or get_version(key) for key in keys]
+
+
+def bump_version(key: str) -> None:
+    """
+    Increment a cache version counter, orphaning every entry keyed with the old value
+    :param key:
+    :return:
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def bump_version_on_commit(key: str) -> None:
+    """
+    Increment a cache version counter now and once more after commit,
+    so a concurrent read inside the writing transaction can't cache stale data
+    :param key:
+    :return:
+    """
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def category_version_key(category_id: int) -> str:
+    """
+    Cache version key of product list pages limited to a category
+    :param category_id:
+    :return:
+    """
+    return f"product:catalog:category:{category_id}:version"
+
+
+def invalidate_catalog(category_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Drop cached product list pages after a product write. Pages limited to
+    other categories are kept
+    :param category_ids: categories of the written products, before and after
+        the write, None drops every page
+    :return:
+    """
+    if category_ids is None:
+        bump_version_on_commit(CATALOG_VERSION_KEY)
+        return
+    bump_version_on_commit(CATALOG_UNSCOPED_VERSION_KEY)
+    for category_id in set(category_ids):
+        bump_version_on_commit(category_version_key(category_id))
+
+
+def invalidate_wishlists() -> None:
+    """
+    Drop every cached wishlist after products were deleted from them
+    :return:
+    """
+    bump_version_on_commit(WISHLIST_VERSION_KEY)
+
+
+def wishlist_cache_key(user_id: int) -> str:
+    """
+    Cache key of the public wishlist of a user
+    :param user_id:
+    :return:
+    """
+    return f"product:wishlist:{get_version(WISHLIST_VERSION_KEY)}:{user_id}"
+
+
+def catalog_cache_key(
+    query_params, category_ids: Optional[Iterable[int]] = None
+) -> str:
+    """
+    Cache key of a product list page, independent of the query parameter order.
+    Pages limited to categories are versioned by these categories only
+    :param query_params: QueryDict of the request
+    :param category_ids: categories the page is limited to, None for all
+    :return:
+    """
+    query = "&".join(
+        f"{name}={value}"
+        for name in sorted(query_params)
+        for value in query_params.getlist(name)
+    )
+    if category_ids is None:
+        scope = str(get_version(CATALOG_UNSCOPED_VERSION_KEY))
+    else:
+        category_ids = sorted(set(category_ids))
+        versions = get_versions([category_version_key(pk) for pk in category_ids])
+        scope = ",".join(
+            f"{pk}:{version}" for pk, version in zip(category_ids, versions)
+        )
+    digest = hashlib.md5(f"{query}|{scope}".encode()).hexdigest()
+    return f"product:catalog:{get_version(CATALOG_VERSION_KEY)}:{digest}"
@@ -1,23 +1,163 @@
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import Optional, Set, Tuple
+
+from django import forms
+from django.db.models import F
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
 
 from product.models import Product
 
 
+class NullsLowestOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that sorts missing values as the lowest ones, ties by id.
+    Used for popularity, products that were never wish-listed have no popularity row
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, "pk")
+
+    def get_ordering_value(self, param):
+        value = super().get_ordering_value(param)
+        if value.startswith("-"):
+            return F(value[1:]).desc(nulls_last=True)
+        return F(value).asc(nulls_first=True)
+
+
+class PriceBoundFilter(filters.NumberFilter):
+    """
+    Price bound applied by `PriceFilterSet` together with the other bounds
+    """
+
+    def filter(self, qs, value):
+        return qs
+
+
+class CategoryFilter(filters.Filter):
+    """
+    Category id, compared with the `category_id` column without a join
+    """
+
+    field_class = forms.IntegerField
+
+
+class CategoryInFilter(filters.BaseInFilter, CategoryFilter):
+    pass
+
+
+def price_range(
+    price_gt=None, price_lt=None, price_min=None, price_max=None
+) -> Optional[Tuple[Optional[Decimal], Optional[Decimal]]]:
+    """
+    Used to turn price bounds into one inclusive range of values the price
+    column can store. Bounds are rounded to the column's decimal places and
+    bounds beyond its digits are dropped
+    :param price_gt: exclusive lower bound
+    :param price_lt: exclusive upper bound
+    :param price_min: inclusive lower bound
+    :param price_max: inclusive upper bound
+    :return: lowest and highest matching price, None for an unbounded side,
+        or None when no price can match
+    """
+    field = Product._meta.get_field("price")
+    step = Decimal(1).scaleb(-field.decimal_places)
+    highest = Decimal(1).scaleb(field.max_digits - field.decimal_places) - step
+    low, high = -highest, highest
+    # bounds outside the column range are compared before rounding, rounding
+    # a huge exponent to the column's places would overflow
+    if price_gt is not None:
+        if price_gt >= highest:
+            return None
+        if price_gt >= low:
+            low = price_gt.quantize(step, ROUND_FLOOR) + step
+    if price_min is not None:
+        if price_min > highest:
+            return None
+        if price_min > low:
+            low = price_min.quantize(step, ROUND_CEILING)
+    if price_lt is not None:
+        if price_lt <= -highest:
+            return None
+        if price_lt <= high:
+            high = min(high, price_lt.quantize(step, ROUND_CEILING) - step)
+    if price_max is not None:
+        if price_max < -highest:
+            return None
+        if price_max < high:
+            high = price_max.quantize(step, ROUND_FLOOR)
+    if low > high:
+        return None
+    return (low if low > -highest else None, high if high < highest else None)
+
+
 class PriceFilterSet(filters.FilterSet):
     """
-    Used for filtering results based on price_gt and price_lt. Includes sorting by rank and created_time
+    Used for filtering results based on price_gt and price_lt, exclusive, and
+    price_min and price_max, inclusive, and on a category or comma separated
+    categories. Includes sorting by rank, created_time and wishlist popularity.
+    Price bounds are combined into one range, ranges no price can match
+    return no results without a query
     """
 
-    price_gt = filters.NumberFilter(field_name="price", lookup_expr="gt")
-    price_lt = filters.NumberFilter(field_name="price", lookup_expr="lt")
+    category = CategoryFilter(field_name="category_id")
+    category__in = CategoryInFilter(field_name="category_id", lookup_expr="in")
+
+    price_gt = PriceBoundFilter(field_name="price")
+    price_lt = PriceBoundFilter(field_name="price")
+    price_min = PriceBoundFilter(field_name="price")
+    price_max = PriceBoundFilter(field_name="price")
 
-    sorting = filters.OrderingFilter(
+    sorting = NullsLowestOrderingFilter(
         fields=(
             ("rank", "rank"),
             ("created_time", "created_time"),
+            ("popularity__wishlist_count", "popularity"),
+            ("popularity__trending_count", "trending"),
         )
     )
 
     class Meta:
         model = Product
-        fields = ["price_gt", "price_lt"]
+        fields = [
+            "price_gt",
+            "price_lt",
+            "price_min",
+            "price_max",
+            "category",
+            "category__in",
+        ]
+
+    def category_ids(self) -> Optional[Set[int]]:
+        """
+        Used to tell which categories the results are limited to
+        :return: category ids, or None when results aren't limited to categories
+        """
+        if not self.is_valid():
+            return None
+        category = self.form.cleaned_data.get("category")
+        categories = self.form.cleaned_data.get("category__in")
+        if category is None and not categories:
+            return None
+        # both filters apply, either one limits the results
+        return {category} if category is not None else set(categories)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        bounds = price_range(
+            **{
+                name: self.form.cleaned_data.get(name)
+                for name in ("price_gt", "price_lt", "price_min", "price_max")
+            }
+        )
+        if bounds is None:
+            return queryset.none()
+        low, high = bounds
+        if low is not None:
+            queryset = queryset.filter(price__gte=low)
+        if high is not None:
+            queryset = queryset.filter(price__lte=high)
+        return queryset
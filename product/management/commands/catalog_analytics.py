@@ -0,0 +1,31 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from product.analytics import catalog_report
+
+
+class Command(BaseCommand):
+    help = "Print price histogram, per-category percentiles and currency conversions of the catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bins", type=int, default=10, help="Number of histogram bins"
+        )
+        parser.add_argument(
+            "--currency",
+            action="append",
+            dest="currencies",
+            help="Currency code from CURRENCY_RATES, can be repeated. All by default",
+        )
+
+    def handle(self, *args, **options):
+        currencies = options["currencies"]
+        unknown = set(currencies or []) - set(settings.CURRENCY_RATES)
+        if unknown:
+            raise CommandError(f"Unknown currency: {', '.join(sorted(unknown))}")
+        if options["bins"] < 1:
+            raise CommandError("--bins must be positive")
+        report = catalog_report(bins=options["bins"], currencies=currencies)
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from product.partitioning import STRATEGIES, is_partitioned, partition_products
+
+
+class Command(BaseCommand):
+    help = "Partition the product table by category, PostgreSQL only"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--strategy",
+            choices=STRATEGIES,
+            default=settings.PRODUCT_PARTITIONING,
+            help="Partition per category, or hash partitions, defaults to PRODUCT_PARTITIONING",
+        )
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            default=settings.PRODUCT_HASH_PARTITIONS,
+            help="Number of hash partitions, defaults to PRODUCT_HASH_PARTITIONS",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the statements without running them",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning needs PostgreSQL")
+        if options["strategy"] is None:
+            raise CommandError("Set PRODUCT_PARTITIONING or pass --strategy")
+        if is_partitioned():
+            raise CommandError("The product table is already partitioned")
+        if options["strategy"] == "list" and settings.PRODUCT_PARTITIONING != "list":
+            self.stderr.write(
+                f"PRODUCT_PARTITIONING is {settings.PRODUCT_PARTITIONING!r}, set it "
+                f"to {options['strategy']!r} to keep category partitions up to date"
+            )
+        try:
+            statements = partition_products(
+                options["strategy"], options["partitions"], not options["dry_run"]
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if options["dry_run"]:
+            self.stdout.write(";\n".join(statements) + ";")
+            return
+        self.stdout.write(f"Product table partitioned by {options['strategy']}")
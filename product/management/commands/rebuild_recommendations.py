@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from product.recommendations import rebuild_cooccurrence
+
+
+class Command(BaseCommand):
+    help = "Recompute the wishlist co-occurrence table used for recommendations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.RECOMMENDATIONS_WORKERS,
+            help="Number of worker processes counting wishlist pairs",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        pairs = rebuild_cooccurrence(workers=options["workers"])
+        self.stdout.write(
+            f"Stored {pairs} product pairs in {time.perf_counter() - start:.2f}s"
+        )
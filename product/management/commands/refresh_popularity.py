@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from product.popularity import refresh_popularity
+from tasks.models import Task
+from tasks.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = "Recompute wishlist popularity of products and categories"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Enqueue a background refresh repeated every POPULARITY_REFRESH_INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        if not options["schedule"]:
+            refresh_popularity()
+            self.stdout.write("Popularity refreshed")
+            return
+        scheduled = Task.objects.filter(
+            name="product.refresh_popularity",
+            status__in=[Task.PENDING, Task.RUNNING],
+        )
+        if scheduled.exists():
+            self.stdout.write("Popularity refresh is already scheduled")
+            return
+        enqueue("product.refresh_popularity", reschedule=True)
+        self.stdout.write("Popularity refresh scheduled")
@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Custom product queryset
+    """
+
+    def visible(self):
+        """
+        Exclude products of soft-deleted categories waiting for background removal
+        """
+        return self.filter(category__deleted_time__isnull=True)
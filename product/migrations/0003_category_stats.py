@@ -0,0 +1,69 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:47
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+import django.db.models.deletion
+
+
+def populate_category_stats(apps, schema_editor):
+    Product = apps.get_model("product", "Product")
+    ProductCategory = apps.get_model("product", "ProductCategory")
+    CategoryStats = apps.get_model("product", "CategoryStats")
+    aggregates = {
+        row["category_id"]: row
+        for row in Product.objects.values("category_id").annotate(
+            product_count=Count("id"),
+            price_sum=Sum("price"),
+            min_price=Min("price"),
+            max_price=Max("price"),
+        )
+    }
+    CategoryStats.objects.bulk_create(
+        CategoryStats(
+            category_id=category_id,
+            product_count=aggregates.get(category_id, {}).get("product_count", 0),
+            price_sum=aggregates.get(category_id, {}).get("price_sum") or 0,
+            min_price=aggregates.get(category_id, {}).get("min_price"),
+            max_price=aggregates.get(category_id, {}).get("max_price"),
+        )
+        for category_id in ProductCategory.objects.values_list("pk", flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0002_rename_product_wishlist_products"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryStats",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="product.productcategory",
+                    ),
+                ),
+                ("product_count", models.PositiveIntegerField(default=0)),
+                (
+                    "price_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "min_price",
+                    models.DecimalField(decimal_places=2, max_digits=5, null=True),
+                ),
+                (
+                    "max_price",
+                    models.DecimalField(decimal_places=2, max_digits=5, null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate_category_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0003_category_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productcategory",
+            name="deleted_time",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
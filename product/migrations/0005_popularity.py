@@ -0,0 +1,107 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:54
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_popularity(apps, schema_editor):
+    WishList = apps.get_model("product", "WishList")
+    ProductPopularity = apps.get_model("product", "ProductPopularity")
+    CategoryPopularity = apps.get_model("product", "CategoryPopularity")
+    memberships = WishList.products.through.objects
+    ProductPopularity.objects.bulk_create(
+        ProductPopularity(product_id=row["product_id"], wishlist_count=row["count"])
+        for row in memberships.values("product_id").annotate(count=Count("id"))
+    )
+    CategoryPopularity.objects.bulk_create(
+        CategoryPopularity(
+            category_id=row["product__category_id"], wishlist_count=row["count"]
+        )
+        for row in memberships.values("product__category_id").annotate(
+            count=Count("id")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0004_productcategory_deleted_time"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryPopularity",
+            fields=[
+                (
+                    "category",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="product.productcategory",
+                    ),
+                ),
+                ("wishlist_count", models.IntegerField(default=0)),
+                ("trending_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductPopularity",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="product.product",
+                    ),
+                ),
+                ("wishlist_count", models.IntegerField(default=0)),
+                ("trending_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="WishListEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delta", models.SmallIntegerField()),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="product.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="productpopularity",
+            index=models.Index(
+                fields=["wishlist_count"], name="product_pro_wishlis_ef4c4d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productpopularity",
+            index=models.Index(
+                fields=["trending_count"], name="product_pro_trendin_3bd621_idx"
+            ),
+        ),
+        migrations.RunPython(populate_popularity, migrations.RunPython.noop),
+    ]
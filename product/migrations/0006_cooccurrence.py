@@ -0,0 +1,57 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0005_popularity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductCooccurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "other",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="product.product",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="product.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="productcooccurrence",
+            index=models.Index(
+                fields=["product", "-count"], name="product_pro_product_f9d157_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productcooccurrence",
+            constraint=models.UniqueConstraint(
+                fields=("product", "other"), name="unique_product_cooccurrence"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0006_cooccurrence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WishListSnapshot",
+            fields=[
+                (
+                    "wishlist",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="product.wishlist",
+                    ),
+                ),
+                ("token", models.CharField(max_length=64, unique=True)),
+                ("payload", models.BinaryField()),
+                ("updated_time", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
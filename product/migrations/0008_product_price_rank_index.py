@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0007_wishlist_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["price", "rank"], name="product_pro_price_fd187f_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-19 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0008_product_price_rank_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PopularityRefresh",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("refreshed_time", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="wishlistevent",
+            name="pending",
+            field=models.BooleanField(default=False),
+        ),
+    ]
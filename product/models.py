@@ -1,5 +1,7 @@
 from django.db import models
 
+from product.managers import ProductQuerySet
+
 
 # Create your models here.
 class Product(models.Model):
@@ -14,14 +16,49 @@ class Product(models.Model):
     created_time = models.DateTimeField(auto_now_add=True)
     updated_time = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # price range filters of the product list, sorted by rank
+            models.Index(fields=["price", "rank"]),
+        ]
+
 
 class ProductCategory(models.Model):
     """
-    Stores a single product category entry
+    Stores a single product category entry.
+    Large categories are soft-deleted by setting `deleted_time` and removed
+    with their products by a background task
     """
 
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=20)
+    deleted_time = models.DateTimeField(null=True, blank=True)
+
+
+class CategoryStats(models.Model):
+    """
+    Stores denormalized product count and price statistics of a single
+    :model:`product.ProductCategory`. Kept up to date by :mod:`product.stats`.
+    """
+
+    category = models.OneToOneField(
+        "product.ProductCategory",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    product_count = models.PositiveIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    min_price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    max_price = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+
+    @property
+    def avg_price(self):
+        if not self.product_count:
+            return None
+        return round(self.price_sum / self.product_count, 2)
 
 
 class WishList(models.Model):
@@ -32,3 +69,108 @@ class WishList(models.Model):
 
     user = models.OneToOneField("users.User", on_delete=models.CASCADE)
     products = models.ManyToManyField("product.Product")
+
+
+class ProductPopularity(models.Model):
+    """
+    Stores how many wishlists contain a single :model:`product.Product`, overall
+    and within the trending window. Kept up to date by :mod:`product.popularity`.
+    """
+
+    product = models.OneToOneField(
+        "product.Product",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularity",
+    )
+    wishlist_count = models.IntegerField(default=0)
+    trending_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["wishlist_count"]),
+            models.Index(fields=["trending_count"]),
+        ]
+
+
+class CategoryPopularity(models.Model):
+    """
+    Stores how many wishlists contain a product of a single
+    :model:`product.ProductCategory`, overall and within the trending window.
+    """
+
+    category = models.OneToOneField(
+        "product.ProductCategory",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularity",
+    )
+    wishlist_count = models.IntegerField(default=0)
+    trending_count = models.IntegerField(default=0)
+
+
+class WishListEvent(models.Model):
+    """
+    Stores a single addition (`delta` 1) or removal (`delta` -1) of a
+    :model:`product.Product` to a wishlist, used for the trending window.
+    Events are `pending` from the wishlist change until a background task
+    counts them in the popularity tables.
+    """
+
+    product = models.ForeignKey("product.Product", on_delete=models.CASCADE)
+    delta = models.SmallIntegerField()
+    pending = models.BooleanField(default=False)
+    created_time = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class PopularityRefresh(models.Model):
+    """
+    Stores the time of the last popularity refresh. Its single row is locked
+    by the refresh and by the tasks applying wishlist events, so they never
+    run concurrently.
+    """
+
+    refreshed_time = models.DateTimeField(null=True)
+
+
+class ProductCooccurrence(models.Model):
+    """
+    Stores how many wishlists contain both :model:`product.Product` `product` and
+    `other`. Every pair is stored in both directions so recommendations of a
+    product are a single index range scan. Kept up to date by
+    :mod:`product.recommendations`.
+    """
+
+    product = models.ForeignKey(
+        "product.Product", on_delete=models.CASCADE, related_name="+"
+    )
+    other = models.ForeignKey(
+        "product.Product", on_delete=models.CASCADE, related_name="+"
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "other"], name="unique_product_cooccurrence"
+            )
+        ]
+        indexes = [models.Index(fields=["product", "-count"])]
+
+
+class WishListSnapshot(models.Model):
+    """
+    Stores the public share token of a single :model:`product.WishList` and the
+    precomputed gzip compressed JSON served to gift-givers. Kept up to date by
+    :mod:`product.snapshots`.
+    """
+
+    wishlist = models.OneToOneField(
+        "product.WishList",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="snapshot",
+    )
+    token = models.CharField(max_length=64, unique=True)
+    payload = models.BinaryField()
+    updated_time = models.DateTimeField(auto_now=True)
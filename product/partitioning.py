@@ -0,0 +1,216 @@
+"""
+Optional partitioning of the product table by category, PostgreSQL only.
+
+`manage.py partition_products` turns `product_product` into a declaratively
+partitioned table: one LIST partition per category and a default partition,
+or PRODUCT_HASH_PARTITIONS HASH partitions for deployments with too many
+categories for a table each. Queries filtering on `category_id`, as the
+category filters of the product list do, then scan only the partitions of
+the requested categories.
+
+PostgreSQL requires the primary key of a partitioned table to include the
+partition key, so the key becomes (id, category_id) and the database foreign
+keys referencing `product_product(id)` are dropped. Deletes still cascade
+through the ORM, and ids stay unique through the sequence of the id column.
+Migrations adding a foreign key to :model:`product.Product` need
+`db_constraint=False` on a partitioned deployment.
+"""
+
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+TABLE = "product_product"
+UNPARTITIONED = "product_product_unpartitioned"
+DEFAULT_PARTITION = "product_product_default"
+
+STRATEGIES = ("list", "hash")
+
+
+def category_partition(category_id: int) -> str:
+    """
+    Name of the LIST partition of a category
+    :param category_id:
+    :return:
+    """
+    return f"{TABLE}_c{int(category_id)}"
+
+
+def partition_statements(
+    strategy: str, category_ids: Iterable[int], partitions: int
+) -> List[str]:
+    """
+    Statements creating the partitioned product table and its partitions
+    :param strategy: "list" or "hash"
+    :param category_ids: categories getting a LIST partition each
+    :param partitions: number of HASH partitions
+    :return:
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown partitioning strategy {strategy!r}")
+    statements = [
+        f"CREATE TABLE {TABLE} (LIKE {UNPARTITIONED} INCLUDING DEFAULTS "
+        f"INCLUDING STORAGE) "
+        f"PARTITION BY {strategy.upper()} (category_id)"
+    ]
+    if strategy == "list":
+        statements += [
+            f"CREATE TABLE {category_partition(category_id)} "
+            f"PARTITION OF {TABLE} FOR VALUES IN ({int(category_id)})"
+            for category_id in sorted(category_ids)
+        ]
+        statements.append(
+            f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"
+        )
+    else:
+        if partitions < 1:
+            raise ValueError("At least one hash partition is needed")
+        statements += [
+            f"CREATE TABLE {TABLE}_p{remainder} PARTITION OF {TABLE} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            for remainder in range(partitions)
+        ]
+    return statements
+
+
+def is_partitioned() -> bool:
+    """
+    Check whether the product table is partitioned
+    :return:
+    """
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def partition_products(
+    strategy: str, partitions: int, execute: bool = True
+) -> List[str]:
+    """
+    Move the product table into a partitioned table of the same name, in one
+    transaction holding an exclusive lock on the table while rows are copied
+    :param strategy: "list" or "hash"
+    :param partitions: number of HASH partitions
+    :param execute: run the statements, otherwise only return them
+    :return: executed statements
+    """
+    from product.models import ProductCategory
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint "
+            "WHERE conrelid = %s::regclass)",
+            [TABLE, TABLE],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE confrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        references = cursor.fetchall()
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attname = 'id'",
+            [TABLE],
+        )
+        identity = bool(cursor.fetchone()[0])
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        (sequence,) = cursor.fetchone()
+
+    category_ids = ProductCategory.objects.values_list("pk", flat=True)
+    statements = [
+        f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE",
+        f"ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED}",
+    ]
+    if not identity:
+        # a serial column, its default keeps using the sequence, which must
+        # outlive the old table
+        statements.append(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    statements += partition_statements(strategy, category_ids, partitions)
+    statements += [
+        f"INSERT INTO {TABLE} SELECT * FROM {UNPARTITIONED}",
+        *(f"ALTER TABLE {table} DROP CONSTRAINT {name}" for table, name in references),
+        f"DROP TABLE {UNPARTITIONED}",
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, category_id)",
+        *indexes,
+        *(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}"
+            for name, definition in foreign_keys
+        ),
+    ]
+    if identity:
+        # partitioned tables get identity columns only from PostgreSQL 17, the
+        # dropped identity is replaced by a sequence default
+        statements += [
+            f"CREATE SEQUENCE {sequence} OWNED BY {TABLE}.id",
+            f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+            f"SELECT setval('{sequence}', COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}",
+        ]
+    else:
+        statements.append(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+    statements.append(f"ANALYZE {TABLE}")
+    if execute:
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return statements
+
+
+def partitioned_by_list() -> bool:
+    """
+    Check whether the product table has a LIST partition per category,
+    without querying the database unless PRODUCT_PARTITIONING is "list"
+    :return:
+    """
+    return settings.PRODUCT_PARTITIONING == "list" and is_partitioned()
+
+
+def create_category_partition(sender, instance, created: bool, **kwargs) -> None:
+    """
+    Create the LIST partition of a new category, so its products don't all
+    end up in the default partition
+    :return:
+    """
+    if not created or not partitioned_by_list():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {category_partition(instance.pk)} "
+            f"PARTITION OF {TABLE} FOR VALUES IN ({int(instance.pk)})"
+        )
+
+
+def drop_category_partition(category_id: int) -> Optional[str]:
+    """
+    Drop the LIST partition of a category once its products are deleted
+    :param category_id:
+    :return: name of the dropped partition
+    """
+    if not partitioned_by_list():
+        return None
+    name = category_partition(category_id)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is None:
+            return None
+        # products added since the chunked delete would skip the ORM cascade
+        cursor.execute(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+        if cursor.fetchone()[0]:
+            return None
+        cursor.execute(f"DROP TABLE {name}")
+    return name
@@ -0,0 +1,153 @@
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from product.models import (
+    CategoryPopularity,
+    PopularityRefresh,
+    ProductPopularity,
+    WishList,
+    WishListEvent,
+)
+
+
+def _apply(model, key: str, counts: Dict[int, int], delta: int) -> None:
+    """
+    Add delta times count to the popularity rows of the given keys,
+    one UPDATE per distinct count
+    """
+    model.objects.bulk_create(
+        [model(**{key: pk}) for pk in counts], ignore_conflicts=True
+    )
+    by_count: Dict[int, list] = {}
+    for pk, count in counts.items():
+        by_count.setdefault(count, []).append(pk)
+    for count, pks in by_count.items():
+        changes = {"wishlist_count": F("wishlist_count") + delta * count}
+        if delta > 0:
+            changes["trending_count"] = F("trending_count") + count
+        model.objects.filter(**{f"{key}__in": pks}).update(**changes)
+
+
+def _lock() -> PopularityRefresh:
+    """
+    Lock out concurrent refreshes and event applications until the end of the
+    current transaction
+    :return: the refresh state
+    """
+    state, _ = PopularityRefresh.objects.select_for_update().get_or_create(pk=1)
+    return state
+
+
+def record_wishlist_change(product_ids: Iterable[int], delta: int) -> List[int]:
+    """
+    Record products added to (delta 1) or removed from (delta -1) a wishlist
+    as pending events, in the transaction that changes the wishlist
+    :param product_ids:
+    :param delta:
+    :return: ids of the events, to apply with `wishlist_changed`
+    """
+    events = WishListEvent.objects.bulk_create(
+        WishListEvent(product_id=pk, delta=delta, pending=True) for pk in product_ids
+    )
+    return [event.pk for event in events]
+
+
+def wishlist_changed(event_ids: Iterable[int]) -> bool:
+    """
+    Account pending wishlist events in the popularity tables.
+    Events that are already accounted are skipped, so repeated runs and
+    refreshes don't count a change twice
+    :param event_ids:
+    :return: whether any event was pending
+    """
+    with transaction.atomic():
+        _lock()
+        events = WishListEvent.objects.filter(pk__in=list(event_ids), pending=True)
+        rows = list(events.values_list("product_id", "product__category_id", "delta"))
+        for delta in (1, -1):
+            products = Counter(pk for pk, _, d in rows if d == delta)
+            if not products:
+                continue
+            categories = Counter(
+                category_id for _, category_id, d in rows if d == delta
+            )
+            _apply(ProductPopularity, "product_id", products, delta)
+            _apply(CategoryPopularity, "category_id", categories, delta)
+        events.update(pending=False)
+    return bool(rows)
+
+
+def _wishlist_counts(key: str) -> Counter:
+    """
+    Count wishlist memberships per key, less the changes of pending events.
+    Both are read by one statement, which sees a wishlist change together with
+    its events, or neither
+    :param key: product_id or product__category_id
+    :return: counter of wishlist counts
+    """
+    memberships = (
+        WishList.products.through.objects.values_list(key)
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    pending = (
+        WishListEvent.objects.filter(pending=True)
+        .values_list(key)
+        .annotate(count=-Sum("delta"))
+        .order_by()
+    )
+    counts: Counter = Counter()
+    for pk, count in memberships.union(pending, all=True):
+        counts[pk] += count
+    return counts
+
+
+def refresh_popularity() -> None:
+    """
+    Recompute popularity from wishlist membership and the events of the trending
+    window, then drop events that fell out of the window.
+    Changes of pending events are left to the tasks applying them
+    :return:
+    """
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.POPULARITY_TRENDING_WINDOW)
+    added = Q(delta__gt=0, created_time__gte=since, pending=False)
+    with transaction.atomic():
+        state = _lock()
+        products = {
+            pk: ProductPopularity(product_id=pk, wishlist_count=count)
+            for pk, count in _wishlist_counts("product_id").items()
+            if count
+        }
+        categories = {
+            pk: CategoryPopularity(category_id=pk, wishlist_count=count)
+            for pk, count in _wishlist_counts("product__category_id").items()
+            if count
+        }
+        for row in (
+            WishListEvent.objects.filter(added)
+            .values("product_id", "product__category_id")
+            .annotate(count=Count("id"))
+        ):
+            product = products.setdefault(
+                row["product_id"], ProductPopularity(product_id=row["product_id"])
+            )
+            product.trending_count += row["count"]
+            category = categories.setdefault(
+                row["product__category_id"],
+                CategoryPopularity(category_id=row["product__category_id"]),
+            )
+            category.trending_count += row["count"]
+        ProductPopularity.objects.all().delete()
+        ProductPopularity.objects.bulk_create(products.values())
+        CategoryPopularity.objects.all().delete()
+        CategoryPopularity.objects.bulk_create(categories.values())
+        WishListEvent.objects.filter(created_time__lt=since, pending=False).delete()
+        state.refreshed_time = now
+        state.save(update_fields=["refreshed_time"])
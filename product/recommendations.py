@@ -0,0 +1,117 @@
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, permutations
+from operator import itemgetter
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from product.models import Product, ProductCooccurrence, WishList
+
+
+def pair_counts(wishlists: Sequence[Sequence[int]]) -> Counter:
+    """
+    Count product pairs of wishlists, in both directions
+    :param wishlists: product ids of every wishlist
+    :return: counter of (product_id, other_id) pairs
+    """
+    counts: Counter = Counter()
+    for product_ids in wishlists:
+        counts.update(permutations(set(product_ids), 2))
+    return counts
+
+
+def wishlist_changed(product_ids: Iterable[int], delta: int) -> None:
+    """
+    Account a wishlist created (delta 1) or deleted (delta -1) with the given products
+    :param product_ids:
+    :param delta:
+    :return:
+    """
+    product_ids = sorted(set(product_ids))
+    if len(product_ids) < 2:
+        return
+    with transaction.atomic():
+        if delta > 0:
+            ProductCooccurrence.objects.bulk_create(
+                [
+                    ProductCooccurrence(product_id=product_id, other_id=other_id)
+                    for product_id, other_id in permutations(product_ids, 2)
+                ],
+                ignore_conflicts=True,
+            )
+        # one UPDATE per product of the wishlist
+        for product_id in product_ids:
+            ProductCooccurrence.objects.filter(
+                product_id=product_id, other_id__in=product_ids
+            ).update(count=F("count") + delta)
+        if delta < 0:
+            ProductCooccurrence.objects.filter(
+                product_id__in=product_ids, count__lte=0
+            ).delete()
+
+
+def recommend(product_id: int, limit: int) -> List[Tuple[Product, int]]:
+    """
+    Products most often wish-listed together with the given one
+    :param product_id:
+    :param limit:
+    :return: list of (product, number of shared wishlists), best first
+    """
+    rows = list(
+        ProductCooccurrence.objects.filter(product_id=product_id, count__gt=0)
+        .order_by("-count", "other_id")
+        .values_list("other_id", "count")[:limit]
+    )
+    products = Product.objects.visible().in_bulk([other_id for other_id, _ in rows])
+    return [
+        (products[other_id], count) for other_id, count in rows if other_id in products
+    ]
+
+
+def rebuild_cooccurrence(workers: Optional[int] = None) -> int:
+    """
+    Recompute the whole co-occurrence table.
+    Wishlists are split into one chunk per worker and counted in a process pool
+    :param workers: number of worker processes, RECOMMENDATIONS_WORKERS by default
+    :return: number of stored pairs
+    """
+    workers = workers or settings.RECOMMENDATIONS_WORKERS
+    memberships = (
+        WishList.products.through.objects.order_by("wishlist_id")
+        .values_list("wishlist_id", "product_id")
+        .iterator()
+    )
+    wishlists = [
+        [product_id for _, product_id in rows]
+        for _, rows in groupby(memberships, key=itemgetter(0))
+    ]
+    size = max(1, -(-len(wishlists) // workers))
+    chunks = [wishlists[i : i + size] for i in range(0, len(wishlists), size)]
+    counts: Counter = Counter()
+    if workers > 1 and len(chunks) > 1:
+        # forked workers only count pairs, they never use the database
+        # connection they inherit, which may be in the caller's transaction
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        ) as pool:
+            for chunk_counts in pool.map(pair_counts, chunks):
+                counts.update(chunk_counts)
+    else:
+        for chunk in chunks:
+            counts.update(pair_counts(chunk))
+    with transaction.atomic():
+        ProductCooccurrence.objects.all().delete()
+        ProductCooccurrence.objects.bulk_create(
+            (
+                ProductCooccurrence(
+                    product_id=product_id, other_id=other_id, count=count
+                )
+                for (product_id, other_id), count in counts.items()
+            ),
+            batch_size=5000,
+        )
+    return len(counts)
@@ -0,0 +1,115 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from product.cache import bump_version, get_version
+from product.models import ProductCategory
+
+CATEGORY_REGISTRY_VERSION_KEY = "product:category-registry:version"
+
+
+class CategoryRegistry:
+    """
+    Process-local map of all product categories by id.
+
+    Categories are loaded with a single query on first use and kept until a
+    :model:`product.ProductCategory` write invalidates them, or for at most
+    CATEGORY_REGISTRY_TTL seconds. The version kept in the cache lets other
+    processes notice the invalidation without querying the database when the
+    cache is shared, see CACHE_URL; otherwise they reload once the TTL elapsed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._categories: Optional[Dict[int, ProductCategory]] = None
+        self._version: Optional[int] = None
+        self._expires = 0.0
+        self._deferred = threading.local()
+
+    def _load(self) -> Dict[int, ProductCategory]:
+        version = get_version(CATEGORY_REGISTRY_VERSION_KEY)
+        categories = self._categories
+        if (
+            categories is not None
+            and self._version == version
+            and time.monotonic() < self._expires
+        ):
+            return categories
+        with self._lock:
+            if (
+                self._categories is None
+                or self._version != version
+                or time.monotonic() >= self._expires
+            ):
+                self._categories = {
+                    category.pk: category
+                    for category in ProductCategory.objects.filter(
+                        deleted_time__isnull=True
+                    ).order_by("pk")
+                }
+                self._version = version
+                self._expires = time.monotonic() + settings.CATEGORY_REGISTRY_TTL
+            return self._categories
+
+    def get(self, pk: int) -> Optional[ProductCategory]:
+        """
+        Get category by its id
+        :param pk:
+        :return: category or None when it does not exist
+        """
+        return self._load().get(pk)
+
+    def all(self) -> List[ProductCategory]:
+        """
+        Get all categories ordered by id
+        :return:
+        """
+        return list(self._load().values())
+
+    def invalidate(self) -> None:
+        """
+        Drop loaded categories in this and, through the shared cache, in every other process
+        :return:
+        """
+        if getattr(self._deferred, "depth", 0):
+            self._deferred.pending = True
+            return
+        with self._lock:
+            self._categories = None
+            self._version = None
+        bump_version(CATEGORY_REGISTRY_VERSION_KEY)
+
+    @contextmanager
+    def deferred_invalidation(self) -> Iterator[None]:
+        """
+        Collapse every invalidation inside the block into one on exit.
+        Used by batch writes that touch many categories
+        :return:
+        """
+        self._deferred.depth = getattr(self._deferred, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._deferred.depth -= 1
+            if not self._deferred.depth and getattr(self._deferred, "pending", False):
+                self._deferred.pending = False
+                self.invalidate()
+
+
+category_registry = CategoryRegistry()
+
+
+def invalidate_category_registry(**kwargs) -> None:
+    """
+    Signal receiver for category writes.
+    Invalidates immediately and once more after commit, so a concurrent reload
+    inside the writing transaction can't keep stale categories
+    :param kwargs:
+    :return:
+    """
+    category_registry.invalidate()
+    transaction.on_commit(category_registry.invalidate)
@@ -0,0 +1,150 @@
+import json
+import secrets
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from bmag.compression import GZIP, compress, decompress, precompress
+from product.models import Product, WishList, WishListSnapshot
+from tasks.queue import enqueue_on_commit
+
+SNAPSHOT_CACHE_KEY = "product:wishlist-snapshot:{}"
+
+
+def build_payload(wishlist: WishList) -> bytes:
+    """
+    Render the public view of a wishlist as JSON
+    :param wishlist:
+    :return: uncompressed payload
+    """
+    products = [
+        {
+            "id": product.pk,
+            "name": product.name,
+            "price": str(product.price),
+            "category": {"id": product.category_id, "name": product.category.name},
+        }
+        for product in Product.objects.visible()
+        .filter(wishlist=wishlist)
+        .select_related("category")
+        .order_by("pk")
+    ]
+    return json.dumps({"products": products}, separators=(",", ":")).encode()
+
+
+def store_payload(snapshot: WishListSnapshot, data: bytes) -> None:
+    """
+    Save the payload gzip compressed in the table and keep it precompressed in
+    every available encoding in the cache, along with the snapshot update time
+    :param snapshot:
+    :param data: uncompressed payload
+    :return:
+    """
+    snapshot.payload = compress(data, GZIP, settings.COMPRESSION_CACHED_LEVELS[GZIP])
+    if snapshot._state.adding:
+        snapshot.save()
+    else:
+        snapshot.save(update_fields=["payload", "updated_time"])
+    cache.set(
+        SNAPSHOT_CACHE_KEY.format(snapshot.token),
+        (snapshot.updated_time, precompress(data)),
+        settings.SNAPSHOT_CACHE_TIMEOUT,
+    )
+
+
+def share_wishlist(wishlist: WishList) -> WishListSnapshot:
+    """
+    Create the share token of a wishlist, or return the existing one
+    :param wishlist:
+    :return: snapshot with token and payload
+    """
+    snapshot = WishListSnapshot.objects.filter(wishlist=wishlist).first()
+    if snapshot is None:
+        snapshot = WishListSnapshot(wishlist=wishlist, token=secrets.token_urlsafe(32))
+    store_payload(snapshot, build_payload(wishlist))
+    return snapshot
+
+
+def unshare_wishlist(wishlist: WishList) -> None:
+    """
+    Revoke the share token of a wishlist
+    :param wishlist:
+    :return:
+    """
+    for token in WishListSnapshot.objects.filter(wishlist=wishlist).values_list(
+        "token", flat=True
+    ):
+        cache.delete(SNAPSHOT_CACHE_KEY.format(token))
+    WishListSnapshot.objects.filter(wishlist=wishlist).delete()
+
+
+def regenerate_snapshots(wishlist_ids: Iterable[int]) -> None:
+    """
+    Rebuild payloads of shared wishlists and replace them in the cache of
+    this process, other processes notice the new update time
+    :param wishlist_ids:
+    :return:
+    """
+    for snapshot in WishListSnapshot.objects.filter(
+        wishlist_id__in=list(wishlist_ids)
+    ).select_related("wishlist"):
+        store_payload(snapshot, build_payload(snapshot.wishlist))
+
+
+def get_payload(token: str) -> Optional[Dict[str, bytes]]:
+    """
+    Precompressed payload of a shared wishlist.
+    The token and the update time of the snapshot are checked against the table
+    on every request, so tokens revoked or snapshots regenerated by another
+    process, with a cache of its own, are never served stale. The payload is
+    served from the cache, it is only read from the table when it changed
+    :param token:
+    :return: mapping of encoding to payload or None for an unknown token
+    """
+    snapshots = WishListSnapshot.objects.filter(token=token)
+    updated_time = snapshots.values_list("updated_time", flat=True).first()
+    if updated_time is None:
+        return None
+    key = SNAPSHOT_CACHE_KEY.format(token)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == updated_time:
+        return cached[1]
+    row = snapshots.values_list("updated_time", "payload").first()
+    if row is None:
+        return None
+    updated_time, payload = row
+    payload = precompress(decompress(bytes(payload), GZIP))
+    cache.set(key, (updated_time, payload), settings.SNAPSHOT_CACHE_TIMEOUT)
+    return payload
+
+
+def shared_wishlist_ids(
+    product_ids: Optional[Iterable[int]] = None,
+    category_ids: Optional[Iterable[int]] = None,
+) -> List[int]:
+    """
+    Shared wishlists containing any of the given products or products of the given categories.
+    Must be called before the products are deleted
+    :param product_ids:
+    :param category_ids:
+    :return: wishlist ids
+    """
+    snapshots = WishListSnapshot.objects.all()
+    if product_ids is not None:
+        snapshots = snapshots.filter(wishlist__products__in=list(product_ids))
+    if category_ids is not None:
+        snapshots = snapshots.filter(
+            wishlist__products__category_id__in=list(category_ids)
+        )
+    return list(snapshots.values_list("wishlist_id", flat=True).distinct())
+
+
+def refresh_snapshots_on_commit(wishlist_ids: List[int]) -> None:
+    """
+    Regenerate snapshots of the given wishlists in the background after commit
+    :param wishlist_ids:
+    :return:
+    """
+    if wishlist_ids:
+        enqueue_on_commit("product.regenerate_snapshots", wishlist_ids=wishlist_ids)
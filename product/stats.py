@@ -0,0 +1,114 @@
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from product.models import CategoryStats, Product, ProductCategory
+
+
+def rebuild_category_stats(category_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Recompute category statistics from the product table
+    :param category_ids: categories to recompute, all categories when omitted
+    :return:
+    """
+    products = Product.objects.all()
+    categories = ProductCategory.objects.all()
+    if category_ids is not None:
+        category_ids = list(category_ids)
+        products = products.filter(category_id__in=category_ids)
+        categories = categories.filter(pk__in=category_ids)
+    aggregates = {
+        row["category_id"]: row
+        for row in products.values("category_id").annotate(
+            product_count=Count("id"),
+            price_sum=Sum("price"),
+            min_price=Min("price"),
+            max_price=Max("price"),
+        )
+    }
+    stats = []
+    for category_id in categories.values_list("pk", flat=True):
+        row = aggregates.get(category_id, {})
+        stats.append(
+            CategoryStats(
+                category_id=category_id,
+                product_count=row.get("product_count", 0),
+                price_sum=row.get("price_sum") or 0,
+                min_price=row.get("min_price"),
+                max_price=row.get("max_price"),
+            )
+        )
+    CategoryStats.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=["category"],
+        update_fields=["product_count", "price_sum", "min_price", "max_price"],
+    )
+
+
+def product_added(category_id: int, price: Decimal) -> None:
+    """
+    Account a new product in its category statistics
+    :param category_id:
+    :param price:
+    :return:
+    """
+    updated = CategoryStats.objects.filter(category_id=category_id).update(
+        product_count=F("product_count") + 1,
+        price_sum=F("price_sum") + price,
+        min_price=Least(Coalesce("min_price", Value(price)), Value(price)),
+        max_price=Greatest(Coalesce("max_price", Value(price)), Value(price)),
+    )
+    if not updated:
+        rebuild_category_stats([category_id])
+
+
+def product_removed(category_id: int, price: Decimal) -> None:
+    """
+    Remove a deleted product from its category statistics.
+    Falls back to a recompute of the category when the product held its min or max price
+    :param category_id:
+    :param price:
+    :return:
+    """
+    updated = CategoryStats.objects.filter(
+        category_id=category_id, min_price__lt=price, max_price__gt=price
+    ).update(
+        product_count=F("product_count") - 1,
+        price_sum=F("price_sum") - price,
+    )
+    if not updated:
+        rebuild_category_stats([category_id])
+
+
+def product_changed(
+    old_category_id: int,
+    old_price: Decimal,
+    new_category_id: int,
+    new_price: Decimal,
+) -> None:
+    """
+    Move an updated product between category statistics
+    :param old_category_id:
+    :param old_price:
+    :param new_category_id:
+    :param new_price:
+    :return:
+    """
+    if old_category_id != new_category_id:
+        product_removed(old_category_id, old_price)
+        product_added(new_category_id, new_price)
+        return
+    if old_price == new_price:
+        return
+    updated = CategoryStats.objects.filter(
+        category_id=new_category_id, min_price__lt=old_price, max_price__gt=old_price
+    ).update(
+        price_sum=F("price_sum") + (new_price - old_price),
+        min_price=Least("min_price", Value(new_price)),
+        max_price=Greatest("max_price", Value(new_price)),
+    )
+    if not updated:
+        rebuild_category_stats([new_category_id])
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from product.cache import invalidate_wishlists
+from product.models import Product, ProductCategory
+from product.partitioning import drop_category_partition
+from product import popularity, recommendations, snapshots
+from product.stats import rebuild_category_stats
+from tasks.queue import enqueue_at, task
+
+
+@task("product.delete_category")
+def delete_category(category_id: int) -> None:
+    """
+    Delete a soft-deleted category, its products and their wishlist entries
+    in chunks of CATEGORY_DELETE_CHUNK_SIZE products, one transaction per chunk.
+    The emptied LIST partition of the category is dropped
+    :param category_id:
+    :return:
+    """
+    products = Product.objects.filter(category_id=category_id)
+    while True:
+        with transaction.atomic():
+            ids = list(
+                products.values_list("pk", flat=True)[
+                    : settings.CATEGORY_DELETE_CHUNK_SIZE
+                ]
+            )
+            if not ids:
+                break
+            Product.objects.filter(pk__in=ids).delete()
+    drop_category_partition(category_id)
+    ProductCategory.objects.filter(pk=category_id).delete()
+    invalidate_wishlists()
+
+
+@task("product.rebuild_category_stats")
+def rebuild_stats(category_ids: List[int]) -> None:
+    """
+    Recompute statistics of categories touched by a batch write
+    :param category_ids:
+    :return:
+    """
+    rebuild_category_stats(category_ids)
+
+
+@task("product.wishlist_changed")
+def update_popularity(product_ids: List[int], delta: int, event_ids: List[int]) -> None:
+    """
+    Account products added to or removed from a wishlist in the popularity and
+    co-occurrence tables. Both are updated only while the events recorded with
+    the wishlist change are pending, so a repeated run counts nothing twice
+    :param product_ids:
+    :param delta: 1 for additions, -1 for removals
+    :param event_ids: pending events of the change
+    :return:
+    """
+    with transaction.atomic():
+        if popularity.wishlist_changed(event_ids):
+            recommendations.wishlist_changed(product_ids, delta)
+
+
+@task("product.refresh_popularity")
+def refresh_popularity_task(reschedule: bool = False) -> None:
+    """
+    Recompute popularity and the trending window
+    :param reschedule: enqueue the next run after POPULARITY_REFRESH_INTERVAL seconds
+    :return:
+    """
+    popularity.refresh_popularity()
+    if reschedule:
+        enqueue_at(
+            "product.refresh_popularity",
+            timezone.now() + timedelta(seconds=settings.POPULARITY_REFRESH_INTERVAL),
+            reschedule=True,
+        )
+
+
+@task("product.regenerate_snapshots")
+def regenerate_snapshots(wishlist_ids: List[int]) -> None:
+    """
+    Rebuild public snapshots of shared wishlists after their products changed
+    :param wishlist_ids:
+    :return:
+    """
+    snapshots.regenerate_snapshots(wishlist_ids)
@@ -1,5 +1,23 @@
-from django.test import TestCase
-from product.models import Product, ProductCategory, WishList
+import io
+import time
+from decimal import Decimal
+from unittest import mock, skipIf, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from product import analytics, partitioning, recommendations, stats
+from product.filters import price_range
+from product.partitioning import partition_statements
+from product.registry import CategoryRegistry
+from product.models import (
+    Product,
+    ProductCategory,
+    WishList,
+    CategoryStats,
+    ProductCooccurrence,
+)
 from users.models import User
 
 
@@ -9,6 +27,22 @@ class CategoryTestCase(TestCase):
         self.assertEqual(category.name, "Water")
 
 
+class CategoryRegistryTestCase(TestCase):
+    def test_reload_after_ttl(self):
+        registry = CategoryRegistry()
+        self.assertEqual(registry.all(), [])
+        # created by another process, its invalidation isn't seen without a
+        # shared cache
+        (category,) = ProductCategory.objects.bulk_create(
+            [ProductCategory(name="Water")]
+        )
+        self.assertIsNone(registry.get(category.pk))
+        with mock.patch(
+            "product.registry.time.monotonic", return_value=time.monotonic() + 60
+        ):
+            self.assertEqual(registry.get(category.pk).name, "Water")
+
+
 class ProductTestCase(TestCase):
     def test_create_product(self):
         # create category
@@ -56,3 +90,237 @@ class WishListTestCase(TestCase):
         self.assertQuerysetEqual(
             wishlist.products.all().order_by("id"), [first, second]
         )
+
+
+class CategoryStatsTestCase(TestCase):
+    def test_incremental_stats(self):
+        category = ProductCategory.objects.create(name="Water")
+        first = Product.objects.create(
+            name="Bonaqua", price=Decimal("1.00"), rank=1, category=category
+        )
+        stats.product_added(category.id, first.price)
+        second = Product.objects.create(
+            name="Evian", price=Decimal("2.00"), rank=2, category=category
+        )
+        stats.product_added(category.id, second.price)
+        third = Product.objects.create(
+            name="Vittel", price=Decimal("1.50"), rank=3, category=category
+        )
+        stats.product_added(category.id, third.price)
+
+        category_stats = CategoryStats.objects.get(category=category)
+        self.assertEqual(category_stats.product_count, 3)
+        self.assertEqual(category_stats.min_price, Decimal("1.00"))
+        self.assertEqual(category_stats.max_price, Decimal("2.00"))
+        self.assertEqual(category_stats.avg_price, Decimal("1.50"))
+
+        third.delete()
+        stats.product_removed(category.id, third.price)
+        first.delete()
+        stats.product_removed(category.id, first.price)
+        category_stats.refresh_from_db()
+        self.assertEqual(category_stats.product_count, 1)
+        self.assertEqual(category_stats.min_price, Decimal("2.00"))
+        self.assertEqual(category_stats.price_sum, Decimal("2.00"))
+
+
+class AnalyticsTestCase(TestCase):
+    def test_catalog_report(self):
+        water = ProductCategory.objects.create(name="Water")
+        soda = ProductCategory.objects.create(name="Soda")
+        for price in ("1.00", "2.00", "3.00"):
+            Product.objects.create(
+                name="Bonaqua", price=Decimal(price), rank=1, category=water
+            )
+        Product.objects.create(
+            name="Cola", price=Decimal("10.00"), rank=1, category=soda
+        )
+
+        catalog = analytics.load_catalog(chunk_size=2)
+        self.assertEqual(sorted(catalog["price"].tolist()), [100, 200, 300, 1000])
+
+        with self.settings(CURRENCY_RATES={"EUR": 1.0, "USD": 2.0}):
+            report = analytics.catalog_report(bins=2, currencies=["USD"])
+        self.assertEqual(report["count"], 4)
+        self.assertEqual(report["histogram"]["counts"], [3, 1])
+        self.assertEqual(report["histogram"]["edges"], [1.0, 5.5, 10.0])
+        self.assertEqual(
+            report["categories"][0],
+            {
+                "category": water.id,
+                "count": 3,
+                "p10": 1.2,
+                "p25": 1.5,
+                "p50": 2.0,
+                "p75": 2.5,
+                "p90": 2.8,
+            },
+        )
+        self.assertEqual(
+            report["currencies"],
+            {"USD": {"min": 2.0, "max": 20.0, "mean": 8.0, "total": 32.0}},
+        )
+
+
+class RecommendationsTestCase(TestCase):
+    def setUp(self):
+        categories = [
+            ProductCategory.objects.create(name=f"Category {i}") for i in range(3)
+        ]
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", price=1, rank=i, category=categories[i]
+            )
+            for i in range(3)
+        ]
+        a, b, c = [product.id for product in self.products]
+        self.wishlists = [[a, b], [a, b, c], [a, c], [b]]
+        for i, product_ids in enumerate(self.wishlists):
+            user = User.objects.create(email=f"{i}@example.com", password="example24")
+            WishList.objects.create(user=user).products.set(product_ids)
+
+    def stored_pairs(self):
+        return {
+            (row.product_id, row.other_id): row.count
+            for row in ProductCooccurrence.objects.all()
+        }
+
+    def test_incremental_matches_rebuild(self):
+        for product_ids in self.wishlists:
+            recommendations.wishlist_changed(product_ids, 1)
+        recommendations.wishlist_changed(self.wishlists[2], -1)
+        recommendations.wishlist_changed(self.wishlists[2], 1)
+        incremental = self.stored_pairs()
+        self.assertEqual(recommendations.rebuild_cooccurrence(workers=2), 6)
+        self.assertEqual(self.stored_pairs(), incremental)
+
+        a, b, c = self.products
+        self.assertEqual(recommendations.recommend(a.id, 10), [(b, 2), (c, 2)])
+        self.assertEqual(recommendations.recommend(c.id, 1), [(a, 2)])
+
+        recommendations.wishlist_changed(self.wishlists[1], -1)
+        self.assertEqual(recommendations.recommend(c.id, 10), [(a, 1)])
+
+
+class PriceRangeTestCase(TestCase):
+    def test_price_range(self):
+        self.assertEqual(price_range(), (None, None))
+        self.assertEqual(
+            price_range(price_gt=Decimal("1.234"), price_lt=Decimal("5")),
+            (Decimal("1.24"), Decimal("4.99")),
+        )
+        self.assertEqual(
+            price_range(price_min=Decimal("1.234"), price_max=Decimal("5.006")),
+            (Decimal("1.24"), Decimal("5.00")),
+        )
+        # the tighter of exclusive and inclusive bounds wins
+        self.assertEqual(
+            price_range(price_gt=Decimal("2"), price_min=Decimal("1")),
+            (Decimal("2.01"), None),
+        )
+        # bounds beyond the column's digits
+        self.assertEqual(price_range(price_lt=Decimal("1e10")), (None, None))
+        self.assertIsNone(price_range(price_gt=Decimal("1e10")))
+        self.assertIsNone(price_range(price_min=Decimal("999.991")))
+        self.assertIsNone(price_range(price_max=Decimal("-1e999")))
+        # empty ranges
+        self.assertIsNone(price_range(price_gt=Decimal("5"), price_lt=Decimal("5.01")))
+        self.assertIsNone(price_range(price_min=Decimal("5"), price_max=Decimal("4")))
+        self.assertEqual(
+            price_range(price_min=Decimal("5"), price_max=Decimal("5")),
+            (Decimal("5.00"), Decimal("5.00")),
+        )
+
+
+class PartitioningTestCase(TestCase):
+    def test_partition_statements(self):
+        statements = partition_statements("list", [3, 1], 0)
+        self.assertTrue(statements[0].endswith("PARTITION BY LIST (category_id)"))
+        self.assertEqual(
+            statements[1:],
+            [
+                "CREATE TABLE product_product_c1 PARTITION OF product_product "
+                "FOR VALUES IN (1)",
+                "CREATE TABLE product_product_c3 PARTITION OF product_product "
+                "FOR VALUES IN (3)",
+                "CREATE TABLE product_product_default PARTITION OF product_product "
+                "DEFAULT",
+            ],
+        )
+        statements = partition_statements("hash", [3, 1], 4)
+        self.assertTrue(statements[0].endswith("PARTITION BY HASH (category_id)"))
+        self.assertEqual(len(statements), 5)
+        self.assertTrue(
+            statements[-1].endswith("FOR VALUES WITH (MODULUS 4, REMAINDER 3)")
+        )
+        with self.assertRaises(ValueError):
+            partition_statements("hash", [], 0)
+        with self.assertRaises(ValueError):
+            partition_statements("range", [], 4)
+
+    @override_settings(PRODUCT_PARTITIONING="hash")
+    def test_partition_check_needs_list_strategy(self):
+        with mock.patch("product.partitioning.is_partitioned") as is_partitioned:
+            ProductCategory.objects.create(name="Water")
+            self.assertIsNone(partitioning.drop_category_partition(1))
+        is_partitioned.assert_not_called()
+
+    @skipIf(connection.vendor == "postgresql", "partitioning runs on PostgreSQL")
+    def test_command_needs_postgres(self):
+        with self.assertRaisesMessage(CommandError, "PostgreSQL"):
+            call_command("partition_products", strategy="list")
+
+    @skipUnless(connection.vendor == "postgresql", "partitioning needs PostgreSQL")
+    @override_settings(PRODUCT_PARTITIONING="list")
+    def test_partitioned_writes(self):
+        water = ProductCategory.objects.create(name="Water")
+        cola = Product.objects.create(name="Cola", price=1, rank=1, category=water)
+        self.assertFalse(partitioning.is_partitioned())
+        # the command runs in its own transaction, not after pending writes
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        call_command("partition_products", strategy="list", stdout=io.StringIO())
+        self.assertTrue(partitioning.is_partitioned())
+
+        # categories created afterwards get their own partition
+        juice = ProductCategory.objects.create(name="Juice")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT to_regclass(%s)", [partitioning.category_partition(juice.pk)]
+            )
+            self.assertIsNotNone(cursor.fetchone()[0])
+        # ids keep coming from the sequence of the old table
+        apple = Product.objects.create(name="Apple", price=2, rank=2, category=juice)
+        orange = Product.objects.create(name="Orange", price=3, rank=3, category=juice)
+        self.assertGreater(apple.pk, cola.pk)
+        self.assertGreater(orange.pk, apple.pk)
+
+        apple.price = Decimal("2.50")
+        apple.save(update_fields=["price"])
+        apple.refresh_from_db()
+        self.assertEqual(apple.price, Decimal("2.50"))
+        # moving a product to another category moves its row between partitions
+        orange.category = water
+        orange.save(update_fields=["category"])
+        self.assertEqual(
+            set(Product.objects.filter(category=water).values_list("pk", flat=True)),
+            {cola.pk, orange.pk},
+        )
+
+        # the database foreign keys to products are gone, the ORM cascades
+        wishlist = WishList.objects.create(user=User.objects.create(email="a@b.c"))
+        wishlist.products.add(cola, apple, orange)
+        ProductCooccurrence.objects.create(product=cola, other=apple, count=1)
+        apple.delete()
+        self.assertEqual(
+            set(wishlist.products.values_list("pk", flat=True)), {cola.pk, orange.pk}
+        )
+        self.assertFalse(ProductCooccurrence.objects.exists())
+        water.delete()
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(wishlist.products.exists())
+        # the emptied partition of a category can be dropped
+        self.assertEqual(
+            partitioning.drop_category_partition(juice.pk),
+            partitioning.category_partition(juice.pk),
+        )
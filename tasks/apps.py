@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TasksConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "tasks"
+
+    def ready(self):
+        # register task functions declared in `<app>/tasks.py`
+        autodiscover_modules("tasks")
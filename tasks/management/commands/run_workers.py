@@ -0,0 +1,111 @@
+import multiprocessing
+import threading
+import time
+
+from django import db
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.queue import requeue_stale, run_pending
+
+
+def work(once: bool, sleep: float, stop: threading.Event) -> None:
+    """
+    Worker loop of a single thread.
+    Stale tasks of dead workers are requeued every TASK_REQUEUE_INTERVAL seconds
+    :param once: exit when no task is due instead of polling
+    :param sleep: seconds to wait between polls
+    :param stop: set to stop the loop
+    :return:
+    """
+    next_requeue = time.monotonic() + settings.TASK_REQUEUE_INTERVAL
+    try:
+        while not stop.is_set():
+            if time.monotonic() >= next_requeue:
+                requeue_stale()
+                next_requeue = time.monotonic() + settings.TASK_REQUEUE_INTERVAL
+            if not run_pending() and once:
+                break
+            if not once:
+                stop.wait(sleep)
+    finally:
+        db.connection.close()
+
+
+def run_threads(threads: int, once: bool, sleep: float) -> None:
+    """
+    Run worker loops in a pool of threads until interrupted
+    :param threads:
+    :param once:
+    :param sleep:
+    :return:
+    """
+    stop = threading.Event()
+    pool = [
+        threading.Thread(target=work, args=(once, sleep, stop), daemon=True)
+        for _ in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    try:
+        for thread in pool:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in pool:
+            thread.join()
+
+
+class Command(BaseCommand):
+    help = "Process queued tasks with a pool of worker processes and threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.TASK_WORKER_PROCESSES,
+            help="Number of worker processes",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.TASK_WORKER_THREADS,
+            help="Number of worker threads in every process",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of polling for new tasks",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=settings.TASK_POLL_INTERVAL,
+            help="Seconds to wait between polls of an empty queue",
+        )
+
+    def handle(self, *args, **options):
+        stale = requeue_stale()
+        if stale:
+            self.stdout.write(f"Requeued {stale} stale task(s)")
+
+        worker_args = (options["threads"], options["once"], options["sleep"])
+        if options["processes"] <= 1:
+            run_threads(*worker_args)
+            return
+        # forked children must open their own database connections
+        db.connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_threads, args=worker_args)
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+                process.join()
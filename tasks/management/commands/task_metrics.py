@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from tasks.queue import task_metrics
+
+
+class Command(BaseCommand):
+    help = "Show queue depth, outcomes, retries and mean run time per task"
+
+    def handle(self, *args, **options):
+        columns = ["name", "pending", "running", "done", "failed", "retries"]
+        self.stdout.write("\t".join(columns + ["avg_duration"]))
+        for row in task_metrics():
+            values = [str(row[column] or 0) for column in columns]
+            values.append(str(row["avg_duration"] or "-"))
+            self.stdout.write("\t".join(values))
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.7 on 2026-10-19 16:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="task",
+            name="tasks_task_status_2add5e_idx",
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="finished_time",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="max_attempts",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="run_after",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="started_time",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["status", "run_after"], name="tasks_task_status_03f913_idx"
+            ),
+        ),
+    ]
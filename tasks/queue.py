@@ -0,0 +1,201 @@
+import logging
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.utils import timezone
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+TASKS: Dict[str, Callable] = {}
+RETRIES: Dict[str, int] = {}
+# tasks whose effects would apply twice if a run interrupted after its commit
+# ran again
+NOT_IDEMPOTENT: Set[str] = set()
+
+
+def task(name: str, retries: Optional[int] = None, idempotent: bool = True) -> Callable:
+    """
+    Register a function as a task under the given name
+    :param name: unique task name, used when enqueueing
+    :param retries: how many times a failed run is retried, TASK_RETRIES by default
+    :param idempotent: whether a run left unfinished by a dead worker may run
+        again, see `requeue_stale`
+    :return: decorator
+    """
+
+    def decorator(func: Callable) -> Callable:
+        TASKS[name] = func
+        if retries is not None:
+            RETRIES[name] = retries
+        if not idempotent:
+            NOT_IDEMPOTENT.add(name)
+        return func
+
+    return decorator
+
+
+def enqueue(name: str, **payload) -> Task:
+    """
+    Store a task in the queue
+    :param name: registered task name
+    :param payload: keyword arguments of the task function, must be JSON serializable
+    :return: created task
+    """
+    return enqueue_at(name, timezone.now(), **payload)
+
+
+def enqueue_at(name: str, run_after: datetime, **payload) -> Task:
+    """
+    Store a task in the queue that is not run before the given time
+    :param name: registered task name
+    :param run_after:
+    :param payload: keyword arguments of the task function, must be JSON serializable
+    :return: created task
+    """
+    if name not in TASKS:
+        raise KeyError(f"Task {name} is not registered")
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        run_after=run_after,
+        max_attempts=RETRIES.get(name, settings.TASK_RETRIES) + 1,
+    )
+
+
+def enqueue_on_commit(name: str, **payload) -> None:
+    """
+    Store a task in the queue once the current transaction commits,
+    so workers never see work of a rolled back request
+    :param name: registered task name
+    :param payload: keyword arguments of the task function
+    :return:
+    """
+    if name not in TASKS:
+        raise KeyError(f"Task {name} is not registered")
+    transaction.on_commit(lambda: enqueue(name, **payload))
+
+
+def claim_next() -> Optional[Task]:
+    """
+    Claim the oldest pending task that is due.
+    The conditional UPDATE makes sure concurrent workers never run the same task
+    :return: claimed task or None when no task is due
+    """
+    while True:
+        now = timezone.now()
+        task = (
+            Task.objects.filter(status=Task.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if task is None:
+            return None
+        claimed = Task.objects.filter(pk=task.pk, status=Task.PENDING).update(
+            status=Task.RUNNING, attempts=task.attempts + 1, started_time=now
+        )
+        if claimed:
+            task.status = Task.RUNNING
+            task.attempts += 1
+            task.started_time = now
+            return task
+
+
+def requeue_stale() -> int:
+    """
+    Put tasks running for more than TASK_STALE_AFTER seconds, left over by a
+    worker that died, back in the queue. Tasks that aren't idempotent may
+    have committed their effects already and are failed instead
+    :return: number of requeued tasks
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        started_time__lt=now - timedelta(seconds=settings.TASK_STALE_AFTER),
+    )
+    stale.filter(name__in=NOT_IDEMPOTENT).update(
+        status=Task.FAILED,
+        error="The worker running the task stopped",
+        finished_time=now,
+        updated_time=now,
+    )
+    return stale.update(status=Task.PENDING, updated_time=now)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Exponential backoff between attempts, capped at TASK_RETRY_BACKOFF_MAX seconds
+    :param attempts: number of attempts made so far
+    :return:
+    """
+    seconds = settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.TASK_RETRY_BACKOFF_MAX))
+
+
+def run_task(task: Task) -> None:
+    """
+    Run a claimed task and store its outcome.
+    Failed tasks go back to the queue with a backoff until max_attempts is reached
+    :param task:
+    :return:
+    """
+    try:
+        TASKS[task.name](**task.payload)
+    except Exception:
+        logger.exception("Task %s %s failed", task.pk, task.name)
+        task.error = traceback.format_exc()
+        if task.attempts < task.max_attempts:
+            task.status = Task.PENDING
+            task.run_after = timezone.now() + retry_delay(task.attempts)
+        else:
+            task.status = Task.FAILED
+    else:
+        task.status = Task.DONE
+        task.error = ""
+    task.finished_time = timezone.now()
+    task.save(
+        update_fields=["status", "error", "run_after", "finished_time", "updated_time"]
+    )
+
+
+def run_pending(limit: Optional[int] = None) -> int:
+    """
+    Run due tasks one by one until none is left
+    :param limit: maximum number of tasks to run
+    :return: number of tasks that were run
+    """
+    count = 0
+    while limit is None or count < limit:
+        task = claim_next()
+        if task is None:
+            break
+        run_task(task)
+        count += 1
+    return count
+
+
+def task_metrics() -> List[dict]:
+    """
+    Queue depth, outcomes, retries and mean run time per task name
+    :return: list of metrics, one entry per task name
+    """
+    return list(
+        Task.objects.values("name")
+        .annotate(
+            pending=Count("id", filter=Q(status=Task.PENDING)),
+            running=Count("id", filter=Q(status=Task.RUNNING)),
+            done=Count("id", filter=Q(status=Task.DONE)),
+            failed=Count("id", filter=Q(status=Task.FAILED)),
+            retries=Sum(F("attempts") - 1, filter=Q(attempts__gt=1)),
+            avg_duration=Avg(
+                F("finished_time") - F("started_time"),
+                filter=Q(status=Task.DONE),
+            ),
+        )
+        .order_by("name")
+    )
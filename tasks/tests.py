@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.queue import (
+    enqueue,
+    enqueue_on_commit,
+    requeue_stale,
+    run_pending,
+    task,
+    task_metrics,
+)
+
+calls = []
+
+
+@task("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@task("tests.increment", idempotent=False)
+def increment(value):
+    calls.append(value)
+
+
+@task("tests.fail", retries=1)
+def fail():
+    raise ValueError("failed")
+
+
+class QueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_pending(self):
+        enqueue("tests.record", value=1)
+        enqueue("tests.record", value=2)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_enqueue_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue_on_commit("tests.record", value=1)
+            self.assertFalse(Task.objects.exists())
+        callbacks[0]()
+        self.assertEqual(Task.objects.get().payload, {"value": 1})
+
+    @override_settings(TASK_RETRY_BACKOFF=10)
+    def test_retry_with_backoff(self):
+        failing = enqueue("tests.fail")
+        with self.assertLogs("tasks.queue", level="ERROR"):
+            self.assertEqual(run_pending(), 1)
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Task.PENDING)
+        self.assertGreater(failing.run_after, timezone.now() + timedelta(seconds=5))
+        # not due yet
+        self.assertEqual(run_pending(), 0)
+
+        Task.objects.filter(pk=failing.pk).update(run_after=timezone.now())
+        with self.assertLogs("tasks.queue", level="ERROR"):
+            self.assertEqual(run_pending(), 1)
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Task.FAILED)
+        self.assertEqual(failing.attempts, 2)
+        self.assertIn("ValueError", failing.error)
+
+    @override_settings(TASK_STALE_AFTER=60)
+    def test_requeue_stale(self):
+        started = timezone.now() - timedelta(seconds=120)
+        stale = enqueue("tests.record", value=1)
+        applied = enqueue("tests.increment", value=1)
+        recent = enqueue("tests.record", value=2)
+        Task.objects.filter(pk__in=[stale.pk, applied.pk]).update(
+            status=Task.RUNNING, started_time=started
+        )
+        Task.objects.filter(pk=recent.pk).update(
+            status=Task.RUNNING, started_time=timezone.now()
+        )
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Task.objects.get(pk=stale.pk).status, Task.PENDING)
+        self.assertEqual(Task.objects.get(pk=applied.pk).status, Task.FAILED)
+        self.assertEqual(Task.objects.get(pk=recent.pk).status, Task.RUNNING)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [1])
+
+    def test_metrics(self):
+        enqueue("tests.record", value=1)
+        enqueue("tests.record", value=2)
+        run_pending(limit=1)
+        metrics = task_metrics()
+        self.assertEqual(len(metrics), 1)
+        self.assertEqual(metrics[0]["name"], "tests.record")
+        self.assertEqual(metrics[0]["pending"], 1)
+        self.assertEqual(metrics[0]["done"], 1)
+        self.assertIsNotNone(metrics[0]["avg_duration"])
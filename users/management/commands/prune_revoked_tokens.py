@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import Task
+from tasks.queue import enqueue
+from users.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete revoked refresh tokens that expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Enqueue a background prune repeated every REVOKED_TOKENS_PRUNE_INTERVAL seconds",
+        )
+
+    def handle(self, *args, **options):
+        if not options["schedule"]:
+            deleted = prune_revoked_tokens()
+            self.stdout.write(f"{deleted} expired revoked tokens deleted")
+            return
+        scheduled = Task.objects.filter(
+            name="users.prune_revoked_tokens",
+            status__in=[Task.PENDING, Task.RUNNING],
+        )
+        if scheduled.exists():
+            self.stdout.write("Revoked token prune is already scheduled")
+            return
+        enqueue("users.prune_revoked_tokens", reschedule=True)
+        self.stdout.write("Revoked token prune scheduled")
@@ -17,3 +17,14 @@ class User(AbstractUser):
     REQUIRED_FIELDS: List[str] = []
 
     objects = CustomUserManager()  # type: ignore #https://github.com/typeddjango/django-stubs/issues/174
+
+
+class RevokedToken(models.Model):
+    """
+    Stores the `jti` of a single revoked refresh token until the token expires.
+    Checked through the in-memory filter of :mod:`users.revocation`.
+    """
+
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_time = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,155 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from users.models import RevokedToken
+
+# slack for rows committed out of creation order and for clock skew between
+# the processes writing them
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and a bounded false positive rate,
+    in about 1.44 * log2(1 / error_rate) bits per item
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        # double hashing of one digest instead of `hashes` independent hashes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(first + i * second) % size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        bits = self.bits
+        new = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        # false positives aren't counted, close enough to size the filter
+        self.count += new
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationList:
+    """
+    Process-local bloom filter of revoked refresh token ids.
+
+    Tokens missing from the filter are valid without a query, the few that hit
+    it are confirmed against :model:`users.RevokedToken`. Tokens revoked by
+    other processes are fetched every REVOKED_TOKENS_SYNC_INTERVAL seconds,
+    rows created since the last sync, so rotating refresh tokens doesn't turn
+    into a query per refresh. Syncing doesn't rely on the cache, which is
+    local to every process unless a shared cache is configured. The filter
+    is rebuilt from unexpired rows once it holds REVOKED_TOKENS_FILTER_CAPACITY
+    ids, so expired tokens don't raise the false positive rate for long.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._filter: Optional[BloomFilter] = None
+        self._synced_at: Optional[datetime] = None
+        self._next_sync = 0.0
+
+    def _rebuild(self, now: datetime) -> None:
+        jtis = list(
+            RevokedToken.objects.filter(expires_at__gt=now).values_list(
+                "jti", flat=True
+            )
+        )
+        self._filter = BloomFilter(
+            max(settings.REVOKED_TOKENS_FILTER_CAPACITY, 2 * len(jtis)),
+            settings.REVOKED_TOKENS_FILTER_ERROR_RATE,
+        )
+        for jti in jtis:
+            self._filter.add(jti)
+
+    def _load(self) -> BloomFilter:
+        bloom = self._filter
+        if bloom is not None and time.monotonic() < self._next_sync:
+            return bloom
+        with self._lock:
+            if self._filter is None or time.monotonic() >= self._next_sync:
+                now = timezone.now()
+                if self._filter is None or self._filter.count >= self._filter.capacity:
+                    self._rebuild(now)
+                else:
+                    for jti in RevokedToken.objects.filter(
+                        created_time__gte=self._synced_at - SYNC_OVERLAP,
+                        expires_at__gt=now,
+                    ).values_list("jti", flat=True):
+                        self._filter.add(jti)
+                self._synced_at = now
+                self._next_sync = (
+                    time.monotonic() + settings.REVOKED_TOKENS_SYNC_INTERVAL
+                )
+            return self._filter
+
+    def is_revoked(self, jti: str) -> bool:
+        """
+        Check whether a token was revoked
+        :param jti: token id
+        :return:
+        """
+        if jti not in self._load():
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti: str, expires_at: datetime) -> None:
+        """
+        Revoke a token until it expires, in this process at once and in every
+        other process at its next sync
+        :param jti: token id
+        :param expires_at: expiration time of the token
+        :return:
+        """
+        RevokedToken.objects.get_or_create(jti=jti, defaults={"expires_at": expires_at})
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def clear(self) -> None:
+        """
+        Drop the filter of this process, used by tests
+        :return:
+        """
+        with self._lock:
+            self._filter = None
+            self._synced_at = None
+            self._next_sync = 0.0
+
+
+revoked_tokens = RevocationList()
+
+
+def prune_revoked_tokens() -> int:
+    """
+    Delete revoked tokens that expired, they are rejected by their `exp` claim anyway
+    :return: number of deleted tokens
+    """
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
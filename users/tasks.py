@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.queue import enqueue_at, task
+from users.revocation import prune_revoked_tokens
+
+
+@task("users.prune_revoked_tokens")
+def prune_revoked_tokens_task(reschedule: bool = False) -> None:
+    """
+    Delete expired revoked tokens
+    :param reschedule: enqueue the next run after REVOKED_TOKENS_PRUNE_INTERVAL seconds
+    :return:
+    """
+    prune_revoked_tokens()
+    if reschedule:
+        enqueue_at(
+            "users.prune_revoked_tokens",
+            timezone.now() + timedelta(seconds=settings.REVOKED_TOKENS_PRUNE_INTERVAL),
+            reschedule=True,
+        )
@@ -1,6 +1,18 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 
-from users.models import User
+from users.models import RevokedToken, User
+from users.revocation import (
+    BloomFilter,
+    RevocationList,
+    prune_revoked_tokens,
+    revoked_tokens,
+)
 
 
 class CategoryTestCase(TestCase):
@@ -22,3 +34,52 @@ class CategoryTestCase(TestCase):
         self.assertTrue(user.is_staff, True)
         self.assertTrue(user.is_superuser, True)
         self.assertTrue(user.is_active, True)
+
+
+class RevocationTestCase(TestCase):
+    def setUp(self):
+        revoked_tokens.clear()
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"revoked-{i}")
+        self.assertTrue(all(f"revoked-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"valid-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_sync(self):
+        expires_at = timezone.now() + timedelta(days=1)
+        self.assertFalse(revoked_tokens.is_revoked("a"))
+        revoked_tokens.revoke("a", expires_at)
+        # no query for tokens missing from the filter
+        with self.assertNumQueries(0):
+            self.assertFalse(revoked_tokens.is_revoked("b"))
+        self.assertTrue(revoked_tokens.is_revoked("a"))
+        # revoked by another process, seen after the sync interval
+        RevokedToken.objects.create(jti="b", expires_at=expires_at)
+        with mock.patch(
+            "users.revocation.time.monotonic", return_value=time.monotonic() + 2
+        ):
+            self.assertTrue(revoked_tokens.is_revoked("b"))
+
+    def test_sync_without_shared_cache(self):
+        expires_at = timezone.now() + timedelta(days=1)
+        other_process = RevocationList()
+        self.assertFalse(other_process.is_revoked("a"))
+        revoked_tokens.revoke("a", expires_at)
+        # each process has its own cache
+        cache.clear()
+        self.assertFalse(other_process.is_revoked("a"))
+        with mock.patch(
+            "users.revocation.time.monotonic", return_value=time.monotonic() + 2
+        ):
+            self.assertTrue(other_process.is_revoked("a"))
+
+    def test_prune(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti="a", expires_at=now - timedelta(seconds=1))
+        RevokedToken.objects.create(jti="b", expires_at=now + timedelta(days=1))
+        self.assertEqual(prune_revoked_tokens(), 1)
+        self.assertFalse(revoked_tokens.is_revoked("a"))
+        self.assertTrue(revoked_tokens.is_revoked("b"))